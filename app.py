@@ -1,17 +1,59 @@
-import sys, ctypes, os
+import sys, os, time
 
 import tkinter as tk
-from tkinter import messagebox
-from ui import build_ui
-from config import FONT_FAMILY, FONT_SIZE
+from ui import build_ui, build_search_bar
+from config import (
+    AUTO_HIGHLIGHT, FONT_FAMILY, FONT_SIZE, JOURNALED_SAVE, MINIMAP, SINGLE_INSTANCE,
+    STARTUP_DEFER_MAX_MS, WATCH_FILES,
+)
 
 from locks import is_file_already_open, create_file_lock
+from text_hooks import install_change_hook
+from chunked_load import cancel_chunked_load
+from journal import stop_journal
+from autosave import (
+    discard_snapshot,
+    offer_recovery,
+    offer_untitled_recovery,
+    start_autosave,
+)
+from dirty import start_dirty_tracking
+from undo import start_undo
+from highlight import start_highlighter, stop_highlighter
+from minimap import start_minimap, stop_minimap
+from instrument import dump_stats, set_enabled, track_key_latency
+from debug_panel import toggle_debug_panel
+from instance import start_instance_server, stop_instance_server
+from workspace_index import start_index, stop_index
+from watcher import start_watcher, stop_watcher
+from workspace_search import open_workspace_search
+from tabs import (
+    blank_tab,
+    close_tab,
+    close_window,
+    create_tabs,
+    current_tab,
+    new_tab,
+    next_tab,
+    open_in_tab,
+)
+from large_file import large_find, schedule_large_find
+from replace import replace_all, replace_current
+from search_engine import (
+    PLAIN_OPTIONS,
+    create_search_state,
+    search_next,
+    search_previous,
+    schedule_viewport_refresh,
+)
 
 # Editor logic
 from editor_ops import (
     zoom_with_wheel,
     show_search_bar,
+    show_replace_bar,
     hide_search_bar,
+    close_search_bar,
     search_text,
     clear_search_highlight,
     apply_color,
@@ -25,237 +67,542 @@ from editor_ops import (
     has_color_tags,
     export_with_colors,
     import_with_colors,
+    bind_document,
 )
 
 # File logic
 from file_ops import (
     resource_path,
     get_current_content,
-    has_unsaved_changes,
-    reset_original_content,
     load_file,
     open_file,
+    open_large,
     save_file,
     save_file_as,
-    on_closing,
+    export_file_as,
 )
 
+# Set by benchmarks/bench_startup.py: print startup milestones and quit
+STARTUP_TRACE = os.environ.get("MINI_NOTES_STARTUP_TRACE")
+
+# Record handler timings from startup and dump them to this JSON file on exit
+INSTRUMENT_DUMP = os.environ.get("MINI_NOTES_INSTRUMENT")
+
+
+def trace_startup(root, milestone):
+    if STARTUP_TRACE:
+        print(f"{milestone} {time.time():.6f}", flush=True)
+        if milestone == "interactive":
+            root.after(1, root.destroy)
+
+
+def enable_dark_title_bar(window):
+    if sys.platform != "win32":
+        return
+    import ctypes  # Windows only
+
+    try:
+        hwnd = ctypes.windll.user32.GetAncestor(window.winfo_id(), 2)
+        attribute = ctypes.c_int(20)  # DWMWA_USE_IMMERSIVE_DARK_MODE
+        value = ctypes.c_int(1)
+        ctypes.windll.dwmapi.DwmSetWindowAttribute(
+            hwnd,
+            attribute.value,
+            ctypes.byref(value),
+            ctypes.sizeof(value)
+        )
+    except Exception:
+        pass
+
 
 def run_app():
     # If mini_notes was opened with a file as an argument
     if len(sys.argv) > 1:
         file_path = sys.argv[1]
 
-        # If it is already open → close this instance
+        # A running instance with its own server already got the file in
+        # main.py; one without (or another user's) still holds the lock
         if is_file_already_open(file_path):
             return  # DO NOT open another window
 
-        # If it is not open → create lock
-        create_file_lock(file_path)
+        # If it is not open → create lock (False: lost a race for it)
+        if not create_file_lock(file_path):
+            return
 
+    # Startup is split in two: the window, the editor and the file come
+    # first; menus, the icon, the search bar, dialogs and background
+    # services follow once the first frame has been painted.
     root = tk.Tk()
     root.update_idletasks()
-    def enable_dark_title_bar(window):
-        if sys.platform != "win32":
-            return
-        try:
-            hwnd = ctypes.windll.user32.GetAncestor(window.winfo_id(), 2)
-            attribute = ctypes.c_int(20)  # DWMWA_USE_IMMERSIVE_DARK_MODE
-            value = ctypes.c_int(1)
-            ctypes.windll.dwmapi.DwmSetWindowAttribute(
-                hwnd,
-                attribute.value,
-                ctypes.byref(value),
-                ctypes.sizeof(value)
-            )
-        except Exception:
-            pass
-
-    icon_image = tk.PhotoImage(file=resource_path("assets", "mini_notes.png"))
-    root.iconphoto(True, icon_image)
-    
     enable_dark_title_bar(root)
-    
+
     # -------------------------
     # BUILD UI
     # -------------------------
     ui = build_ui(root)
-    text = ui["text"]
-    scroll_canvas = ui["scroll_canvas"]
-    thumb = ui["thumb"]
-    search_frame = ui["search_frame"]
-    search_entry = ui["search_entry"]
 
-    # -------------------------
-    # STATE (replaces globals)
-    # -------------------------
-    state = {
-        "original_content": "",
-        "file_format": "txt",
-        "current_file_path": None,
-        "font_size_state": {"size": FONT_SIZE},
+    if INSTRUMENT_DUMP:
+        set_enabled(True)
+
+    # Shared by every tab; each tab's own state is made by make_state()
+    font_size_state = {"size": FONT_SIZE}
+    status = {"frame": ui["status_frame"], "label": ui["status_label"]}
+    services = {
+        "index": None, "journal": JOURNALED_SAVE, "highlight": AUTO_HIGHLIGHT, "minimap": MINIMAP,
     }
+    startup = {"painted": False, "done": False}
+
+    def current():
+        """(text, state) of the current tab."""
+        tab = current_tab(tabs)
+        return tab["text"], tab["state"]
+
+    def load(path, text, state):
+        load_file(path, text, root, state, import_with_colors, export_with_colors)
+
+    def save(text, state):
+        return save_file(text, state, export_with_colors, get_current_content)
 
     # -------------------------
-    # CONNECT TOOLBAR BUTTONS
-    # -------------------------
-    ui["btn_white"].config(command=lambda: change_text_to_white(text))
-    ui["btn_blue"].config(command=lambda: change_text_to_blue(text))
-    ui["btn_yellow"].config(command=lambda: change_text_to_yellow(text))
-    ui["btn_green"].config(command=lambda: change_text_to_green(text))
-    ui["btn_red"].config(command=lambda: change_text_to_red(text))
-    
-    
-    # -------------------------
-    # CONTEXT MENU (Right-click)
+    # CONTEXT MENU (Right-click, built on first use)
     # -------------------------
-    context_menu = tk.Menu(text, tearoff=0, bg="#4A4A4A", fg="white")
-    context_menu.add_command(label="Yellow", command=lambda: change_text_to_yellow(text))
-    context_menu.add_command(label="Green", command=lambda: change_text_to_green(text))
-    context_menu.add_command(label="Red", command=lambda: change_text_to_red(text))
-    context_menu.add_command(label="Blue", command=lambda: change_text_to_blue(text))
-    context_menu.add_command(label="White", command=lambda: change_text_to_white(text))
-
+    context_menu = []
 
     def show_context_menu(event):
-        context_menu.tk_popup(event.x_root, event.y_root)
+        if not context_menu:
+            menu = tk.Menu(root, tearoff=0, bg="#4A4A4A", fg="white")
+            menu.add_command(label="Yellow", command=lambda: change_text_to_yellow(current()[0]))
+            menu.add_command(label="Green", command=lambda: change_text_to_green(current()[0]))
+            menu.add_command(label="Red", command=lambda: change_text_to_red(current()[0]))
+            menu.add_command(label="Blue", command=lambda: change_text_to_blue(current()[0]))
+            menu.add_command(label="White", command=lambda: change_text_to_white(current()[0]))
+            context_menu.append(menu)
+        context_menu[0].tk_popup(event.x_root, event.y_root)
 
-    text.bind("<Button-3>", show_context_menu)
+    # -------------------------
+    # SEARCH BAR (built on first Ctrl+F)
+    # -------------------------
+    search = {}
+    search_options = dict(PLAIN_OPTIONS)  # shared by every tab
+
+    def tab_search_state():
+        """The current tab's search state, made on first use."""
+        text, state = current()
+        if state["search_state"] is None:
+            search_state = create_search_state(
+                text, search["search_entry"], search["search_count"], search_options
+            )
+            state["search_state"] = search_state
+            text.bind("<<ViewportChanged>>", lambda e: schedule_viewport_refresh(search_state))
+        return state["search_state"]
+
+    def ensure_search_bar():
+        if search:
+            return search
+        search.update(build_search_bar(root))
+        search_frame = search["search_frame"]
+        search_entry = search["search_entry"]
+
+        def close_search():
+            close_search_bar(
+                search_frame, search_entry, current()[0], tab_search_state(), search["replace_row"]
+            )
 
+        # Large file mode searches the mapped file instead of the Text
+        def on_search_key(event):
+            state = current()[1]
+            if state["large_file"]:
+                schedule_large_find(state["large_file"], tab_search_state())
+            else:
+                search_text(event, tab_search_state())
+
+        search_entry.bind("<KeyRelease>", on_search_key)
+        search_entry.bind("<Return>", find_next)
+        search_entry.bind("<KP_Enter>", find_next)
+        search_entry.bind("<Shift-Return>", find_previous)
+        search_entry.bind("<Escape>", lambda e: close_search())
+        search_entry.bind("<Control-h>", open_replace)  # Entry's own is Backspace
+        search["search_next_btn"].config(command=find_next)
+        search["search_prev_btn"].config(command=find_previous)
+        search["close_search_btn"].config(command=close_search)
+
+        def toggle_option(name, var):
+            search_options[name] = var.get()
+            if not search_entry.get():
+                return
+            state = current()[1]
+            if state["large_file"]:
+                large_find(state["large_file"], tab_search_state(), from_view_top=True)
+            else:
+                search_text(None, tab_search_state())
+
+        for name, (var, button) in search["search_options"].items():
+            button.config(command=lambda name=name, var=var: toggle_option(name, var))
+
+        replace_entry = search["replace_entry"]
+        replace_entry.bind("<Return>", replace_one)
+        replace_entry.bind("<KP_Enter>", replace_one)
+        replace_entry.bind("<Control-Return>", replace_every)
+        replace_entry.bind("<Escape>", lambda e: close_search())
+        search["replace_btn"].config(command=replace_one)
+        search["replace_all_btn"].config(command=replace_every)
+        return search
+
+    def open_search(event=None):
+        bar = ensure_search_bar()
+        bar["replace_row"].pack_forget()
+        show_search_bar(bar["search_frame"], bar["search_entry"])
+
+    def open_replace(event=None):
+        bar = ensure_search_bar()
+        show_replace_bar(
+            bar["search_frame"], bar["search_entry"], bar["replace_row"], bar["replace_entry"]
+        )
+        return "break"
+
+    def replaceable():
+        """The current tab's search state, if its text can be edited."""
+        state = current()[1]
+        if state["large_file"] or state.get("loading"):
+            search["search_count"].config(text="Read-only")
+            return None
+        return tab_search_state()
+
+    def replace_one(event=None):
+        search_state = replaceable()
+        if search_state is not None:
+            replace_current(search_state, current()[1], search["replace_entry"].get())
+        return "break"
+
+    def replace_every(event=None):
+        search_state = replaceable()
+        if search_state is not None:
+            replace_all(search_state, current()[1], search["replace_entry"].get())
+        return "break"
+
+    def find_next(event=None):
+        state = current()[1]
+        search_state = state["search_state"]
+        if search_state is None:
+            return None
+        if state["large_file"]:
+            return large_find(state["large_file"], search_state)
+        return search_next(search_state)
+
+    def find_previous(event=None):
+        state = current()[1]
+        search_state = state["search_state"]
+        if search_state is None:
+            return None
+        if state["large_file"]:
+            return large_find(state["large_file"], search_state, backwards=True)
+        return search_previous(search_state)
 
     # -------------------------
-    # MENU BAR
+    # TABS (each with its own Text and state)
     # -------------------------
-    menubar = ui["menubar_frame"]
-
-    # FILE MENU
-    file_btn = tk.Menubutton(menubar, text="File", bg="#4A4A4A", fg="white")
-    file_menu = tk.Menu(file_btn, tearoff=0, bg="#4A4A4A", fg="white")
-    file_menu.add_command(label="Open", command=lambda: open_file(
-        text, root, state, import_with_colors, export_with_colors
-    ))
-    file_menu.add_command(label="Save", command=lambda: save_file(
-        text, state, export_with_colors, get_current_content
-    ))
-    file_menu.add_command(label="Save As", command=lambda: save_file_as(
-        text, state, export_with_colors, get_current_content
-    ))
-    file_btn.config(menu=file_menu)
-    file_btn.pack(side="left")
+    def make_state(editor):
+        text = editor["text"]
+
+        # Route edits through Python so features can track changes, and
+        # keep the note's document in step with the widget
+        install_change_hook(text)
+        bind_document(text)
+        track_key_latency(text)
+        if font_size_state["size"] != FONT_SIZE:
+            text.config(font=(FONT_FAMILY, font_size_state["size"]))
+
+        state = {
+            "file_format": "txt",
+            "current_file_path": None,
+            "font_size_state": font_size_state,
+            "search_state": None,  # created with the search bar
+            "status": status,
+            "loading": None,
+            "scrollbar": {
+                "canvas": editor["scroll_canvas"],
+                "thumb": editor["thumb"],
+                "bar": editor["thumb_bar"],
+                "update": editor["update_scrollbar"],
+                "on_drag": editor["on_drag"],
+            },
+            "large_file": None,
+            "journal_enabled": services["journal"],
+            "journal": None,
+            "index": services["index"],  # workspace search, started after the first paint
+            "watch": None,  # external change watcher, likewise
+            "evicted": None,  # document compressed out of the widget (tabs.py)
+        }
+        start_dirty_tracking(text, state)
+        start_undo(text, state)
+        text.bind("<Button-3>", show_context_menu)
+
+        # Text's own Ctrl+T (transpose) and Ctrl+Tab (focus) would run first
+        text.bind("<Control-t>", lambda e: new_tab(tabs) and "break")
+        text.bind("<Control-h>", open_replace)  # Text's own is Backspace
+        text.bind("<Control-Tab>", lambda e: next_tab(tabs))
+        text.bind("<Control-ISO_Left_Tab>", lambda e: next_tab(tabs, -1))
+        text.bind("<Control-Shift-Tab>", lambda e: next_tab(tabs, -1))
+        if startup["done"]:
+            start_services(text, state)
+        return state
+
+    def start_services(text, state):
+        """Per-tab background services, once startup has finished."""
+        state["index"] = services["index"]
+        if services["highlight"]:
+            start_highlighter(text, state)
+        if services["minimap"]:
+            start_minimap(text, state)
+        start_autosave(text, root, state)
+        if WATCH_FILES:
+            start_watcher(text, root, state, lambda path: load(path, text, state))
+
+    def on_switch(tab):
+        text = tab["text"]
+        # Zooming only resizes the tab it happened in
+        if int(text.tk.splitlist(text.cget("font"))[-1]) != font_size_state["size"]:
+            text.config(font=(FONT_FAMILY, font_size_state["size"]))
+            text.event_generate("<<FontChanged>>")
+        if search and search["search_frame"].winfo_manager():
+            # The find bar follows the current tab
+            search["search_count"].config(text="")
+            if search["search_entry"].get():
+                search_text(None, tab_search_state())
+
+    tabs = create_tabs(root, ui, make_state, save, on_switch)
+    new_tab(tabs, editor=ui)
 
-    # FORMAT MENU
+    # -------------------------
+    # CONNECT TOOLBAR BUTTONS
+    # -------------------------
+    ui["btn_white"].config(command=lambda: change_text_to_white(current()[0]))
+    ui["btn_blue"].config(command=lambda: change_text_to_blue(current()[0]))
+    ui["btn_yellow"].config(command=lambda: change_text_to_yellow(current()[0]))
+    ui["btn_green"].config(command=lambda: change_text_to_green(current()[0]))
+    ui["btn_red"].config(command=lambda: change_text_to_red(current()[0]))
     
-    format_btn = tk.Menubutton(menubar, text="Format", bg="#4A4A4A", fg="white")
-
-    format_menu = tk.Menu(format_btn, tearoff=0, bg="#4A4A4A", fg="white")
+    
+    ui["status_cancel_btn"].config(command=lambda: cancel_chunked_load(current()[1]))
 
     # -------------------------
     # BINDS
     # -------------------------
     root.bind("<Control-MouseWheel>", lambda e: zoom_with_wheel(
-        e, text, FONT_FAMILY, state["font_size_state"]
+        e, current()[0], FONT_FAMILY, font_size_state
     ))
 
     # Zoom with Ctrl + +
-    root.bind("<Control-plus>", lambda e: increase_font_size(text, FONT_FAMILY, state["font_size_state"]))
-    root.bind("<Control-KP_Add>", lambda e: increase_font_size(text, FONT_FAMILY, state["font_size_state"]))  
+    root.bind("<Control-plus>", lambda e: increase_font_size(current()[0], FONT_FAMILY, font_size_state))
+    root.bind("<Control-KP_Add>", lambda e: increase_font_size(current()[0], FONT_FAMILY, font_size_state))  
 
     # Zoom with Ctrl + -
-    root.bind("<Control-minus>", lambda e: decrease_font_size(text, FONT_FAMILY, state["font_size_state"]))
-    root.bind("<Control-KP_Subtract>", lambda e: decrease_font_size(text, FONT_FAMILY, state["font_size_state"])) 
+    root.bind("<Control-minus>", lambda e: decrease_font_size(current()[0], FONT_FAMILY, font_size_state))
+    root.bind("<Control-KP_Subtract>", lambda e: decrease_font_size(current()[0], FONT_FAMILY, font_size_state)) 
 
     
-    root.bind("<Control-f>", lambda e: show_search_bar(search_frame, search_entry))
+    root.bind("<Control-f>", open_search)
+    root.bind("<Control-h>", open_replace)
 
-    root.bind("<Control-s>", lambda e: save_file(text, state, export_with_colors, get_current_content))
-    root.bind("<Control-S>", lambda e: save_file(text, state, export_with_colors, get_current_content))  
+    root.bind("<Control-s>", lambda e: save(*current()))
+    root.bind("<Control-S>", lambda e: save(*current()))  
 
-    search_entry.bind("<KeyRelease>", lambda e: search_text(e, text, search_entry))
+    root.bind("<F3>", find_next)
+    root.bind("<Shift-F3>", find_previous)
 
-    # Color submenu
-    color_submenu = tk.Menu(format_menu, tearoff=0, bg="#1C1C1B", fg="white")
+    def open_path(path):
+        tab = open_in_tab(tabs, path, load)
+        return tab and (tab["text"], tab["state"])
 
-    color_submenu.add_command(label="White", command=lambda: change_text_to_white(text))
-    color_submenu.add_command(label="Blue", command=lambda: change_text_to_blue(text))
-    color_submenu.add_command(label="Yellow", command=lambda: change_text_to_yellow(text))
-    color_submenu.add_command(label="Green", command=lambda: change_text_to_green(text))
-    color_submenu.add_command(label="Red", command=lambda: change_text_to_red(text))
-    
-    format_menu.add_cascade(label="Text Color", menu=color_submenu)
-    format_menu.add_separator()
-    
-    format_menu.add_command(label="Increase Font Size (Ctrl ++)", command=lambda: increase_font_size(
-        text, FONT_FAMILY, state["font_size_state"]
-    ))
-    format_menu.add_command(label="Decrease Font Size (Ctrl +-)", command=lambda: decrease_font_size(
-        text, FONT_FAMILY, state["font_size_state"]
-    ))
-    format_btn.config(menu=format_menu)
-    format_btn.pack(side="left")
-    
-    # -------------------------
-    # SCROLLBAR LOGIC
-    # -------------------------
-    def update_thumb(*args):
-        text.update_idletasks()
+    def open_workspace(event=None):
+        open_workspace_search(root, current()[1], open_path)
 
-        total = float(text.count("1.0", "end", "ypixels")[0])
-        visible = float(text.winfo_height())
-        first, last = text.yview()
+    root.bind("<Control-F>", open_workspace)
 
-        if total <= visible:
-            scroll_canvas.itemconfigure(thumb, state="hidden")
-            return
-
-        scroll_canvas.itemconfigure(thumb, state="normal")
+    # Tabs
+    root.bind("<Control-t>", lambda e: new_tab(tabs) and "break")
+    root.bind("<Control-w>", lambda e: close_tab(tabs))
+    root.bind("<Control-Tab>", lambda e: next_tab(tabs))
+    root.bind("<Control-ISO_Left_Tab>", lambda e: next_tab(tabs, -1))
+    root.bind("<Control-Shift-Tab>", lambda e: next_tab(tabs, -1))
 
-        proportional_height = visible * (visible / total)
-        min_thumb = 30
-        max_thumb = visible * 0.6
-        thumb_height = max(min_thumb, min(max_thumb, proportional_height))
-        thumb_y = first * (visible - thumb_height)
+    # Hidden instrumentation panel
+    debug_panel = {}
+    root.bind("<Control-D>", lambda e: toggle_debug_panel(root, debug_panel, tabs))
 
-        scroll_canvas.coords(thumb, 0, thumb_y, 12, thumb_y + thumb_height)
-
-    text.bind("<<Modified>>", update_thumb)
-    text.bind("<Configure>", update_thumb)
-    text.bind("<KeyRelease>", update_thumb)
+    # -------------------------
+    # WINDOW CLOSE HANDLER
+    # -------------------------
+    root.protocol("WM_DELETE_WINDOW", lambda: close_window(tabs))
 
     # -------------------------
     # LOAD FILE FROM ARGUMENT
     # -------------------------
     if len(sys.argv) > 1:
-        load_file(
-            sys.argv[1], text, root, state, import_with_colors, export_with_colors
-        )
+        load(sys.argv[1], *current())
         
 
-
-    else:
-        text.insert("1.0", "")
-        state["original_content"] = ""
-        state["file_format"] = "txt"
-        state["current_file_path"] = None
-        
     # -------------------------
-    # WINDOW CLOSE HANDLER
+    # DEFERRED STARTUP
     # -------------------------
-    root.protocol(
-        "WM_DELETE_WINDOW",
-        lambda: on_closing(
-            root,
-            text,
-            state,
-            lambda: save_file(text, state, export_with_colors, get_current_content),
-            has_unsaved_changes,
-        ),
-    )
+    server = None
+
+    def build_menus():
+        menubar = ui["menubar_frame"]
+
+        # FILE MENU
+        file_btn = tk.Menubutton(menubar, text="File", bg="#4A4A4A", fg="white")
+        file_menu = tk.Menu(file_btn, tearoff=0, bg="#4A4A4A", fg="white")
+        file_menu.add_command(label="New Tab (Ctrl+T)", command=lambda: new_tab(tabs))
+        file_menu.add_command(label="Open", command=lambda: open_file(open_path))
+        file_menu.add_command(label="Open Large File…", command=lambda: open_large(
+            current()[0], root, current()[1]
+        ))
+        file_menu.add_command(label="Search Workspace… (Ctrl+Shift+F)", command=open_workspace)
+        file_menu.add_command(label="Save", command=lambda: save(*current()))
+        file_menu.add_command(label="Save As", command=lambda: save_file_as(
+            *current(), export_with_colors, get_current_content
+        ))
+        file_menu.add_command(label="Export…", command=lambda: export_file_as(*current()))
+        file_menu.add_command(label="Close Tab (Ctrl+W)", command=lambda: close_tab(tabs))
+        file_menu.add_separator()
+
+        # Journaling starts with the next full save, so no edit goes unrecorded
+        journal_var = tk.BooleanVar(value=services["journal"])
+
+        def toggle_journal():
+            services["journal"] = journal_var.get()
+            for tab in tabs["list"]:
+                tab["state"]["journal_enabled"] = services["journal"]
+                if not services["journal"]:
+                    stop_journal(tab["text"], tab["state"])
+
+        file_menu.add_checkbutton(
+            label="Journaled Save", variable=journal_var, command=toggle_journal
+        )
+        file_btn.config(menu=file_menu)
+        file_btn.pack(side="left")
+
+        # FORMAT MENU
+        format_btn = tk.Menubutton(menubar, text="Format", bg="#4A4A4A", fg="white")
+        format_menu = tk.Menu(format_btn, tearoff=0, bg="#4A4A4A", fg="white")
+
+        # Color submenu
+        color_submenu = tk.Menu(format_menu, tearoff=0, bg="#1C1C1B", fg="white")
+
+        color_submenu.add_command(label="White", command=lambda: change_text_to_white(current()[0]))
+        color_submenu.add_command(label="Blue", command=lambda: change_text_to_blue(current()[0]))
+        color_submenu.add_command(label="Yellow", command=lambda: change_text_to_yellow(current()[0]))
+        color_submenu.add_command(label="Green", command=lambda: change_text_to_green(current()[0]))
+        color_submenu.add_command(label="Red", command=lambda: change_text_to_red(current()[0]))
+
+        format_menu.add_cascade(label="Text Color", menu=color_submenu)
+        format_menu.add_separator()
+
+        format_menu.add_command(label="Increase Font Size (Ctrl ++)", command=lambda: increase_font_size(
+            current()[0], FONT_FAMILY, font_size_state
+        ))
+        format_menu.add_command(label="Decrease Font Size (Ctrl +-)", command=lambda: decrease_font_size(
+            current()[0], FONT_FAMILY, font_size_state
+        ))
+        format_menu.add_separator()
+
+        highlight_var = tk.BooleanVar(value=services["highlight"])
+
+        def toggle_highlight():
+            services["highlight"] = highlight_var.get()
+            for tab in tabs["list"]:
+                state = tab["state"]
+                if state["evicted"] is not None:
+                    state["evicted"]["highlight"] = services["highlight"]
+                elif services["highlight"]:
+                    start_highlighter(tab["text"], state)
+                else:
+                    stop_highlighter(state)
+
+        format_menu.add_checkbutton(
+            label="Highlight Code Blocks", variable=highlight_var, command=toggle_highlight
+        )
 
-    root.mainloop()
+        minimap_var = tk.BooleanVar(value=services["minimap"])
+
+        def toggle_minimap():
+            services["minimap"] = minimap_var.get()
+            for tab in tabs["list"]:
+                state = tab["state"]
+                if state["evicted"] is not None:
+                    state["evicted"]["minimap"] = services["minimap"]
+                elif services["minimap"]:
+                    start_minimap(tab["text"], state)
+                else:
+                    stop_minimap(state)
+
+        format_menu.add_checkbutton(label="Minimap", variable=minimap_var, command=toggle_minimap)
+        format_btn.config(menu=format_menu)
+        format_btn.pack(side="left")
+
+    def finish_startup():
+        nonlocal server
+        if startup["done"]:
+            return
+        startup["done"] = True
+
+        # -------------------------
+        # WORKSPACE INDEX
+        # -------------------------
+        services["index"] = start_index()
+
+        # -------------------------
+        # HIGHLIGHTING, AUTOSAVE / CRASH RECOVERY, EXTERNAL CHANGES
+        # -------------------------
+        for tab in tabs["list"]:
+            start_services(tab["text"], tab["state"])
+        build_menus()
+
+        startup["icon"] = tk.PhotoImage(file=resource_path("assets", "mini_notes.png"))
+        root.iconphoto(True, startup["icon"])
+
+        # -------------------------
+        # SINGLE INSTANCE
+        # -------------------------
+        # Later launches with a file hand it over here and get a tab
+        if SINGLE_INSTANCE:
+            server = start_instance_server(root, open_path)
+
+        trace_startup(root, "interactive")
+        first = tabs["list"][0]
+        if len(sys.argv) > 1:
+            offer_recovery(first["text"], root, first["state"], sys.argv[1])
+
+        def open_blank():
+            tab = blank_tab(tabs)
+            return tab["text"], tab["state"]
+
+        offer_untitled_recovery(root, open_blank)
+
+    def on_first_paint(event):
+        if startup["painted"]:
+            return
+        startup["painted"] = True
+        trace_startup(root, "first_paint")
+        # Idle callbacks run in order, so this lands after the redraw
+        root.after_idle(finish_startup)
+
+    ui["text"].bind("<Expose>", on_first_paint, add="+")
+    # Never exposed (started minimized, say): finish anyway
+    root.after(STARTUP_DEFER_MAX_MS, finish_startup)
+
+    def on_destroy(event):
+        if event.widget is root:
+            # A normal close (saved or not) leaves nothing to recover
+            for tab in tabs["list"]:
+                discard_snapshot(tab["state"], tab["state"]["current_file_path"])
+                stop_watcher(tab["state"])
+            stop_instance_server(server)
+            stop_index(services["index"])
+            if INSTRUMENT_DUMP:
+                dump_stats(INSTRUMENT_DUMP)
+
+    root.bind("<Destroy>", on_destroy, add="+")
 
-    
-    
-    
-    
-    
-    
+    root.mainloop()
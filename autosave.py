@@ -0,0 +1,310 @@
+# autosave.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import AUTOSAVE_INTERVAL_MS, MINI_COMPRESSION, RECOVERY_DIR
+from dirty import mark_unsaved
+from document import copy_document, document_runs, document_text
+from editor_ops import import_document, text_document
+from lazy import messagebox
+from locks import create_file_lock, is_file_already_open, remove_file_lock
+from mini_format import load_document, save_document
+from text_hooks import add_change_listener, remove_change_listener
+from undo import reset_undo, suspend_undo
+
+
+# -----------------------------
+# AUTOSAVE / CRASH RECOVERY
+# -----------------------------
+# Every AUTOSAVE_INTERVAL_MS the Tk thread copies the tab's live document
+# (editor_ops.text_document, a shallow copy of its line lists) and hands it
+# to a worker thread, which joins it and writes a .mini v2 snapshot plus a
+# small JSON description into RECOVERY_DIR. Nothing is written while the
+# document is unchanged since the previous snapshot. A snapshot lives until
+# the document is saved or the window is closed normally, so one that
+# survives a crash is offered back the next time the file is opened.
+#
+# A snapshot is named after its file's path. Untitled tabs each get a key
+# of their own ("untitled-<random>") and hold a file lock (locks.py) on
+# their snapshot while they run, so at startup only snapshots whose tab
+# died with its process are offered back, however many windows are open.
+
+UNTITLED_PREFIX = "untitled-"
+
+
+def _snapshot_key(file_path, session=None):
+    """Snapshot name for file_path; None: the session's untitled tab."""
+    if not file_path:
+        return session["untitled"] if session is not None else None
+    path = os.path.normcase(os.path.abspath(file_path))
+    return hashlib.sha1(path.encode("utf-8")).hexdigest()
+
+
+def _snapshot_paths(key):
+    base = os.path.join(RECOVERY_DIR, key)
+    return base + ".mini", base + ".json"
+
+
+def _claim_untitled(session, key):
+    """Make key the session's untitled snapshot, locked while it runs."""
+    if session["untitled"] is not None:
+        remove_file_lock(_snapshot_paths(session["untitled"])[0])
+    session["untitled"] = key
+    create_file_lock(_snapshot_paths(key)[0])
+
+
+def start_autosave(text, root, state):
+    session = {
+        "changes": 0,
+        "snapshot_changes": 0,
+        "busy": False,
+        "epoch": 0,
+        "lock": threading.Lock(),
+        "last_snapshot_ms": None,
+        "last_write_ms": None,
+        "stopped": False,
+        "untitled": None,
+    }
+    _claim_untitled(session, UNTITLED_PREFIX + os.urandom(8).hex())
+
+    def on_change(op, start, end, detail):
+        session["changes"] += 1
+
+    session["listener"] = on_change
+    add_change_listener(text, on_change)
+    state["autosave"] = session
+
+    def tick():
+        if session["stopped"]:
+            return
+        take_snapshot(text, state)
+        root.after(AUTOSAVE_INTERVAL_MS, tick)
+
+    root.after(AUTOSAVE_INTERVAL_MS, tick)
+    return session
+
+
+def take_snapshot(text, state):
+    """Snapshot the document if it changed; returns True when one was queued."""
+    session = state.get("autosave")
+    if (
+        session is None
+        or session["busy"]
+        or state.get("loading")
+        or state.get("large_file")
+        or state.get("evicted") is not None
+        or session["changes"] == session["snapshot_changes"]
+    ):
+        return False  # unchanged since the last snapshot (or save/load)
+
+    t0 = time.perf_counter()
+    document = copy_document(text_document(text))
+    session["last_snapshot_ms"] = (time.perf_counter() - t0) * 1000
+
+    session["busy"] = True
+    session["snapshot_changes"] = session["changes"]
+    meta = {
+        "path": state.get("current_file_path"),
+        "key": _snapshot_key(state.get("current_file_path"), session),
+        "format": state.get("file_format"),
+        "time": time.time(),
+        "pid": os.getpid(),
+    }
+    threading.Thread(
+        target=_write_snapshot,
+        args=(session, session["epoch"], document, meta),
+        daemon=True,
+    ).start()
+    return True
+
+
+def _write_snapshot(session, epoch, document, meta):
+    t0 = time.perf_counter()
+    snapshot, info = _snapshot_paths(meta["key"])
+    try:
+        os.makedirs(RECOVERY_DIR, exist_ok=True)
+        save_document(
+            snapshot + ".tmp", document_text(document), document_runs(document), MINI_COMPRESSION
+        )
+        with open(info + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        with session["lock"]:
+            # A save or a clean close since the snapshot was taken wins
+            if epoch == session["epoch"]:
+                os.replace(snapshot + ".tmp", snapshot)
+                os.replace(info + ".tmp", info)
+    except OSError:
+        pass
+    finally:
+        for tmp in (snapshot + ".tmp", info + ".tmp"):
+            if os.path.exists(tmp):
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+        session["last_write_ms"] = (time.perf_counter() - t0) * 1000
+        session["busy"] = False
+
+
+def stop_autosave(text, state):
+    """No more snapshots for this document (its tab was closed)."""
+    session = state.get("autosave")
+    if session is not None:
+        session["stopped"] = True
+        remove_change_listener(text, session["listener"])
+        remove_file_lock(_snapshot_paths(session["untitled"])[0])
+        state["autosave"] = None
+
+
+def mark_clean(state):
+    """The document now matches a file on disk (it was just loaded)."""
+    session = state.get("autosave")
+    if session is not None:
+        session["snapshot_changes"] = session["changes"]
+
+
+def discard_snapshot(state, file_path):
+    """Drop the snapshot for file_path (None: this tab's untitled document)."""
+    session = state.get("autosave")
+    key = _snapshot_key(file_path, session)
+    if session is not None:
+        with session["lock"]:
+            session["epoch"] += 1
+            session["snapshot_changes"] = session["changes"]
+            _remove_snapshot(key)
+    elif key is not None:
+        _remove_snapshot(key)
+
+
+def _remove_snapshot(key):
+    for path in _snapshot_paths(key):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# -----------------------------
+# RESTORE
+# -----------------------------
+def _read_meta(key):
+    snapshot, info = _snapshot_paths(key)
+    try:
+        with open(info, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if os.path.exists(snapshot) else None
+
+
+def find_snapshot(file_path):
+    """
+    Return the meta dict of a recovery snapshot newer than file_path, or
+    None. Snapshots older than the file on disk are stale and removed.
+    """
+    key = _snapshot_key(file_path)
+    meta = _read_meta(key)
+    if meta is not None and os.path.exists(file_path):
+        if os.path.getmtime(file_path) >= meta.get("time", 0):
+            _remove_snapshot(key)
+            return None
+    return meta
+
+
+def orphaned_untitled():
+    """Keys of untitled snapshots whose tab is gone (crashed), newest first."""
+    try:
+        names = os.listdir(RECOVERY_DIR)
+    except OSError:
+        return []
+    found = []
+    for name in names:
+        key, ext = os.path.splitext(name)
+        # "untitled": the single shared key older versions wrote
+        if ext != ".json" or not (
+            key.startswith(UNTITLED_PREFIX) or key == "untitled"
+        ):
+            continue
+        if is_file_already_open(_snapshot_paths(key)[0]):
+            continue  # its tab is still open, here or in another window
+        meta = _read_meta(key)
+        if meta is not None:
+            found.append((meta.get("time", 0), key))
+    return [key for _, key in sorted(found, reverse=True)]
+
+
+def load_snapshot(key):
+    """(content, offset runs) of the snapshot named key."""
+    return load_document(_snapshot_paths(key)[0])
+
+
+def _ask(root, name, meta):
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(meta.get("time", 0)))
+    return messagebox.askyesno(
+        "Recover Unsaved Changes",
+        f"There are unsaved changes to {name} from {when}.\n\nRestore them?",
+        parent=root,
+    )
+
+
+def _restore(text, root, state, key):
+    try:
+        content, runs = load_snapshot(key)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Error", f"Could not restore: {e}", parent=root)
+        return False
+
+    suspend_undo(state)
+    import_document(text, content, runs)
+    reset_undo(state)
+    mark_unsaved(text, state)  # restored work is unsaved until saved
+    return True
+
+
+def offer_recovery(text, root, state, file_path):
+    """Ask to restore a snapshot of file_path newer than the file."""
+    if state.get("loading"):
+        # Streaming load: ask once the whole document is in
+        root.after(200, lambda: offer_recovery(text, root, state, file_path))
+        return False
+    if state.get("large_file") or state.get("current_file_path") != file_path:
+        return False
+
+    meta = find_snapshot(file_path)
+    if meta is None:
+        return False
+    if not _ask(root, os.path.basename(file_path), meta):
+        discard_snapshot(state, file_path)
+        return False
+    return _restore(text, root, state, _snapshot_key(file_path))
+
+
+def offer_untitled_recovery(root, open_tab):
+    """
+    Ask to restore every untitled tab a crash left behind, each into the
+    (text, state) open_tab() returns. Returns how many were restored.
+    """
+    keys = orphaned_untitled()
+    if not keys:
+        return 0
+    name = "an untitled note" if len(keys) == 1 else f"{len(keys)} untitled notes"
+    if not _ask(root, name, _read_meta(keys[0]) or {}):
+        for key in keys:
+            _remove_snapshot(key)
+        return 0
+
+    restored = 0
+    for key in keys:
+        text, state = open_tab()
+        if _restore(text, root, state, key):
+            # The tab carries on under the crashed tab's snapshot
+            session = state.get("autosave")
+            if session is not None:
+                _remove_snapshot(session["untitled"])
+                _claim_untitled(session, key)
+            restored += 1
+    return restored
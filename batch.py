@@ -0,0 +1,309 @@
+# batch.py
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+from color_runs import compute_line_starts, normalize_runs, runs_to_offsets
+from config import BATCH_STATE_DIR
+from formats import read_file, sniff_format, write_file
+from journal import (
+    discard_journal,
+    fingerprint,
+    hash_file,
+    read_journal,
+    replay,
+)
+from locks import is_file_already_open, normalize_path
+from mini_format import runs_from_tag_data
+
+# -----------------------------
+# HEADLESS BATCH TOOL
+# -----------------------------
+# Walks a directory of notes without Tk:
+#
+#   python batch.py NOTES_DIR                  validate every note
+#   python batch.py NOTES_DIR --normalize      rewrite color ranges compacted
+#   python batch.py NOTES_DIR --migrate        legacy JSON -> binary .mini v2
+#
+# Files are handled by a process pool and reported as each one finishes.
+# A per-directory state file remembers (size, mtime, hash) of every file
+# that passed, so unchanged files are skipped next time; a file whose mtime
+# moved but whose hash did not is skipped too. Pending edit journals are
+# folded in whenever a file is rewritten. Exit status is 1 if any file
+# failed.
+
+NOTE_EXTENSIONS = (".mini", ".np100", ".txt")
+MIGRATE_EXTENSIONS = (".mini", ".np100")
+COLOR_RE = re.compile(r"#[0-9A-Fa-f]{6}")
+
+
+# -----------------------------
+# FILES
+# -----------------------------
+def find_notes(directory):
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(NOTE_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def _replace(path, file_format, content, runs):
+    tmp = path + ".batch.tmp"
+    try:
+        write_file(tmp, file_format, content, runs)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# -----------------------------
+# CHECKS
+# -----------------------------
+def _check_runs(content, runs):
+    """Problems with offset runs as (content, runs) would be saved."""
+    problems = []
+    previous_end = 0
+    for start, end, color in runs:
+        if not COLOR_RE.fullmatch(color):
+            problems.append(f"bad color {color!r}")
+        if start < previous_end or end <= start or end > len(content):
+            problems.append(f"bad range {start}-{end}")
+        previous_end = max(previous_end, end)
+        if len(problems) >= 5:
+            break
+    return problems
+
+
+def read_note(path, file_format):
+    """(content, offset runs, number of ranges stored in the file)."""
+    if file_format != "np100":
+        content, runs = read_file(path, file_format)
+        return content, runs, len(runs)
+
+    # Legacy JSON stores one range per coloring action; count them before
+    # runs_from_tag_data compacts them
+    with open(path, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    content = document.get("content", "")
+    tags = document.get("tags", [])
+    positions = runs_from_tag_data(tags)
+    return content, runs_to_offsets(positions, compute_line_starts(content), len(content)), len(tags)
+
+
+# -----------------------------
+# WORKER (one file, separate process)
+# -----------------------------
+def process_note(job):
+    path, options = job
+    t0 = time.perf_counter()
+    result = {"path": path, "size": 0, "status": "ok", "actions": [], "problems": []}
+    try:
+        result["size"] = os.path.getsize(path)
+        file_format = sniff_format(path)
+        result["format"] = file_format
+
+        content, runs, stored_ranges = read_note(path, file_format)
+
+        file_hash = hash_file(path)
+        ops, _ = read_journal(path, file_hash)
+        if ops:
+            content, runs = replay(content, runs, ops)
+            result["actions"].append(f"journal {len(ops)} ops")
+
+        result["problems"] = _check_runs(content, runs)
+        normalized = normalize_runs([(s, e, c.upper()) for s, e, c in runs])
+        if stored_ranges != len(normalized):
+            result["actions"].append(f"ranges {stored_ranges} -> {len(normalized)}")
+
+        target, target_format = path, file_format
+        base, ext = os.path.splitext(path)
+        # Only notes saved by the editor migrate, always to base.mini: a
+        # legacy JSON .mini is converted where it is, a .np100 gets a new
+        # .mini next to it, and any other file is never rewritten as binary
+        if options["migrate"] and file_format == "np100" and ext.lower() in MIGRATE_EXTENSIONS:
+            target_format = "mini"
+            if ext.lower() != ".mini":
+                target = base + ".mini"
+            if target != path and os.path.exists(target):
+                # A .mini at least as new as its .np100 is an earlier migration
+                if os.path.getmtime(target) < os.path.getmtime(path):
+                    raise ValueError(f"{os.path.basename(target)} exists and is older")
+                result["actions"].append("already migrated")
+                target = None
+
+        rewrite = target is not None and (
+            target_format != file_format
+            or (options["normalize"] and (ops or normalized != runs))
+        )
+        if rewrite and not result["problems"] and options["dry_run"]:
+            result["actions"].append(f"would write {os.path.basename(target)} as {target_format}")
+        elif rewrite and not result["problems"]:
+            if is_file_already_open(path):
+                raise ValueError("open in mini_notes")
+            _replace(target, target_format, content, normalized)
+            if ops:
+                discard_journal(path)
+            if target != path:
+                result["actions"].append(f"wrote {os.path.basename(target)}")
+            else:
+                result["actions"].append(f"rewrote as {target_format}")
+                file_hash = hash_file(path)
+
+        if result["problems"]:
+            result["status"] = "invalid"
+        # Hashed here so the parent process never reads the files
+        result["fingerprint"] = fingerprint(path)
+        result["hash"] = file_hash
+    except Exception as e:
+        # One bad note must not take the pool down
+        result["status"] = "error"
+        result["problems"].append(str(e))
+
+    result["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return result
+
+
+# -----------------------------
+# STATE (skip unchanged files)
+# -----------------------------
+def state_path(directory):
+    key = hashlib.sha1(normalize_path(directory).encode("utf-8")).hexdigest()
+    return os.path.join(BATCH_STATE_DIR, key + ".json")
+
+
+def load_state(directory):
+    try:
+        with open(state_path(directory), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(directory, state):
+    path = state_path(directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def is_unchanged(path, entry):
+    current = fingerprint(path)
+    if current == entry["stat"]:
+        return True
+    # Touched but not edited: only the hash can tell
+    if (
+        current[0] == entry["stat"][0]
+        and current[2] == entry["stat"][2]
+        and hash_file(path) == entry["hash"]
+    ):
+        entry["stat"] = current
+        return True
+    return False
+
+
+def remember(state, mode, result):
+    if result["status"] != "ok":
+        state.pop(result["path"], None)
+        return
+    state[result["path"]] = {"mode": mode, "stat": result["fingerprint"], "hash": result["hash"]}
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def format_result(result):
+    line = f"{result['status']:<8}{result['ms']:>9.1f} ms  {result['path']}"
+    details = result["actions"] + result["problems"]
+    if details:
+        line += "  (" + "; ".join(details) + ")"
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="batch.py", description="Validate, normalize and migrate mini_notes files."
+    )
+    parser.add_argument("directory")
+    parser.add_argument("--normalize", action="store_true",
+                        help="rewrite notes whose color ranges are not compacted")
+    parser.add_argument("--migrate", action="store_true",
+                        help="convert legacy JSON .np100/.mini notes to binary .mini v2")
+    parser.add_argument("--dry-run", action="store_true", help="report, never write")
+    parser.add_argument("--force", action="store_true", help="ignore the unchanged-file state")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", action="store_true", help="one JSON object per line")
+    args = parser.parse_args(argv)
+
+    mode = "+".join(
+        name for name in ("normalize", "migrate") if getattr(args, name)
+    ) or "validate"
+    options = {"normalize": args.normalize, "migrate": args.migrate, "dry_run": args.dry_run}
+
+    t0 = time.perf_counter()
+    state = {} if args.force else load_state(args.directory)
+    jobs = []
+    skipped = 0
+    for path in find_notes(args.directory):
+        entry = state.get(path)
+        if entry is not None and entry["mode"] == mode and is_unchanged(path, entry):
+            skipped += 1
+        else:
+            jobs.append((path, options))
+
+    counts = {"ok": 0, "invalid": 0, "error": 0}
+    total_bytes = 0
+
+    def report(result):
+        nonlocal total_bytes
+        counts[result["status"]] += 1
+        total_bytes += result["size"]
+        if not options["dry_run"]:
+            remember(state, mode, result)
+        print(json.dumps(result) if args.json else format_result(result), flush=True)
+
+    try:
+        if args.jobs <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                report(process_note(job))
+        else:
+            with multiprocessing.Pool(args.jobs) as pool:
+                # Small chunks keep results streaming; ordering is not needed
+                for result in pool.imap_unordered(process_note, jobs, chunksize=4):
+                    report(result)
+    finally:
+        # Interrupted runs still remember what they got through
+        if not options["dry_run"]:
+            save_state(args.directory, state)
+
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    summary = {
+        "files": len(jobs),
+        "skipped": skipped,
+        **counts,
+        "seconds": round(elapsed, 3),
+        "files_per_s": round(len(jobs) / elapsed, 1),
+        "mb_per_s": round(total_bytes / elapsed / (1024 * 1024), 2),
+    }
+    if args.json:
+        print(json.dumps({"summary": summary}))
+    else:
+        print(
+            f"{summary['files']} files ({skipped} unchanged skipped): "
+            f"{counts['ok']} ok, {counts['invalid']} invalid, {counts['error']} errors "
+            f"in {summary['seconds']} s — {summary['files_per_s']} files/s, "
+            f"{summary['mb_per_s']} MB/s",
+            file=sys.stderr,
+        )
+    return 1 if counts["invalid"] or counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Measure what an autosave snapshot costs.
+
+For documents of growing size with colored ranges, reports the time spent
+on the Tk thread (reading the text and color runs) and on the worker
+thread (offset conversion and writing the .mini snapshot). Only the first
+number blocks the editor. Needs a display (use xvfb-run on a headless box):
+
+    python benchmarks/bench_autosave.py [max_mb]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import autosave  # noqa: E402
+from editor_ops import apply_color_runs  # noqa: E402
+
+PALETTE = ["#CCCCCC", "#8AB5FF", "#F0E197", "#4CB562", "#DE3B28"]
+LINE = "Get-ChildItem -Path C:\\ -Recurse | Where-Object { $_.Length -gt 1MB }\n"
+
+
+def make_runs(lines, count, seed=1):
+    rng = random.Random(seed)
+    runs = []
+    for line in sorted(rng.sample(range(1, lines + 1), min(count, lines))):
+        col = rng.randint(0, 40)
+        runs.append(((line, col), (line, col + rng.randint(1, 30)), rng.choice(PALETTE)))
+    return runs
+
+
+def main():
+    max_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    autosave.RECOVERY_DIR = tempfile.mkdtemp(prefix="mini_notes_recovery_")
+
+    root = tk.Tk()
+    print(f"{'size':>8}{'runs':>8}{'tk thread (ms)':>16}{'worker (ms)':>13}{'snapshot':>11}")
+
+    mb = 1
+    while mb <= max_mb:
+        lines = mb * 1024 * 1024 // len(LINE)
+        runs = make_runs(lines, lines // 10)
+
+        text = tk.Text(root)
+        text.insert("1.0", LINE * lines)
+        apply_color_runs(text, runs)
+
+        state = {"current_file_path": None, "file_format": "mini"}
+        session = autosave.start_autosave(text, root, state)
+        session["changes"] += 1
+
+        autosave.take_snapshot(text, state)
+        while session["busy"]:
+            time.sleep(0.005)
+
+        size = os.path.getsize(os.path.join(autosave.RECOVERY_DIR, "untitled.mini"))
+        print(
+            f"{mb:>6}MB{len(runs):>8}{session['last_snapshot_ms']:>16.1f}"
+            f"{session['last_write_ms']:>13.1f}{size // 1024:>9}KB"
+        )
+
+        autosave.discard_snapshot(state, None)
+        text.destroy()
+        mb *= 4
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
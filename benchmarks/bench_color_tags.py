@@ -0,0 +1,87 @@
+"""
+Compare the legacy one-tag-per-action coloring with canonical color tags.
+
+Builds a document with 10k colored ranges and reports tag count and the
+time spent applying the colors, listing tags and exporting. Needs a display
+(use xvfb-run on a headless box):
+
+    python benchmarks/bench_color_tags.py [ranges]
+"""
+import json
+import os
+import random
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from editor_ops import export_with_colors, import_with_colors  # noqa: E402
+
+PALETTE = ["#CCCCCC", "#8AB5FF", "#F0E197", "#4CB562", "#DE3B28"]
+
+
+def make_ranges(count, seed=1):
+    rng = random.Random(seed)
+    ranges = []
+    for i in range(count):
+        line = rng.randint(1, count)
+        col = rng.randint(0, 60)
+        length = rng.randint(1, 40)
+        ranges.append((f"{line}.{col}", f"{line}.{col + length}", rng.choice(PALETTE)))
+    return ranges
+
+
+def apply_legacy(text, content, ranges):
+    text.insert("1.0", content)
+    for start, end, color in ranges:
+        tag_name = f"color_{color}_{start}_{end}".replace(".", "_")
+        text.tag_add(tag_name, start, end)
+        text.tag_config(tag_name, foreground=color)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    content = "\n".join(f"{i:06d} " + "Get-ChildItem -Path C:\\ -Recurse " * 3 for i in range(count))
+    ranges = make_ranges(count)
+
+    root = tk.Tk()
+    text = tk.Text(root)
+
+    # Legacy: one tag per range
+    _, legacy_apply = timed(apply_legacy, text, content, ranges)
+    legacy_tags = len([t for t in text.tag_names() if t.startswith("color_")])
+    _, legacy_names = timed(text.tag_names)
+    _, legacy_export = timed(export_with_colors, text)
+
+    # Canonical: compacted on import
+    legacy_doc = {
+        "content": content,
+        "format": "np100",
+        "tags": [{"color": c, "start": s, "end": e} for s, e, c in ranges],
+    }
+    text.destroy()
+    text = tk.Text(root)
+    _, new_apply = timed(import_with_colors, text, json.dumps(legacy_doc))
+    new_tags = len([t for t in text.tag_names() if t.startswith("color_")])
+    _, new_names = timed(text.tag_names)
+    _, new_export = timed(export_with_colors, text)
+
+    root.destroy()
+
+    print(f"{count} colored ranges")
+    print(f"{'':18}{'legacy':>12}{'canonical':>12}")
+    print(f"{'color tags':18}{legacy_tags:>12}{new_tags:>12}")
+    print(f"{'load (ms)':18}{legacy_apply:>12.1f}{new_apply:>12.1f}")
+    print(f"{'tag_names (ms)':18}{legacy_names:>12.2f}{new_names:>12.2f}")
+    print(f"{'export (ms)':18}{legacy_export:>12.1f}{new_export:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Memory and time of dirty tracking.
+
+The old baseline kept the saved document (or its whole JSON export) in
+state["original_content"]; the tracker keeps a 16-byte hash and two
+counters. Reports what each retains, plus the cost of hashing the
+document when a save/load sets the baseline and when an edit forces a
+comparison. Needs a display (use xvfb-run on a headless box):
+
+    python benchmarks/bench_dirty.py [mb]
+"""
+import os
+import random
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dirty import is_dirty, mark_saved, start_dirty_tracking  # noqa: E402
+from editor_ops import apply_color_runs, export_with_colors  # noqa: E402
+from text_hooks import install_change_hook  # noqa: E402
+
+PALETTE = ["#CCCCCC", "#8AB5FF", "#F0E197", "#4CB562", "#DE3B28"]
+LINE = "Get-ChildItem -Path C:\\ -Recurse | Where-Object { $_.Length -gt 1MB }\n"
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    mb = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    lines = mb * 1024 * 1024 // len(LINE)
+    rng = random.Random(1)
+    runs = []
+    for line in range(1, lines + 1, 10):
+        col = rng.randint(0, 40)
+        runs.append(((line, col), (line, col + rng.randint(1, 30)), rng.choice(PALETTE)))
+
+    root = tk.Tk()
+    text = tk.Text(root)
+    install_change_hook(text)
+    text.insert("1.0", LINE * lines)
+    apply_color_runs(text, runs)
+
+    export, export_ms = timed(export_with_colors, text)
+    content = text.get("1.0", "end-1c")
+    old_text = sys.getsizeof(content)
+    old_export = sys.getsizeof(export)
+    del content, export
+
+    state = {}
+    tracker, baseline_ms = timed(start_dirty_tracking, text, state)
+    new_size = sys.getsizeof(tracker) + sum(sys.getsizeof(v) for v in tracker.values())
+
+    text.insert("100.0", "x")
+    dirty, compare_ms = timed(is_dirty, text, state)
+    text.delete("100.0")
+    clean, undo_ms = timed(is_dirty, text, state)
+    _, cached_ms = timed(is_dirty, text, state)
+    _, save_ms = timed(mark_saved, text, state)
+
+    root.destroy()
+
+    print(f"{mb} MB document, {len(runs)} color runs")
+    print(f"retained, old .txt/.mini baseline   {old_text / 1024:>10.0f} KB")
+    print(f"retained, old .np100 baseline       {old_export / 1024:>10.0f} KB"
+          f"  (export {export_ms:.0f} ms)")
+    print(f"retained, hash tracker              {new_size:>10} B")
+    print(f"baseline hash on load/save          {baseline_ms:>10.1f} ms")
+    print(f"is_dirty after an edit ({dirty!s:5})    {compare_ms:>10.1f} ms")
+    print(f"is_dirty after undoing it ({clean!s:5}) {undo_ms:>10.1f} ms")
+    print(f"is_dirty, nothing new since          {cached_ms:>10.3f} ms")
+    print(f"mark_saved                          {save_ms:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cold and warm opens through the parsed-document cache.
+
+Writes colored notes (binary .mini and legacy JSON .np100) of growing
+size, then opens each one with load_file: cold (cache emptied first),
+and warm (served from the cache: no parsing, no baseline hash). The cache
+lives in a temporary directory. Needs a display (use xvfb-run on a
+headless box):
+
+    python benchmarks/bench_doc_cache.py [max_mb]
+"""
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import doc_cache  # noqa: E402
+from color_runs import compute_line_starts, runs_to_positions  # noqa: E402
+from dirty import start_dirty_tracking  # noqa: E402
+from editor_ops import export_with_colors, import_with_colors  # noqa: E402
+from file_ops import load_file  # noqa: E402
+from mini_format import dump_legacy, save_document  # noqa: E402
+from text_hooks import install_change_hook  # noqa: E402
+
+PALETTE = ["#CCCCCC", "#8AB5FF", "#F0E197", "#4CB562", "#DE3B28"]
+LINE = "Get-ChildItem -Path C:\\ -Recurse | Where-Object { $_.Length -gt 1MB }\n"
+REPEAT = 3
+
+
+def make_note(mb):
+    """(content, offset runs): a colored range on every other line."""
+    lines = mb * 1024 * 1024 // len(LINE)
+    rng = random.Random(1)
+    runs = []
+    for line in range(0, lines, 2):
+        start = line * len(LINE) + rng.randint(0, 30)
+        runs.append((start, start + rng.randint(3, 30), rng.choice(PALETTE)))
+    return LINE * lines, runs
+
+
+def main():
+    max_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    workdir = tempfile.mkdtemp(prefix="mini_notes_cache_bench_")
+    doc_cache.DOC_CACHE_DIR = os.path.join(workdir, "documents")
+
+    root = tk.Tk()
+    text = tk.Text(root)
+    install_change_hook(text)
+
+    def load(path):
+        state = {"file_format": "txt", "current_file_path": None}
+        start_dirty_tracking(text, state)
+        t0 = time.perf_counter()
+        load_file(path, text, root, state, import_with_colors, export_with_colors)
+        return (time.perf_counter() - t0) * 1000
+
+    def wait_for_store(stores):
+        while doc_cache.STATS["stores"] == stores:
+            time.sleep(0.01)
+
+    print(f"{'note':<24}{'cold ms':>10}{'warm ms':>10}{'speedup':>9}")
+    mb = 1
+    while mb <= max_mb:
+        content, runs = make_note(mb)
+        mini_path = os.path.join(workdir, f"note_{mb}mb.mini")
+        save_document(mini_path, content, runs)
+        legacy_path = os.path.join(workdir, f"note_{mb}mb.np100")
+        with open(legacy_path, "w", encoding="utf-8") as f:
+            f.write(dump_legacy(content, runs_to_positions(runs, compute_line_starts(content))))
+
+        for path in (mini_path, legacy_path):
+            cold = []
+            for _ in range(REPEAT):
+                doc_cache.discard_cached(path)
+                stores = doc_cache.STATS["stores"]
+                cold.append(load(path))
+                wait_for_store(stores)
+            warm = [load(path) for _ in range(REPEAT)]
+            cold_ms, warm_ms = statistics.median(cold), statistics.median(warm)
+            print(
+                f"{os.path.basename(path):<24}{cold_ms:>10.0f}{warm_ms:>10.0f}"
+                f"{cold_ms / max(warm_ms, 1e-9):>8.1f}x"
+            )
+        mb *= 4
+
+    stats = doc_cache.cache_stats()
+    print(
+        f"\ncache: {stats['hits']} hits, {stats['misses']} misses, {stats['stores']} stores,"
+        f" {stats['evicted']} evicted; {stats['entries']} entries,"
+        f" {stats['bytes'] // 1024} KB of {stats['budget_bytes'] // 1024} KB"
+    )
+    root.destroy()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+The headless document model on a large colored note.
+
+Times, on an N MB script (default 20) with a color run on every tenth
+line, each document.py operation: reading and writing .mini and legacy
+JSON, finding, replacing and coloring every match, and single edits in
+the middle of the note. No Tk involved, so no display needed:
+
+    python benchmarks/bench_document.py [mb]
+"""
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import document  # noqa: E402
+
+PALETTE = ["#CCCCCC", "#8AB5FF", "#F0E197", "#4CB562", "#DE3B28"]
+LINE = "Get-ChildItem -Path C:\\ -Recurse | Where-Object { $_.Length -gt 1MB }\n"
+EDITS = 100
+REGEX = {"regex": True, "ignore_case": False, "whole_word": False}
+
+
+def make_note(mb):
+    lines = mb * 1024 * 1024 // len(LINE)
+    rng = random.Random(1)
+    runs = []
+    for line in range(0, lines, 10):
+        start = line * len(LINE) + rng.randint(0, 30)
+        runs.append((start, start + rng.randint(3, 30), rng.choice(PALETTE)))
+    return document.new_document(LINE * lines, runs)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def per_edit(fn):
+    """Median ms of EDITS calls of fn(i)."""
+    times = []
+    for i in range(EDITS):
+        t0 = time.perf_counter()
+        fn(i)
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    mb = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    workdir = tempfile.mkdtemp(prefix="mini_notes_document_bench_")
+    note = make_note(mb)
+    print(f"{mb} MB note, {len(document.document_runs(note))} color runs")
+
+    rows = []
+    for name in ("note.mini", "note.np100"):
+        path = os.path.join(workdir, name)
+        _, write_ms = timed(document.document_to_file, note, path)
+        _, read_ms = timed(document.document_from_file, path)
+        rows.append((f"write {name}", write_ms))
+        rows.append((f"read {name}", read_ms))
+    rows.append(("to .mini bytes", timed(document.document_to_bytes, note)[1]))
+    rows.append(("to legacy JSON", timed(document.document_to_legacy, note)[1]))
+
+    (starts, _), find_ms = timed(document.find_all, note, "Where-Object")
+    rows.append((f"find_all ({len(starts)} matches)", find_ms))
+
+    for label, query, replacement, options in [
+        ("literal", "Where-Object", "?", None),
+        ("regex", r"\$(\w+)\.", r"$PSItem\1.", REGEX),
+    ]:
+        copy = document.new_document(document.document_text(note), document.document_runs(note))
+        count, ms = timed(document.replace_all, copy, query, replacement, options)
+        rows.append((f"replace_all {label} ({count})", ms))
+
+    copy = document.new_document(document.document_text(note), document.document_runs(note))
+    count, ms = timed(document.color_matches, copy, "Recurse", PALETTE[4])
+    rows.append((f"color_matches ({count})", ms))
+
+    middle = len(document.document_text(note)) // 2
+    rows.append(("insert_text, per edit", per_edit(
+        lambda i: document.insert_text(copy, middle + i, "x")
+    )))
+    rows.append(("delete_text, per edit", per_edit(
+        lambda i: document.delete_text(copy, middle, middle + 1)
+    )))
+    rows.append(("recolor, per edit", per_edit(
+        lambda i: document.recolor(copy, middle + i * 10, middle + i * 10 + 5, PALETTE[i % 5])
+    )))
+
+    for name, ms in rows:
+        print(f"  {name:<34}{ms:>10.1f} ms")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
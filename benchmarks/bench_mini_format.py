@@ -0,0 +1,96 @@
+"""
+Size and parse-time comparison of legacy JSON .mini files and the binary
+v2 container. Runs headless:
+
+    python benchmarks/bench_mini_format.py [ranges]
+"""
+import io
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from color_runs import compute_line_starts, runs_to_offsets, runs_to_positions  # noqa: E402
+from mini_format import iter_document, runs_from_tag_data, write_document  # noqa: E402
+
+PALETTE = ["#CCCCCC", "#8AB5FF", "#F0E197", "#4CB562", "#DE3B28"]
+
+
+def make_document(lines, ranges, seed=1):
+    rng = random.Random(seed)
+    content = "\n".join(
+        f"{i:06d} Get-ChildItem -Path C:\\Logs -Filter *.log | Select-Object -First {i % 50}"
+        for i in range(lines)
+    )
+    line_starts = compute_line_starts(content)
+    runs = []
+    for line in sorted(rng.sample(range(1, lines + 1), min(ranges, lines))):
+        col = rng.randint(0, 40)
+        runs.append(((line, col), (line, col + rng.randint(1, 30)), rng.choice(PALETTE)))
+    return content, runs_to_offsets(runs, line_starts, len(content)), runs
+
+
+def legacy_bytes(content, positions):
+    tags = [
+        {"color": c, "start": f"{s[0]}.{s[1]}", "end": f"{e[0]}.{e[1]}"}
+        for s, e, c in positions
+    ]
+    document = {"content": content, "format": "np100", "tags": tags}
+    return json.dumps(document, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def parse_legacy(data):
+    document = json.loads(data.decode("utf-8"))
+    return document["content"], runs_from_tag_data(document["tags"])
+
+
+def v2_bytes(content, runs, compression):
+    out = io.BytesIO()
+    write_document(out, [content], runs, compression)
+    return out.getvalue()
+
+
+def parse_v2(data):
+    parts, runs = [], []
+    for kind, value in iter_document(io.BytesIO(data)):
+        (parts if kind == "text" else runs).append(value)
+    content = "".join(parts)
+    # Include the conversion the editor does before tagging
+    return content, runs_to_positions(runs, compute_line_starts(content))
+
+
+def best_of(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        elapsed = (time.perf_counter() - t0) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    ranges = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lines = max(ranges, 1000)
+    content, runs, positions = make_document(lines, ranges)
+    print(f"{lines} lines, {len(runs)} color runs, {len(content) / 1e6:.1f} M chars\n")
+    print(f"{'format':14}{'size (KB)':>12}{'write (ms)':>12}{'parse (ms)':>12}")
+
+    data = legacy_bytes(content, positions)
+    write_ms = best_of(legacy_bytes, content, positions)
+    parse_ms = best_of(parse_legacy, data)
+    print(f"{'json (legacy)':14}{len(data) / 1024:>12.0f}{write_ms:>12.1f}{parse_ms:>12.1f}")
+
+    for compression in ("none", "zlib", "lzma"):
+        data = v2_bytes(content, runs, compression)
+        write_ms = best_of(v2_bytes, content, runs, compression)
+        parse_ms = best_of(parse_v2, data)
+        label = f"v2 {compression}"
+        print(f"{label:14}{len(data) / 1024:>12.0f}{write_ms:>12.1f}{parse_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Cost of the minimap on a large colored document.
+
+Builds an editor (Text + scroll canvas) holding an N MB script (default
+20) with a color run on every tenth line, turns the minimap on and times:
+the first full strip (counted and shaded on the worker), a keystroke with
+the minimap off and on, and the throttled update that follows typing
+inside a line, typing a newline and coloring a block of lines. Needs a
+display (use xvfb-run on a headless box):
+
+    python benchmarks/bench_minimap.py [mb]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import minimap  # noqa: E402
+from editor_ops import apply_color_runs  # noqa: E402
+from text_hooks import install_change_hook  # noqa: E402
+from ui import build_editor  # noqa: E402
+
+PALETTE = ["#CCCCCC", "#8AB5FF", "#F0E197", "#4CB562", "#DE3B28"]
+LINE = "Get-ChildItem -Path C:\\ -Recurse | Where-Object { $_.Length -gt 1MB }\n"
+KEYSTROKES = 200
+
+
+def settle(root, mm):
+    """Run the event loop until the minimap has nothing left to do."""
+    while True:
+        root.update()
+        if mm["busy"] is None and mm["after_id"] is None and mm["dirty"] is None:
+            return
+        time.sleep(0.001)
+
+
+def keystroke_ms(root, text, line):
+    times = []
+    for i in range(KEYSTROKES):
+        t0 = time.perf_counter()
+        text.insert(f"{line}.0", "x")
+        times.append((time.perf_counter() - t0) * 1000)
+    text.delete(f"{line}.0", f"{line}.{KEYSTROKES}")
+    return statistics.median(times)
+
+
+def timed_update(root, mm, edit):
+    """Apply edit, then time the minimap's deferred update on its own."""
+    edit()
+    after_id = mm["after_id"]
+    if after_id is not None:
+        mm["text"].after_cancel(after_id)
+    t0 = time.perf_counter()
+    minimap._update(mm)
+    tk_ms = (time.perf_counter() - t0) * 1000
+    settle(root, mm)
+    return tk_ms, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    mb = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    lines = mb * 1024 * 1024 // len(LINE)
+    rng = random.Random(1)
+    runs = []
+    for line in range(1, lines + 1, 10):
+        col = rng.randint(0, 40)
+        runs.append(((line, col), (line, col + rng.randint(1, 30)), rng.choice(PALETTE)))
+
+    root = tk.Tk()
+    editor = build_editor(root)
+    editor["frame"].pack(expand=True, fill="both")
+    text = editor["text"]
+    install_change_hook(text)
+    text.insert("1.0", LINE * lines)
+    apply_color_runs(text, runs)
+    root.update()
+    state = {"scrollbar": {"canvas": editor["scroll_canvas"], "bar": editor["thumb_bar"]}}
+
+    middle = lines // 2
+    off_ms = keystroke_ms(root, text, middle)
+
+    t0 = time.perf_counter()
+    mm = minimap.start_minimap(text, state)
+    settle(root, mm)
+    first_ms = (time.perf_counter() - t0) * 1000
+    on_ms = keystroke_ms(root, text, middle)
+    settle(root, mm)
+
+    print(f"{mb} MB document, {lines} lines, {len(runs)} color runs, {len(mm['items'])} rows")
+    print(f"first strip (worker)               {first_ms:>10.0f} ms")
+    print(f"keystroke, minimap off             {off_ms:>10.3f} ms")
+    print(f"keystroke, minimap on              {on_ms:>10.3f} ms")
+    print(f"{'update after':<35}{'Tk thread':>10}{'total':>10}")
+    cases = [
+        ("typing inside a line", lambda: text.insert(f"{middle}.5", "abc")),
+        ("a newline", lambda: text.insert(f"{middle}.5", "\n")),
+        ("coloring 100 lines", lambda: text.tag_add(
+            "color_#DE3B28", f"{middle}.0", f"{middle + 100}.0"
+        )),
+    ]
+    for name, edit in cases:
+        tk_ms, total_ms = timed_update(root, mm, edit)
+        print(f"  {name:<33}{tk_ms:>10.1f}{total_ms:>10.1f}")
+
+    minimap.stop_minimap(state)
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
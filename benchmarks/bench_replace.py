@@ -0,0 +1,120 @@
+"""
+Find and replace on a large colored document.
+
+Times, on a Text holding an N MB script (default 50) with a color run on
+every tenth line: finding every match off the Tk thread, replace all
+(snapshot, background planning, applying the edits on the Tk thread) and
+undoing it, for a literal, a whole-word/ignore-case and a regex query.
+Needs a display (use xvfb-run on a headless box):
+
+    python benchmarks/bench_replace.py [mb]
+"""
+import os
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import replace  # noqa: E402
+from editor_ops import apply_color_runs, get_color_runs  # noqa: E402
+from search_engine import create_search_state, run_search  # noqa: E402
+from text_hooks import install_change_hook  # noqa: E402
+from undo import start_undo, undo  # noqa: E402
+
+LINE = "Get-ChildItem -Path C:\\ -Recurse | Where-Object { $_.Length -gt 1MB }\n"
+CASES = [
+    ("literal", "Where-Object", {"regex": False, "ignore_case": False, "whole_word": False}, "?"),
+    ("word, any case", "path", {"regex": False, "ignore_case": True, "whole_word": True}, "LiteralPath"),
+    ("regex", r"\$(\w+)\.", {"regex": True, "ignore_case": False, "whole_word": False}, r"$PSItem\1."),
+]
+
+
+class Entry:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def wait(root, done):
+    while not done():
+        root.update()
+        time.sleep(0.001)
+
+
+def timed_calls(module, names):
+    """Wrap module functions to accumulate their time in ms."""
+    spent = {name: 0.0 for name in names}
+    for name in names:
+        fn = getattr(module, name)
+
+        def wrapper(*args, _fn=fn, _name=name):
+            t0 = time.perf_counter()
+            try:
+                return _fn(*args)
+            finally:
+                spent[_name] += (time.perf_counter() - t0) * 1000
+        setattr(module, name, wrapper)
+    return spent
+
+
+def main():
+    mb = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    lines = mb * 1024 * 1024 // len(LINE)
+    runs = [((line, 0), (line, 13), "#8AB5FF") for line in range(1, lines + 1, 10)]
+
+    root = tk.Tk()
+    text = tk.Text(root)
+    text.pack()
+    install_change_hook(text)
+    state = {}
+    start_undo(text, state)
+    label = tk.Label(root)
+    spent = timed_calls(replace, ["plan_replacements", "_apply_edits"])
+
+    print(f"{mb} MB document, {lines} lines, {len(runs)} color runs")
+    for name, query, options, replacement in CASES:
+        text.delete("1.0", "end")
+        text.insert("1.0", LINE * lines)
+        apply_color_runs(text, runs)
+        root.update()
+        state["undo"]["undo"].clear()
+        before_runs = len(get_color_runs(text))
+
+        search = create_search_state(text, Entry(query), label, dict(options))
+        text.mark_set("insert", "1.0")
+        t0 = time.perf_counter()
+        run_search(search)
+        wait(root, lambda: search["key"] is not None)
+        find_ms = (time.perf_counter() - t0) * 1000
+
+        for key in spent:
+            spent[key] = 0.0
+        t0 = time.perf_counter()
+        replace.replace_all(search, state, replacement)
+        wait(root, lambda: search["replace_job"] is None)
+        replace_ms = (time.perf_counter() - t0) * 1000
+        root.update()
+        steps = len(state["undo"]["undo"])
+
+        t0 = time.perf_counter()
+        undo(text, state)
+        undo_ms = (time.perf_counter() - t0) * 1000
+        restored = len(get_color_runs(text)) == before_runs
+
+        print(f"\n{name}: {query!r} -> {replacement!r}")
+        print(f"  find ({len(search['matches'])} matches)  {find_ms:>10.0f} ms")
+        print(f"  replace all ({label.cget('text')})")
+        print(f"    total                     {replace_ms:>10.0f} ms")
+        print(f"    planning (worker)         {spent['plan_replacements']:>10.0f} ms")
+        print(f"    applying (Tk thread)      {spent['_apply_edits']:>10.0f} ms")
+        print(f"    undo steps                {steps:>10}")
+        print(f"  undo                        {undo_ms:>10.0f} ms  (colors restored: {restored})")
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold-start timing: time-to-first-paint and time-to-interactive.
+
+Launches `python main.py <file>` repeatedly for an empty note, a 1 MB .txt
+and a heavily colored .mini, and reads the milestones the app prints when
+MINI_NOTES_STARTUP_TRACE is set ("first_paint" once the editor with its
+file has been drawn, "interactive" once menus and services are up; the app
+then quits by itself). Times are from process launch. Each run gets its
+own TMPDIR so the single-instance socket and file locks never interfere.
+Needs a display (use xvfb-run on a headless box):
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mini_format import save_document  # noqa: E402
+
+PALETTE = ["#CCCCCC", "#8AB5FF", "#F0E197", "#4CB562", "#DE3B28"]
+LINE = "Get-ChildItem -Path C:\\ -Recurse | Where-Object { $_.Length -gt 1MB }\n"
+
+
+def make_files(directory):
+    txt = os.path.join(directory, "one_mb.txt")
+    with open(txt, "w", encoding="utf-8") as f:
+        f.write(LINE * (1024 * 1024 // len(LINE)))
+
+    # ~1 MB with a colored range every 20 characters
+    content = LINE * (1024 * 1024 // len(LINE))
+    rng = random.Random(1)
+    runs = [
+        (start, start + rng.randint(3, 15), rng.choice(PALETTE))
+        for start in range(0, len(content) - 20, 20)
+    ]
+    mini = os.path.join(directory, "colored.mini")
+    save_document(mini, content, runs)
+
+    return [("empty note", None), ("1 MB .txt", txt), (f"colored .mini ({len(runs)} runs)", mini)]
+
+
+def launch(file_path):
+    env = dict(os.environ, MINI_NOTES_STARTUP_TRACE="1", TMPDIR=tempfile.mkdtemp())
+    args = [sys.executable, os.path.join(ROOT, "main.py")]
+    if file_path:
+        args.append(file_path)
+
+    t0 = time.time()
+    out = subprocess.run(args, env=env, capture_output=True, text=True, timeout=120).stdout
+    marks = dict(line.split() for line in out.splitlines() if line.count(" ") == 1)
+    return (
+        (float(marks["first_paint"]) - t0) * 1000,
+        (float(marks["interactive"]) - t0) * 1000,
+    )
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    directory = tempfile.mkdtemp(prefix="mini_notes_startup_")
+
+    print(f"median of {runs} runs (ms from launch)")
+    print(f"{'':34}{'first paint':>12}{'interactive':>13}")
+    for label, path in make_files(directory):
+        samples = [launch(path) for _ in range(runs)]
+        paint = statistics.median(s[0] for s in samples)
+        ready = statistics.median(s[1] for s in samples)
+        print(f"{label:34}{paint:>12.0f}{ready:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Benchmark suite: load, save, export, import, search and coloring at scale.
+
+Generates synthetic documents (plain text from 1 KB to 100 MB, .mini notes
+with 10 to 100k color ranges), times the editor's own entry points against
+a real Tk Text and writes the results as JSON:
+
+    python benchmarks/suite.py run [--out results.json] [--quick] [--repeat N]
+    python benchmarks/suite.py compare old.json new.json [--threshold 10]
+
+`run` needs an X display; on a headless box it re-executes itself under
+`xvfb-run -a` when that is installed. `--quick` stops at 1 MB / 10k ranges.
+`compare` prints every case side by side and exits with status 1 when any
+case got slower by more than the threshold (percent, and at least 1 ms).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LINE = "Get-ChildItem -Path C:\\ -Recurse | Where-Object { $_.Length -gt 1MB }\n"
+PALETTE = ["#CCCCCC", "#8AB5FF", "#F0E197", "#4CB562", "#DE3B28"]
+
+KB = 1024
+MB = 1024 * KB
+TEXT_SIZES = [KB, 100 * KB, MB, 10 * MB, 100 * MB]
+RANGE_COUNTS = [10, 1000, 10_000, 100_000]
+QUICK_TEXT_LIMIT = MB
+QUICK_RANGE_LIMIT = 10_000
+
+# Cases on documents at least this big run once whatever --repeat says
+SINGLE_RUN_BYTES = 10 * MB
+
+
+def size_label(size):
+    return f"{size // MB}MB" if size >= MB else f"{size // KB}KB"
+
+
+# -----------------------------
+# SYNTHETIC DOCUMENTS
+# -----------------------------
+def make_text(size):
+    return (LINE * (size // len(LINE) + 1))[:size]
+
+
+def make_colored(count, seed=1):
+    """(content, offset runs): one colored range per line, at least 1000 lines."""
+    content = LINE * max(count, 1000)
+    rng = random.Random(seed)
+    lines = sorted(rng.sample(range(max(count, 1000)), count))
+    runs = []
+    for line in lines:
+        start = line * len(LINE) + rng.randint(0, 30)
+        runs.append((start, start + rng.randint(3, 30), rng.choice(PALETTE)))
+    return content, runs
+
+
+# -----------------------------
+# TIMING
+# -----------------------------
+def measure(results, name, fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    results[name] = {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "runs": len(samples),
+    }
+    print(f"  {name:42}{results[name]['median_ms']:>12.1f} ms", flush=True)
+
+
+def run_suite(args):
+    import tkinter as tk
+
+    import doc_cache
+    from editor_ops import change_text_color, export_with_colors, import_with_colors, search_text
+    from file_ops import _perform_save, get_current_content, load_file
+    from mini_format import dump_legacy, save_document
+    from color_runs import compute_line_starts, runs_to_positions
+    from search_engine import create_search_state, run_search
+    from text_hooks import install_change_hook
+    from ui import build_search_bar, build_ui
+
+    root = tk.Tk()
+    ui = build_ui(root)
+    text = ui["text"]
+    install_change_hook(text)
+    search_bar = build_search_bar(root)
+    search_state = create_search_state(text, search_bar["search_entry"], search_bar["search_count"])
+    root.update()
+
+    workdir = tempfile.mkdtemp(prefix="mini_notes_bench_")
+    doc_cache.DOC_CACHE_DIR = os.path.join(workdir, "documents")
+    results = {}
+
+    def new_state():
+        return {"file_format": "txt", "current_file_path": None}
+
+    def load(path):
+        load_file(path, text, root, new_state(), import_with_colors, export_with_colors)
+
+    def cached_load(path):
+        """Load once and wait for the parsed-document cache to be written."""
+        stores = doc_cache.STATS["stores"]
+        load(path)
+        deadline = time.perf_counter() + 60
+        while doc_cache.STATS["stores"] == stores and time.perf_counter() < deadline:
+            time.sleep(0.01)
+
+    def save(path):
+        state = new_state()
+        _perform_save(path, text, state, export_with_colors, get_current_content)
+
+    def search(query):
+        # Typing ends in search_text; the debounce delay itself is not timed
+        search_state["query"] = ""
+        search_state["key"] = None
+        entry = search_bar["search_entry"]
+        entry.delete(0, "end")
+        entry.insert(0, query)
+        search_text(None, search_state)
+        text.after_cancel(search_state["after_id"])
+        run_search(search_state)
+        while search_state["query"] != query:
+            root.update()
+            time.sleep(0.001)
+
+    def recolor():
+        text.tag_remove("sel", "1.0", "end")
+        text.tag_add("sel", "1.0 + 1 lines", "end - 1 lines")
+        change_text_color(text, PALETTE[1])
+
+    sizes = [s for s in TEXT_SIZES if not args.quick or s <= QUICK_TEXT_LIMIT]
+    counts = [c for c in RANGE_COUNTS if not args.quick or c <= QUICK_RANGE_LIMIT]
+
+    print("plain text")
+    for size in sizes:
+        label = size_label(size)
+        repeat = 1 if size >= SINGLE_RUN_BYTES else args.repeat
+        path = os.path.join(workdir, f"doc_{label}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_text(size))
+
+        measure(results, f"load_file/txt/{label}", lambda: load(path), repeat)
+        measure(results, f"_perform_save/txt/{label}", lambda: save(path), repeat)
+        measure(results, f"search_text/txt/{label}", lambda: search("Where-Object"), repeat)
+        measure(results, f"change_text_color/txt/{label}", recolor, repeat, setup=lambda: load(path))
+        text.delete("1.0", "end")
+
+    print("colored notes")
+    for count in counts:
+        content, runs = make_colored(count)
+        repeat = 1 if len(content) >= SINGLE_RUN_BYTES else args.repeat
+        mini_path = os.path.join(workdir, f"colored_{count}.mini")
+        save_document(mini_path, content, runs)
+        legacy = dump_legacy(content, runs_to_positions(runs, compute_line_starts(content)))
+
+        measure(
+            results, f"load_file/mini/{count}", lambda: load(mini_path), repeat,
+            setup=lambda: doc_cache.discard_cached(mini_path),
+        )
+        if doc_cache.is_cacheable(mini_path, "mini"):
+            cached_load(mini_path)
+            measure(results, f"load_file/mini/{count}/cached", lambda: load(mini_path), repeat)
+        measure(results, f"_perform_save/mini/{count}", lambda: save(mini_path), repeat)
+        measure(results, f"export_with_colors/{count}", lambda: export_with_colors(text), repeat)
+        measure(
+            results, f"import_with_colors/{count}",
+            lambda: import_with_colors(text, legacy), repeat,
+        )
+        measure(results, f"search_text/mini/{count}", lambda: search("Recurse"), repeat)
+        measure(
+            results, f"change_text_color/mini/{count}", recolor, repeat,
+            setup=lambda: load(mini_path),
+        )
+        text.delete("1.0", "end")
+
+    root.destroy()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# -----------------------------
+# RESULTS
+# -----------------------------
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def cmd_run(args):
+    if not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        if os.environ.get("MINI_NOTES_BENCH_XVFB") or not shutil.which("xvfb-run"):
+            sys.exit("No display: run under xvfb-run (apt install xvfb).")
+        env = dict(os.environ, MINI_NOTES_BENCH_XVFB="1")
+        sys.exit(subprocess.call(["xvfb-run", "-a", sys.executable] + sys.argv, env=env))
+
+    import tkinter
+
+    document = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "tk": tkinter.TkVersion,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": args.quick,
+            "repeat": args.repeat,
+        },
+        "results": run_suite(args),
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"results written to {args.out}")
+
+
+def cmd_compare(args):
+    with open(args.old, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"old: {old['meta'].get('commit')}  {old['meta'].get('time')}")
+    print(f"new: {new['meta'].get('commit')}  {new['meta'].get('time')}")
+    print(f"{'case':42}{'old ms':>11}{'new ms':>11}{'change':>9}")
+
+    regressions = 0
+    names = sorted(set(old["results"]) | set(new["results"]))
+    for name in names:
+        a = old["results"].get(name, {}).get("median_ms")
+        b = new["results"].get(name, {}).get("median_ms")
+        if a is None or b is None:
+            print(f"{name:42}{a if a is not None else '-':>11}{b if b is not None else '-':>11}")
+            continue
+
+        change = (b - a) / a * 100 if a else 0.0
+        flag = ""
+        if change > args.threshold and b - a >= 1.0:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold and a - b >= 1.0:
+            flag = "  faster"
+        print(f"{name:42}{a:>11.1f}{b:>11.1f}{change:>+8.0f}%{flag}")
+
+    print(f"{regressions} regression(s) over {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite and write JSON results")
+    run.add_argument("--out", default="bench_results.json")
+    run.add_argument("--quick", action="store_true", help="stop at 1 MB / 10k ranges")
+    run.add_argument("--repeat", type=int, default=3, help="runs per case (median reported)")
+    run.set_defaults(func=cmd_run)
+
+    compare = commands.add_parser("compare", help="diff two result files")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=10.0, help="percent")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# chunked_load.py
+import os
+import queue
+import threading
+import time
+from array import array
+
+from color_runs import extend_line_starts, runs_to_positions
+from config import LOAD_CHUNK_CHARS, LOAD_RUN_BATCH, LOAD_TICK_BUDGET_MS
+from formats import stream_file
+from editor_ops import apply_color_runs, color_tags
+from autosave import mark_clean
+from dirty import mark_saved, saved_hash
+from doc_cache import cache_store, discard_cached, file_stat, is_cacheable, stream_cached
+from instrument import record_document_memory
+from journal import resume_journal
+from locks import remove_file_lock
+from undo import reset_undo
+from watcher import watch_synced
+from workspace_index import index_file
+
+
+# -----------------------------
+# CHUNKED LOADING
+# -----------------------------
+# A worker thread reads and decodes the file; the Tk thread only ever
+# inserts bounded chunks from an `after` callback, so the window keeps
+# repainting and the first screen is readable while the rest streams in.
+# With a parsed-document cache hit (doc_cache.py) the cached copy is
+# streamed instead; on a miss the decoded text is kept to fill the cache.
+#
+# Color runs travel down the same queue, each sent as soon as the text it
+# covers has been, so what is on screen is colored while the rest loads.
+
+
+def start_chunked_load(file_path, text, root, state, file_format, cached=None):
+    """file_format is any name registered in formats; cached is a cache_lookup() hit."""
+    cancel_chunked_load(state)
+
+    job = {
+        "path": file_path,
+        "format": file_format,
+        "cached": cached,
+        "stat": file_stat(file_path),
+        "size": max(os.path.getsize(file_path), 1),
+        "bytes_read": 0,
+        "chunks": queue.Queue(maxsize=16),
+        "cancelled": False,
+        "error": None,
+        # What was read, for the cache
+        "pieces": [] if cached is None and is_cacheable(file_path, file_format) else None,
+        "offset_runs": None,
+    }
+    state["loading"] = job
+
+    text.configure(state="normal")
+    text.delete("1.0", "end")
+    for tag in color_tags(text):
+        text.tag_delete(tag)
+    text.configure(state="disabled")
+
+    root.title(f"mini_notes - {os.path.basename(file_path)} (loading…)")
+    _show_progress(state, 0.0)
+
+    threading.Thread(target=_read, args=(job,), daemon=True).start()
+    root.after(1, lambda: _pump(job, text, root, state))
+
+
+def cancel_chunked_load(state):
+    job = state.get("loading")
+    if job is not None:
+        job["cancelled"] = True
+
+
+# -----------------------------
+# WORKERS (background thread)
+# -----------------------------
+def _put(job, item):
+    # Bounded queue: block while the Tk side catches up, but stay cancellable
+    while not job["cancelled"]:
+        try:
+            job["chunks"].put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def _read(job):
+    try:
+        line_starts = array("q", [0])
+        offset = 0
+        runs = []
+        sent = 0  # runs[:sent] are queued
+
+        def send_runs(limit):
+            # Runs lying within the first `limit` characters, all queued
+            nonlocal sent
+            stop = sent
+            while stop < len(runs) and runs[stop][1] <= limit:
+                stop += 1
+            if stop > sent:
+                _put(job, ("runs", runs_to_positions(runs[sent:stop], line_starts)))
+                sent = stop
+
+        if job["cached"] is not None:
+            items = stream_cached(job["cached"]["document"])
+        else:
+            items = stream_file(job["path"], job["format"])
+        for item in items:
+            if job["cancelled"]:
+                break
+            if item[0] == "run":
+                runs.append(item[1])
+                if len(runs) - sent >= LOAD_RUN_BATCH:
+                    send_runs(offset)
+                continue
+            _, chunk, job["bytes_read"] = item
+            for i in range(0, len(chunk), LOAD_CHUNK_CHARS):
+                piece = chunk[i:i + LOAD_CHUNK_CHARS]
+                if job["pieces"] is not None:
+                    job["pieces"].append(piece)
+                line_starts = extend_line_starts(line_starts, piece, offset)
+                offset += len(piece)
+                _put(job, ("text", piece))
+                send_runs(offset)
+        send_runs(offset)
+        job["offset_runs"] = runs
+    except Exception as e:
+        job["error"] = e
+    _put(job, None)
+
+
+# -----------------------------
+# TK SIDE
+# -----------------------------
+def _pump(job, text, root, state):
+    if job["cancelled"]:
+        _finish(job, text, root, state, cancelled=True)
+        return
+
+    deadline = time.perf_counter() + LOAD_TICK_BUDGET_MS / 1000
+    while time.perf_counter() < deadline:
+        try:
+            chunk = job["chunks"].get_nowait()
+        except queue.Empty:
+            break
+
+        if chunk is None:
+            _finish(job, text, root, state)
+            return
+
+        kind, value = chunk
+        if kind == "text":
+            _insert_chunk(text, value)
+        else:
+            apply_color_runs(text, value)  # their text is already in
+
+    _show_progress(state, job["bytes_read"] / job["size"])
+    root.after(1, lambda: _pump(job, text, root, state))
+
+
+def _insert_chunk(text, chunk):
+    text.configure(state="normal")
+    text.insert("end", chunk)
+    text.configure(state="disabled")
+    text.edit_modified(False)
+
+
+def _finish(job, text, root, state, cancelled=False):
+    if state.get("loading") is not job:
+        return  # superseded by another load, which owns the widget now
+    state["loading"] = None
+    _hide_progress(state)
+
+    text.configure(state="normal")
+    name = os.path.basename(job["path"])
+
+    replayed = False
+    if job["error"] is not None:
+        if job["cached"] is not None:
+            discard_cached(job["path"])  # fall back to the file next time
+        text.delete("1.0", "end")
+        text.insert("1.0", f"Error opening file: {job['error']}")
+        state["file_format"] = "txt"
+        state["current_file_path"] = None
+        remove_file_lock(job["path"])
+        root.title("mini_notes")
+    elif cancelled:
+        # Keep what arrived, but never let a save truncate the real file
+        state["file_format"] = job["format"]
+        state["current_file_path"] = None
+        remove_file_lock(job["path"])
+        root.title(f"mini_notes - {name} (partial)")
+    else:
+        state["file_format"] = job["format"]
+        state["current_file_path"] = job["path"]
+        replayed = resume_journal(text, state, job["path"], job["format"])
+        root.title(f"mini_notes - {name}")
+
+    reset_undo(state)
+    cached = job["cached"]
+    if cached is not None and job["error"] is None and not cancelled and not replayed:
+        mark_saved(text, state, known_hash=cached["document_hash"])
+    else:
+        mark_saved(text, state)
+    if job["pieces"] is not None and job["error"] is None and not cancelled:
+        cache_store(
+            job["path"], job["format"], job["stat"], job["pieces"], job["offset_runs"],
+            None if replayed else saved_hash(state),
+        )
+    job["pieces"] = None
+    watch_synced(state)
+    mark_clean(state)
+    if job["error"] is None and not cancelled:
+        record_document_memory(job["path"])
+        index_file(state.get("index"), job["path"])
+
+
+def _show_progress(state, fraction):
+    status = state.get("status")
+    if status is None:
+        return
+    status["label"].config(text=f"Loading… {min(fraction, 1.0):.0%}")
+    if not status["frame"].winfo_manager():
+        status["frame"].pack(side="bottom", fill="x")
+
+
+def _hide_progress(state):
+    status = state.get("status")
+    if status is not None:
+        status["frame"].pack_forget()
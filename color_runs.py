@@ -0,0 +1,226 @@
+# color_runs.py
+import heapq
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+# -----------------------------
+# NORMALIZED COLOR RUNS
+# -----------------------------
+# A run list is a sorted list of (start, end, color) tuples where no two
+# runs overlap and touching runs never share a color. Positions only need
+# to be comparable, so Tk "line.col" pairs parsed as tuples work as well
+# as plain character offsets.
+
+
+def normalize_runs(ranges):
+    """
+    Build a normalized run list from ranges given in application order.
+
+    Later ranges overwrite earlier ones where they overlap, which matches
+    how the editor stacked one tag per coloring action.
+    """
+    events = []
+    points = set()
+    for order, (start, end, color) in enumerate(ranges):
+        if start < end:
+            events.append((start, order, end, color))
+            points.add(start)
+            points.add(end)
+
+    if not events:
+        return []
+
+    events.sort()
+    points = sorted(points)
+
+    runs = []
+    active = []  # heap of (-order, end, color): newest range on top
+    i = 0
+    for p, next_p in zip(points, points[1:]):
+        while i < len(events) and events[i][0] <= p:
+            _, order, end, color = events[i]
+            heapq.heappush(active, (-order, end, color))
+            i += 1
+
+        while active and active[0][1] <= p:
+            heapq.heappop(active)
+
+        if active:
+            append_run(runs, p, next_p, active[0][2])
+
+    return runs
+
+
+def paint_run(runs, start, end, color):
+    """Overwrite [start, end) with color in place (color=None clears it)."""
+    if start >= end:
+        return
+
+    starts = [r[0] for r in runs]
+    lo = bisect_right(starts, start) - 1
+    if lo < 0 or runs[lo][1] <= start:
+        lo += 1
+    hi = bisect_left(starts, end)
+
+    replacement = []
+    if lo < hi and runs[lo][0] < start:
+        replacement.append((runs[lo][0], start, runs[lo][2]))
+    if color is not None:
+        replacement.append((start, end, color))
+    if lo < hi and runs[hi - 1][1] > end:
+        replacement.append((end, runs[hi - 1][1], runs[hi - 1][2]))
+
+    runs[lo:hi] = replacement
+
+    # Merge with neighbours of the same color
+    first = max(lo - 1, 0)
+    last = min(lo + len(replacement) + 1, len(runs))
+    merged = []
+    for run in runs[first:last]:
+        append_run(merged, *run)
+    runs[first:last] = merged
+
+
+def runs_by_color(runs):
+    """Group a run list into {color: [(start, end), ...]}."""
+    grouped = {}
+    for start, end, color in runs:
+        grouped.setdefault(color, []).append((start, end))
+    return grouped
+
+
+def append_run(runs, start, end, color):
+    if runs and runs[-1][2] == color and runs[-1][1] == start:
+        runs[-1] = (runs[-1][0], end, color)
+    else:
+        runs.append((start, end, color))
+
+
+# -----------------------------
+# OFFSETS <-> TK POSITIONS
+# -----------------------------
+# Offsets count Python characters; (line, col) positions count Tk columns.
+# Tcl 8.6 holds text as UTF-16, so a character outside the BMP (most
+# emoji) is one character in a str but two columns, and two "c" in an
+# index expression, in the widget. compute_line_starts() records where
+# such wide characters are, and the conversions below step over them;
+# text without any pays one isascii() check.
+try:
+    from _tkinter import TCL_VERSION
+except ImportError:  # no Tk at all: positions as an 8.6 editor wrote them
+    TCL_VERSION = "8.6"
+
+WIDE_COLUMNS = TCL_VERSION.startswith("8.")
+WIDE_CHAR_RE = re.compile("[\U00010000-\U0010FFFF]")
+
+
+class LineStarts(array):
+    """
+    Line starts of text with wide characters; .wide holds their offsets.
+    Text without any gets a plain array: bisecting a subclass is slower.
+    """
+    __slots__ = ("wide",)
+
+
+def parse_position(index):
+    """Tk "line.col" index -> (line, col)."""
+    line, col = str(index).split(".")
+    return int(line), int(col)
+
+
+def compute_line_starts(content):
+    """Offsets where each line begins; line N starts at line_starts[N - 1]."""
+    starts = array("q", [0])
+    starts.extend(m.end() for m in re.finditer("\n", content))
+    if WIDE_COLUMNS and not content.isascii():
+        wide = array("q", (m.start() for m in WIDE_CHAR_RE.finditer(content)))
+        if wide:
+            starts = LineStarts("q", starts)
+            starts.wide = wide
+    return starts
+
+
+def extend_line_starts(line_starts, chunk, offset):
+    """
+    compute_line_starts() a piece at a time: add the lines of chunk, read
+    at offset, to line_starts. Returns it, or a wide-aware copy once the
+    text turns out to have wide characters.
+    """
+    line_starts.extend(m.end() + offset for m in re.finditer("\n", chunk))
+    if WIDE_COLUMNS and not chunk.isascii():
+        wide = [m.start() + offset for m in WIDE_CHAR_RE.finditer(chunk)]
+        if wide:
+            if _wide(line_starts) is None:
+                line_starts = LineStarts("q", line_starts)
+                line_starts.wide = array("q")
+            line_starts.wide.extend(wide)
+    return line_starts
+
+
+def _wide(line_starts):
+    return getattr(line_starts, "wide", None)
+
+
+def tk_length(chars):
+    """Columns (and "c" steps) chars takes up in a Tk index."""
+    if not WIDE_COLUMNS or chars.isascii():
+        return len(chars)
+    return len(chars) + len(WIDE_CHAR_RE.findall(chars))
+
+
+def offset_to_position(line_starts, offset):
+    """Character offset -> (line, col) as used by Tk indices."""
+    line = bisect_right(line_starts, offset)
+    start = line_starts[line - 1]
+    col = offset - start
+    wide = _wide(line_starts)
+    if wide:
+        col += bisect_left(wide, offset) - bisect_left(wide, start)
+    return line, col
+
+
+def inserted_index(line_starts, start, offset):
+    """Tk index of `offset` into text inserted at (line, col) `start`; line_starts is of that text."""
+    i, col = offset_to_position(line_starts, offset)
+    line, first_col = start
+    return f"{line + i - 1}.{col + (first_col if i == 1 else 0)}"
+
+
+def position_to_offset(line_starts, position, length):
+    """(line, col) -> character offset, clamped like Tk clamps indices."""
+    line, col = position
+    if line > len(line_starts):
+        return length
+    start = line_starts[line - 1]
+    end = line_starts[line] - 1 if line < len(line_starts) else length
+    skipped = 0  # wide characters before col, each one column more
+    wide = _wide(line_starts)
+    if wide:
+        first = bisect_left(wide, start)
+        for i in range(first, bisect_left(wide, end)):
+            column = wide[i] - start + (i - first)
+            if column >= col:
+                break
+            if column + 1 == col:
+                return wide[i]  # between the two halves: the character's start
+            skipped += 1
+    return start + min(col - skipped, end - start)
+
+
+def runs_to_offsets(runs, line_starts, length):
+    out = []
+    for start, end, color in runs:
+        start = position_to_offset(line_starts, start, length)
+        end = position_to_offset(line_starts, end, length)
+        if start < end:
+            out.append((start, end, color))
+    return out
+
+
+def runs_to_positions(runs, line_starts):
+    return [
+        (offset_to_position(line_starts, start), offset_to_position(line_starts, end), color)
+        for start, end, color in runs
+    ]
@@ -1,3 +1,5 @@
+import os
+
  # Window
 WINDOW_TITLE = "mini_notes"
 
@@ -13,4 +15,118 @@ POWERSHELL_ACCENT_HOVER = "#fbeb9d"
 
 # File types
 FILE_TYPES = [("Text Files", "*.txt"), ("All Files", "*.*")]
- 
\ No newline at end of file
+ 
+# Loading: files at least this big are streamed into the editor in chunks
+CHUNKED_LOAD_THRESHOLD = 4 * 1024 * 1024
+LOAD_CHUNK_CHARS = 256 * 1024
+# Color runs read after the text are tagged this many at a time
+LOAD_RUN_BATCH = 2000
+LOAD_TICK_BUDGET_MS = 15
+
+# Per-user data (caches, indexes, recovery snapshots)
+DATA_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "mini_notes",
+)
+
+# Large file mode: plain text at least this big is memory-mapped and only
+# a window of lines around the viewport lives in the Text widget
+LARGE_FILE_THRESHOLD = 256 * 1024 * 1024
+LARGE_WINDOW_LINES = 2000
+LARGE_WINDOW_MARGIN = 300
+LARGE_INDEX_BLOCK = 16 * 1024 * 1024
+
+# .mini files are saved in the binary v2 container ("none", "zlib" or "lzma")
+MINI_COMPRESSION = "zlib"
+
+# Journaled save: saves append the edits to "<file>.journal" instead of
+# rewriting the file; past this size the journal is folded back in
+JOURNALED_SAVE = False
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+
+# Parsed-document cache: colored notes of at least DOC_CACHE_MIN_BYTES are
+# kept decoded in DOC_CACHE_DIR so reopening them skips parsing; past
+# DOC_CACHE_MAX_BYTES the least recently opened entries are dropped
+DOC_CACHE_DIR = os.path.join(DATA_DIR, "documents")
+DOC_CACHE_MIN_BYTES = 256 * 1024
+DOC_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Autosave: unsaved edits are snapshotted to RECOVERY_DIR this often
+AUTOSAVE_INTERVAL_MS = 30 * 1000
+RECOVERY_DIR = os.path.join(DATA_DIR, "recovery")
+
+# Scroll thumb: time per frame spent measuring line heights for the cache
+SCROLL_MEASURE_BUDGET_MS = 4
+SCROLL_REFINE_DELAY_MS = 50
+
+# Single instance: later launches hand their file to the running process
+SINGLE_INSTANCE = True
+
+# Startup: menus, icon and services are built after the first paint, or
+# after this long if the window is never exposed
+STARTUP_DEFER_MAX_MS = 500
+
+# Instrumentation (hidden debug panel: Ctrl+Shift+D)
+INSTRUMENT_RING_SIZE = 4096
+INSTRUMENT_BUCKETS_MS = (1, 2, 4, 8, 16, 33, 66, 133, 266, 533)
+
+# batch.py: per-directory record of files that passed, to skip them next run
+BATCH_STATE_DIR = os.path.join(DATA_DIR, "batch")
+
+# Workspace search: every note opened or saved is kept in a SQLite
+# full-text index; bigger files are left out. Folders listed here are
+# crawled for notes at startup as well, e.g.
+# [os.path.join(os.path.expanduser("~"), "Documents")]
+WORKSPACE_DIRS = []
+WORKSPACE_INDEX_PATH = os.path.join(DATA_DIR, "index.sqlite")
+WORKSPACE_INDEX_MAX_BYTES = 32 * 1024 * 1024
+
+# Undo: history beyond this many bytes is compressed, then dropped oldest
+# first; typing pauses longer than UNDO_COALESCE_MS start a new undo step
+UNDO_MEMORY_BUDGET = 32 * 1024 * 1024
+UNDO_COALESCE_MS = 1000
+UNDO_COMPRESS_MIN_BYTES = 4096
+
+# Automatic highlighting of ```powershell / ```sh blocks (Format menu)
+AUTO_HIGHLIGHT = False
+HIGHLIGHT_DELAY_MS = 30
+HIGHLIGHT_CHUNK_LINES = 200
+HIGHLIGHT_APPLY_LINES = 500
+HIGHLIGHT_COLORS = {
+    "fence": "#6E6E6E",
+    "comment": "#6A9955",
+    "string": "#CE9178",
+    "variable": "#9CDCFE",
+    "operator": "#D4D4D4",
+    "parameter": "#A8A8A8",
+    "cmdlet": "#DCDCAA",
+    "keyword": "#C586C0",
+    "number": "#B5CEA8",
+}
+
+# Minimap (Format menu): the scrollbar becomes a strip of the whole
+# document, one row per MINIMAP_ROW_PX pixels, shaded by how much of its
+# lines is colored (a line counts as full at MINIMAP_LINE_CHARS colored
+# chars) in the color that dominates it. Edits spanning more than
+# MINIMAP_RESCAN_LINES lines are recounted off the Tk thread
+MINIMAP = False
+MINIMAP_WIDTH = 48
+MINIMAP_ROW_PX = 3
+MINIMAP_LINE_CHARS = 40
+MINIMAP_LEVELS = 4
+MINIMAP_DELAY_MS = 150
+MINIMAP_RESCAN_LINES = 2000
+
+# Reloading files changed by other programs (inotify, else stat polling)
+WATCH_FILES = True
+WATCH_POLL_MS = 500
+WATCH_SETTLE_MS = 100
+WATCH_TAIL_BYTES = 4096
+WATCH_DIFF_MAX_LINES = 20000
+
+# Tabs: past this much (estimated) memory held by editors, the least
+# recently used inactive tabs are compressed out of their widgets until
+# shown again; the TAB_KEEP_RESIDENT most recently used tabs (the current
+# one included) are never evicted, so switching back to them is instant
+TAB_MEMORY_BUDGET = 256 * 1024 * 1024
+TAB_KEEP_RESIDENT = 3
@@ -0,0 +1,134 @@
+# debug_panel.py
+import time
+import tkinter as tk
+
+from lazy import filedialog
+from doc_cache import cache_stats
+from instrument import (
+    STATS,
+    dump_stats,
+    reset_stats,
+    set_enabled,
+    set_tracemalloc,
+    summary,
+)
+from tabs import current_tab, tab_memory
+from text_hooks import proxy_stats
+from undo import undo_usage
+
+REFRESH_MS = 1000
+
+
+# -----------------------------
+# DEBUG PANEL (Ctrl+Shift+D)
+# -----------------------------
+# Not in any menu: a plain Toplevel showing the instrumentation tables,
+# refreshed once a second while it is open.
+
+
+def toggle_debug_panel(root, panel, tabs):
+    """`panel` is a dict owned by the caller; it holds the open window."""
+    window = panel.get("window")
+    if window is not None and window.winfo_exists():
+        window.destroy()
+        panel["window"] = None
+        return
+
+    window = tk.Toplevel(root, bg="#1C1C1B")
+    window.title("mini_notes - debug")
+    window.geometry("640x420")
+    panel["window"] = window
+
+    controls = tk.Frame(window, bg="#1C1C1B")
+    controls.pack(side="top", fill="x")
+
+    enabled_var = tk.BooleanVar(value=STATS["enabled"])
+    tracemalloc_var = tk.BooleanVar(value=False)
+
+    tk.Checkbutton(
+        controls, text="Record", variable=enabled_var,
+        command=lambda: set_enabled(enabled_var.get()),
+        bg="#1C1C1B", fg="white", selectcolor="#4A4A4A",
+    ).pack(side="left")
+    tk.Checkbutton(
+        controls, text="tracemalloc", variable=tracemalloc_var,
+        command=lambda: set_tracemalloc(tracemalloc_var.get()),
+        bg="#1C1C1B", fg="white", selectcolor="#4A4A4A",
+    ).pack(side="left")
+    tk.Button(controls, text="Reset", command=reset_stats).pack(side="left")
+    tk.Button(controls, text="Dump JSON…", command=_ask_dump).pack(side="left")
+
+    body = tk.Text(
+        window, bg="#1C1C1B", fg="white", font=("Consolas", 10),
+        wrap="none", borderwidth=0,
+    )
+    body.pack(side="top", fill="both", expand=True)
+
+    def refresh():
+        if not window.winfo_exists():
+            return
+        body.configure(state="normal")
+        body.delete("1.0", "end")
+        body.insert("1.0", _render(tabs))
+        body.configure(state="disabled")
+        window.after(REFRESH_MS, refresh)
+
+    refresh()
+
+
+def _ask_dump():
+    path = filedialog.asksaveasfilename(
+        defaultextension=".json", filetypes=[("JSON", "*.json")]
+    )
+    if path:
+        dump_stats(path)
+
+
+def _render(tabs):
+    lines = [
+        f"{'handler':<16}{'calls':>7}{'mean ms':>10}{'max ms':>10}{'tcl/call':>10}",
+    ]
+    for name, h in summary().items():
+        lines.append(
+            f"{name:<16}{h['count']:>7}{h['mean_ms']:>10.2f}"
+            f"{h['max_ms']:>10.2f}{h['tcl_calls_per_call']:>10.1f}"
+        )
+        buckets = "  ".join(f"{edge}:{n}" for edge, n in h["histogram_ms"].items() if n)
+        lines.append(f"    {buckets}")
+
+    lines.append("")
+    lines.append(f"widget commands since start: {proxy_stats['calls']}")
+
+    usage = undo_usage(current_tab(tabs)["state"])
+    if usage is not None:
+        lines.append(
+            f"undo: {usage['undo_entries']} steps, {usage['redo_entries']} redo,"
+            f" {usage['stored_bytes'] // 1024} KB held ({usage['bytes'] // 1024} KB raw,"
+            f" {usage['compressed']} compressed) of {usage['budget_bytes'] // 1024} KB;"
+            f" {usage['evicted']} evicted"
+        )
+
+    cache = cache_stats()
+    lines.append(
+        f"document cache: {cache['hits']} hits, {cache['misses']} misses,"
+        f" {cache['stores']} stored, {cache['evicted']} evicted;"
+        f" {cache['entries']} entries, {cache['bytes'] // 1024} KB of {cache['budget_bytes'] // 1024} KB"
+    )
+
+    lines.append("")
+    lines.append("tabs (estimated memory):")
+    for tab in tab_memory(tabs):
+        lines.append(f"    {tab['bytes'] // 1024:>8} KB  {tab['status']:<9}{tab['name']}")
+
+    for path, memory in STATS["memory"].items():
+        lines.append("")
+        lines.append(f"{path}: {memory['current_kb']} KB now, {memory['peak_kb']} KB peak")
+        for stat in memory["top"][:5]:
+            lines.append(f"    {stat['kb']:>8} KB  {stat['where']}")
+
+    lines.append("")
+    lines.append("recent:")
+    for t, name, ms, calls in list(STATS["recent"])[-20:]:
+        lines.append(f"    {time.strftime('%H:%M:%S', time.localtime(t))}  {name:<16}{ms:>9.2f} ms{calls:>7}")
+
+    return "\n".join(lines)
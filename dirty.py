@@ -0,0 +1,137 @@
+# dirty.py
+import hashlib
+
+from editor_ops import get_color_runs
+from text_hooks import add_change_listener, get_generation
+
+HASH_CHUNK_LINES = 10000
+
+
+# -----------------------------
+# DIRTY TRACKING
+# -----------------------------
+# Instead of keeping a copy of the saved document around, remember the
+# edit generation and a hash of the text plus color runs at the last save
+# or load. While nothing has been edited since then the generation alone
+# answers "unsaved?"; otherwise the document is hashed again (a chunk of
+# lines at a time) and compared, so undoing back to the saved text reads
+# as clean again.
+
+
+def start_dirty_tracking(text, state):
+    tracker = {
+        "colors": 0,  # color tag edits; they don't move the text generation
+        "saved_version": None,
+        "saved_hash": None,
+        "checked": None,  # (version, dirty) of the last full comparison
+    }
+
+    def on_change(op, start, end, detail):
+        if op in ("tag_add", "tag_remove"):
+            tracker["colors"] += 1
+
+    add_change_listener(text, on_change)
+    state["dirty"] = tracker
+    mark_saved(text, state)
+    return tracker
+
+
+def document_hash(text):
+    """Streaming hash of the text and its normalized color runs."""
+    digest = hashlib.blake2b(digest_size=16)
+    last_line = int(text.index("end-1c").split(".")[0])
+    for line in range(1, last_line + 1, HASH_CHUNK_LINES):
+        chunk = text.get(f"{line}.0", f"{line + HASH_CHUNK_LINES}.0")
+        digest.update(chunk.encode("utf-8"))
+
+    digest.update(b"\0")
+    for (sl, sc), (el, ec), color in get_color_runs(text):
+        digest.update(f"{sl}.{sc} {el}.{ec} {color.upper()}\n".encode("ascii"))
+    return digest.digest()
+
+
+def _version(text, tracker):
+    return get_generation(text), tracker["colors"]
+
+
+def mark_saved(text, state, exact=True, known_hash=None):
+    """
+    The document now matches the file on disk (just loaded or saved).
+    exact=False skips hashing it: cheaper, but editing and then undoing
+    back to this point will read as unsaved. known_hash is document_hash()
+    of it when that is already known (doc_cache.py).
+    """
+    text.edit_modified(False)
+    tracker = state.get("dirty")
+    if tracker is None:
+        return
+    tracker["saved_version"] = _version(text, tracker)
+    if known_hash is not None:
+        tracker["saved_hash"] = known_hash
+    else:
+        tracker["saved_hash"] = document_hash(text) if exact else None
+    tracker["checked"] = None
+
+
+def saved_hash(state):
+    """The hash mark_saved() took, or None."""
+    tracker = state.get("dirty")
+    return tracker and tracker["saved_hash"]
+
+
+def mark_unsaved(text, state):
+    """The document differs from disk in a way edits didn't record."""
+    text.edit_modified(True)
+    tracker = state.get("dirty")
+    if tracker is not None:
+        tracker["saved_version"] = None
+        tracker["saved_hash"] = None
+        tracker["checked"] = None
+
+
+def carry_saved(text, state, dirty):
+    """
+    The document was taken out of the widget and put back unchanged (an
+    evicted tab): keep what is_dirty said before instead of rehashing.
+    """
+    tracker = state.get("dirty")
+    if tracker is None:
+        return
+    tracker["checked"] = None
+    if not dirty:
+        tracker["saved_version"] = _version(text, tracker)
+
+
+def looks_dirty(text, state):
+    """Cheap guess for indicators: edited since the last save, never hashed."""
+    tracker = state.get("dirty")
+    if tracker is None or state.get("loading") or state.get("large_file"):
+        return False
+    if state.get("evicted") is not None:
+        return state["evicted"]["dirty"]
+    version = _version(text, tracker)
+    if tracker["checked"] is not None and tracker["checked"][0] == version:
+        return tracker["checked"][1]
+    return version != tracker["saved_version"]
+
+
+def is_dirty(text, state):
+    tracker = state.get("dirty")
+    if tracker is None:
+        return text.edit_modified()
+    if state.get("evicted") is not None:
+        return state["evicted"]["dirty"]  # the widget is empty meanwhile
+    if state.get("loading") or state.get("large_file"):
+        return False  # nothing savable yet / annotations save themselves
+
+    version = _version(text, tracker)
+    if version == tracker["saved_version"]:
+        return False
+    if tracker["checked"] is not None and tracker["checked"][0] == version:
+        return tracker["checked"][1]
+
+    dirty = tracker["saved_hash"] is None or document_hash(text) != tracker["saved_hash"]
+    if not dirty:
+        tracker["saved_version"] = version  # e.g. undone back to the save
+    tracker["checked"] = (version, dirty)
+    return dirty
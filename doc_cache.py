@@ -0,0 +1,281 @@
+# doc_cache.py
+import hashlib
+import json
+import marshal
+import os
+import threading
+import time
+from array import array
+
+from config import DOC_CACHE_DIR, DOC_CACHE_MAX_BYTES, DOC_CACHE_MIN_BYTES
+from formats import get_format, stream_decoded
+from journal import hash_file
+from locks import normalize_path
+
+
+# -----------------------------
+# PARSED-DOCUMENT CACHE
+# -----------------------------
+# Opening a colored note means decoding it (JSON for .np100, varints and
+# zlib for .mini) and then hashing the loaded widget for dirty tracking.
+# Once a note has been opened, its parsed text and normalized runs are kept
+# in DOC_CACHE_DIR, together with the dirty-tracking hash of the loaded
+# document. An entry is valid for the same path, size and mtime; a file
+# whose mtime moved but whose size did not is hashed and still matches if
+# its content did not change. Entries are written from a worker thread and
+# evicted least recently used first.
+#
+# A cached document is marshal data, (CACHE_VERSION, content, starts,
+# ends, color ids, palette) with the run columns as raw int64/uint16
+# arrays: reading it back is a copy, not a parse.
+#
+# index.json: {key: {"path", "format", "stat": [size, mtime_ns], "hash",
+#              "document_hash", "bytes", "used"}}
+
+CACHE_VERSION = 1
+
+STATS = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+
+_cache = {"index": None}
+_lock = threading.Lock()
+
+
+def _key(path):
+    return hashlib.sha1(normalize_path(path).encode("utf-8")).hexdigest()
+
+
+def _document_path(key):
+    return os.path.join(DOC_CACHE_DIR, key + ".doc")
+
+
+def _index_path():
+    return os.path.join(DOC_CACHE_DIR, "index.json")
+
+
+def _index():
+    """The index, read on first use; callers hold _lock."""
+    if _cache["index"] is None:
+        try:
+            with open(_index_path(), "r", encoding="utf-8") as f:
+                _cache["index"] = json.load(f)
+        except (OSError, ValueError):
+            _cache["index"] = {}
+    return _cache["index"]
+
+
+def _save_index(index):
+    tmp = _index_path() + ".tmp"
+    try:
+        os.makedirs(DOC_CACHE_DIR, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, _index_path())
+    except OSError:
+        pass  # a cache that cannot be written just means slower opens
+
+
+def _drop(index, key):
+    index.pop(key, None)
+    try:
+        os.remove(_document_path(key))
+    except OSError:
+        pass
+
+
+# -----------------------------
+# CACHED DOCUMENTS
+# -----------------------------
+def _write_document(f, text_chunks, runs):
+    palette = {}
+    starts, ends, ids = array("q"), array("q"), array("H")
+    for start, end, color in runs:
+        starts.append(start)
+        ends.append(end)
+        ids.append(palette.setdefault(color, len(palette)))
+    marshal.dump((
+        CACHE_VERSION, "".join(text_chunks),
+        starts.tobytes(), ends.tobytes(), ids.tobytes(), tuple(palette),
+    ), f)
+
+
+def read_cached(document):
+    """(content, offset runs) of a cached document; ValueError if unusable."""
+    with open(document, "rb") as f:
+        try:
+            data = marshal.load(f)
+        except (EOFError, TypeError) as e:
+            raise ValueError(f"Unreadable cached document: {e}")
+    if not isinstance(data, tuple) or len(data) != 6 or data[0] != CACHE_VERSION:
+        raise ValueError("Unknown cached document version")
+    _, content, starts, ends, ids, palette = data
+    columns = []
+    for typecode, raw in (("q", starts), ("q", ends), ("H", ids)):
+        column = array(typecode)
+        column.frombytes(raw)
+        columns.append(column)
+    starts, ends, ids = columns
+    return content, list(zip(starts, ends, [palette[i] for i in ids]))
+
+
+def stream_cached(document):
+    """read_cached() as the items formats.stream_file() yields."""
+    content, runs = read_cached(document)
+    yield from stream_decoded(content, runs, os.path.getsize(document))
+
+
+def file_stat(path):
+    """[size, mtime_ns]: take it before reading a file you mean to cache."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def is_cacheable(path, file_format):
+    try:
+        return get_format(file_format)["colors"] and os.path.getsize(path) >= DOC_CACHE_MIN_BYTES
+    except OSError:
+        return False
+
+
+# -----------------------------
+# LOOKUP (Tk thread)
+# -----------------------------
+def cache_lookup(path, file_format):
+    """
+    The valid entry for path, or None. A hit gives "document", the cached
+    file to read with read_cached() instead of path, and "document_hash"
+    (bytes, or None when it is not known).
+    """
+    if not is_cacheable(path, file_format):
+        return None
+    key = _key(path)
+    with _lock:
+        index = _index()
+        entry = index.get(key)
+        if entry is None:
+            STATS["misses"] += 1
+            return None
+
+        try:
+            stat = file_stat(path)
+            valid = (
+                entry["format"] == file_format
+                and stat[0] == entry["stat"][0]
+                and os.path.getsize(_document_path(key)) == entry["bytes"]
+                # Touched but not edited: only the hash can tell
+                and (stat == entry["stat"] or hash_file(path) == entry["hash"])
+            )
+        except OSError:
+            valid = False
+        if not valid:
+            _drop(index, key)
+            _save_index(index)
+            STATS["misses"] += 1
+            return None
+
+        entry["stat"] = stat
+        entry["used"] = time.time()
+        _save_index(index)
+        STATS["hits"] += 1
+        document_hash = entry["document_hash"]
+        return {
+            "document": _document_path(key),
+            "document_hash": bytes.fromhex(document_hash) if document_hash else None,
+        }
+
+
+def load_cached(path, file_format):
+    """(content, runs, document_hash) from the cache, or None on a miss."""
+    entry = cache_lookup(path, file_format)
+    if entry is None:
+        return None
+    try:
+        content, runs = read_cached(entry["document"])
+    except (OSError, ValueError):
+        discard_cached(path)
+        STATS["hits"] -= 1  # not a hit after all
+        STATS["misses"] += 1
+        return None
+    return content, runs, entry["document_hash"]
+
+
+def discard_cached(path):
+    """Forget path's entry, e.g. when the cached file could not be read."""
+    with _lock:
+        index = _index()
+        if _key(path) in index:
+            _drop(index, _key(path))
+            _save_index(index)
+
+
+# -----------------------------
+# STORE (worker thread)
+# -----------------------------
+def cache_store(path, file_format, stat, text_chunks, runs, document_hash):
+    """
+    Remember a freshly parsed document, written in the background. stat is
+    file_stat(path) from before the file was read: if the file has changed
+    since, nothing is stored. document_hash is what dirty tracking computed
+    for the loaded document, or None.
+    """
+    if not is_cacheable(path, file_format):
+        return
+    threading.Thread(
+        target=_store,
+        args=(path, file_format, stat, text_chunks, runs, document_hash),
+        daemon=True,
+    ).start()
+
+
+def _store(path, file_format, stat, text_chunks, runs, document_hash):
+    key = _key(path)
+    tmp = _document_path(key) + f".{threading.get_ident()}.tmp"
+    try:
+        file_hash = hash_file(path)
+        if file_stat(path) != stat:
+            return  # changed while it was being read: the parse may be stale
+        os.makedirs(DOC_CACHE_DIR, exist_ok=True)
+        with open(tmp, "wb") as f:
+            _write_document(f, text_chunks, runs)
+        size = os.path.getsize(tmp)
+        with _lock:
+            os.replace(tmp, _document_path(key))
+            index = _index()
+            index[key] = {
+                "path": path,
+                "format": file_format,
+                "stat": stat,
+                "hash": file_hash,
+                "document_hash": document_hash.hex() if document_hash else None,
+                "bytes": size,
+                "used": time.time(),
+            }
+            STATS["stores"] += 1
+            _evict(index, keep=key)
+            _save_index(index)
+    except OSError:
+        pass  # a cache that cannot be written just means slower opens
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _evict(index, keep):
+    total = sum(entry["bytes"] for entry in index.values())
+    for key in sorted(index, key=lambda k: index[k]["used"]):
+        if total <= DOC_CACHE_MAX_BYTES:
+            return
+        if key != keep:
+            total -= index[key]["bytes"]
+            _drop(index, key)
+            STATS["evicted"] += 1
+
+
+def cache_stats():
+    with _lock:
+        index = _index()
+        return {
+            **STATS,
+            "entries": len(index),
+            "bytes": sum(entry["bytes"] for entry in index.values()),
+            "budget_bytes": DOC_CACHE_MAX_BYTES,
+        }
@@ -0,0 +1,498 @@
+# document.py
+import re
+from bisect import bisect_right
+from itertools import accumulate
+
+from color_runs import (
+    append_run,
+    compute_line_starts,
+    normalize_runs,
+    offset_to_position,
+    paint_run,
+    position_to_offset,
+    runs_to_offsets,
+    runs_to_positions,
+)
+from exporters import merge_segments
+from formats import format_for_save, sniff_format, write_file
+from journal import read_current
+from mini_format import TEXT_CHUNK_CHARS, document_bytes, dump_legacy, parse_document, parse_legacy
+from search_engine import PLAIN_OPTIONS, compile_query, find_matches
+
+
+# -----------------------------
+# DOCUMENT MODEL (no Tk)
+# -----------------------------
+# A note without an editor, held the way the Text holds it: a list of its
+# lines (without "\n") and, for each line, its color runs as a tuple of
+# (start, end, "#RRGGBB") character columns, or None. A line's runs may
+# cover its newline (end == len(line) + 1); the last line's is the newline
+# Tk keeps after the text, which takes tags but is never saved.
+#
+#   {"lines": [str, ...], "runs": [tuple or None, ...], "generation": int,
+#    "cache": {"content", "runs", "line_starts"}}  dropped on every edit
+#
+# A single edit rebuilds only the lines it touches, so it costs what those
+# lines cost, never the whole note; that is what lets the editor keep a
+# document in step with the widget on every keystroke (editor_ops.py) and
+# save, export, autosave and evict tabs from it instead of the widget.
+# Neither a line nor a run tuple is ever changed in place, so a shallow
+# copy_document() is a snapshot another thread can serialize.
+#
+# Whole-note work (serializing, searching, replace all, coloring every
+# match) runs on the joined content and a normalized run list of character
+# offsets (color_runs.py), the shape .mini v2 files store, at str/re speed
+# in one pass; bulk edits then rebuild the lines from the result. Scripts,
+# batch jobs and benchmarks use this module alone, no display needed.
+#
+# Single edits follow Tk's rules so a document and a Text given the same
+# edits agree: inserted text takes a color only when that color is on both
+# sides of it (unless it is given one), and a delete joins what is left of
+# the runs around it. They take Tk (line, col) positions; the offset
+# versions (insert_text, delete_text, recolor) convert through the line
+# starts, computed again after every edit, so they suit occasional edits.
+
+INHERIT = object()  # insert color: whatever Tk would give the text
+
+
+def new_document(content="", runs=()):
+    """A document; runs are normalized offset runs of content."""
+    document = {"lines": content.split("\n"), "runs": None, "generation": 0, "cache": {}}
+    _set_runs(document, list(runs))
+    return document
+
+
+def copy_document(document):
+    """A snapshot of document, safe to read from another thread."""
+    return {
+        "lines": list(document["lines"]),
+        "runs": list(document["runs"]),
+        "generation": document["generation"],
+        "cache": dict(document["cache"]),
+    }
+
+
+def _changed(document, text=True):
+    document["generation"] += 1
+    if text:
+        document["cache"] = {}
+    else:
+        document["cache"].pop("runs", None)
+
+
+def _starts(lines):
+    """Character offset of each line in lines joined with "\n"."""
+    starts = [0]
+    starts.extend(accumulate(len(line) + 1 for line in lines[:-1]))
+    return starts
+
+
+def _split_runs(runs, starts, count):
+    """Offset runs over `count` lines starting at `starts` -> per-line runs."""
+    per_line = [None] * count
+    for start, end, color in runs:
+        line = bisect_right(starts, start) - 1
+        while start < end:
+            stop = min(end, starts[line + 1]) if line + 1 < count else end
+            if per_line[line] is None:
+                per_line[line] = []
+            per_line[line].append((start - starts[line], stop - starts[line], color))
+            start = stop
+            line += 1
+    return [tuple(line_runs) if line_runs else None for line_runs in per_line]
+
+
+def _set_runs(document, runs):
+    lines = document["lines"]
+    document["runs"] = _split_runs(runs, _starts(lines), len(lines))
+
+
+def document_text(document):
+    """The content as one str, kept until the next edit."""
+    cache = document["cache"]
+    if "content" not in cache:
+        cache["content"] = "\n".join(document["lines"])
+    return cache["content"]
+
+
+def document_runs(document):
+    """Normalized offset runs of the content, kept until the next edit. Read only."""
+    cache = document["cache"]
+    if "runs" not in cache:
+        runs = []
+        lines = document["lines"]
+        last = len(lines) - 1
+        offset = 0
+        for i, (line, line_runs) in enumerate(zip(lines, document["runs"])):
+            if line_runs:
+                limit = len(line) + (i < last)  # never the newline after the text
+                for start, end, color in line_runs:
+                    end = min(end, limit)
+                    if start < end:
+                        append_run(runs, offset + start, offset + end, color)
+            offset += len(line) + 1
+        cache["runs"] = runs
+    return cache["runs"]
+
+
+def get_text(document, start=0, end=None):
+    return document_text(document)[start:end]
+
+
+def line_starts(document):
+    """compute_line_starts() of the content, kept until the next edit."""
+    cache = document["cache"]
+    if "line_starts" not in cache:
+        cache["line_starts"] = compute_line_starts(document_text(document))
+    return cache["line_starts"]
+
+
+def to_position(document, at):
+    """Offset -> (line, col), as in a Tk index."""
+    return offset_to_position(line_starts(document), at)
+
+
+def to_offset(document, line, col):
+    """(line, col) -> offset, clamped like Tk clamps indices."""
+    return position_to_offset(line_starts(document), (line, col), len(document_text(document)))
+
+
+def _line_color(line_runs, col):
+    for start, end, color in line_runs or ():
+        if start <= col < end:
+            return color
+    return None
+
+
+def color_at(document, at):
+    """Color of the char at offset `at`, or None."""
+    line, col = to_position(document, _clamp(document, at))
+    line, col = _locate(document, (line, col))
+    return _line_color(document["runs"][line], col)
+
+
+# -----------------------------
+# EDITS
+# -----------------------------
+def _clamp(document, at):
+    return max(0, min(at, len(document_text(document))))
+
+
+def _locate(document, position):
+    """Tk (line, col) -> (line index, char column), clamped like Tk clamps.
+    Past the last line is past its newline."""
+    line, col = position
+    lines = document["lines"]
+    if line < 1:
+        return 0, 0
+    if line > len(lines):
+        return len(lines) - 1, len(lines[-1]) + 1
+    text = lines[line - 1]
+    if col <= 0:
+        return line - 1, 0
+    if text.isascii():
+        return line - 1, min(col, len(text))
+    return line - 1, position_to_offset(compute_line_starts(text), (1, col), len(text))
+
+
+def _gather(document, first, last):
+    """Lines first..last, each with its newline, and their runs as offsets into that."""
+    lines = document["lines"][first:last + 1]
+    runs = []
+    offset = 0
+    for line, line_runs in zip(lines, document["runs"][first:last + 1]):
+        for start, end, color in line_runs or ():
+            append_run(runs, offset + start, offset + end, color)
+        offset += len(line) + 1
+    return "\n".join(lines) + "\n", runs
+
+
+def _scatter(document, first, last, text, runs):
+    """Replace lines first..last with what _gather() gave, edited."""
+    lines = text[:-1].split("\n") if text is not None else document["lines"][first:last + 1]
+    document["runs"][first:last + 1] = _split_runs(runs, _starts(lines), len(lines))
+    if text is not None:
+        document["lines"][first:last + 1] = lines
+
+
+def insert_at(document, position, chars, color=INHERIT):
+    """Insert chars at Tk (line, col), colored `color` (None: no color)."""
+    if not chars:
+        return
+    line, col = _locate(document, position)
+    lines, line_runs = document["lines"], document["runs"]
+    col = min(col, len(lines[line]))
+    if color is INHERIT:
+        # Tk: the tags on both the character before and the one after
+        if col:
+            before = _line_color(line_runs[line], col - 1)
+        elif line:
+            before = _line_color(line_runs[line - 1], len(lines[line - 1]))
+        else:
+            before = None
+        color = before if before == _line_color(line_runs[line], col) else None
+
+    text, runs = _gather(document, line, line)
+    n = len(chars)
+    shifted = []
+    for start, end, run_color in runs:
+        if end <= col:
+            shifted.append((start, end, run_color))
+        elif start >= col:
+            shifted.append((start + n, end + n, run_color))
+        else:  # split around the new text
+            shifted.append((start, col, run_color))
+            shifted.append((col + n, end + n, run_color))
+    if color is not None:
+        paint_run(shifted, col, col + n, color)
+    _scatter(document, line, line, text[:col] + chars + text[col:], shifted)
+    _changed(document)
+
+
+def delete_range(document, start, end):
+    """Delete from Tk (line, col) start to end."""
+    first, start_col = _locate(document, start)
+    last, end_col = _locate(document, end)
+    end_col = min(end_col, len(document["lines"][last]))  # the text's own newline stays
+    if (first, start_col) >= (last, end_col):
+        return
+    text, runs = _gather(document, first, last)
+    start = start_col
+    end = len(text) - len(document["lines"][last]) - 1 + end_col
+    n = end - start
+    kept = []
+    for a, b, color in runs:
+        a = a if a < start else max(start, a - n)
+        b = b if b <= start else max(start, b - n)
+        if a < b:
+            append_run(kept, a, b, color)
+    _scatter(document, first, last, text[:start] + text[end:], kept)
+    _changed(document)
+
+
+def color_range(document, start, end, color, only=None):
+    """
+    Color Tk (line, col) start to end with color, or clear it with None;
+    with `only`, just where it is that color (as removing that tag does).
+    """
+    first, start_col = _locate(document, start)
+    last, end_col = _locate(document, end)
+    if (first, start_col) >= (last, end_col):
+        return
+    text, runs = _gather(document, first, last)
+    start = start_col
+    end = len(text) - len(document["lines"][last]) - 1 + end_col
+    if only is None:
+        paint_run(runs, start, end, color)
+    else:
+        for a, b, run_color in [run for run in runs if run[2] == only]:
+            if a < end and b > start:
+                paint_run(runs, max(a, start), min(b, end), color)
+    _scatter(document, first, last, None, runs)
+    _changed(document, text=False)
+
+
+def insert_text(document, at, chars, color=None):
+    """Insert chars at offset `at`, colored `color` if given."""
+    position = to_position(document, _clamp(document, at))
+    insert_at(document, position, chars, INHERIT if color is None else color)
+
+
+def delete_text(document, start, end):
+    """Delete [start, end)."""
+    start, end = _clamp(document, start), _clamp(document, end)
+    if start < end:
+        delete_range(document, to_position(document, start), to_position(document, end))
+
+
+def recolor(document, start, end, color):
+    """Color [start, end) with color, or clear it with None."""
+    start, end = _clamp(document, start), _clamp(document, end)
+    if start < end:
+        color_range(document, to_position(document, start), to_position(document, end), color)
+
+
+# -----------------------------
+# SEARCH + BULK EDITS
+# -----------------------------
+def find_all(document, query, options=None):
+    """(starts, ends) arrays of every match; options as in search_engine."""
+    pattern = compile_query(query, options or PLAIN_OPTIONS)
+    return find_matches(document_text(document), query, pattern=pattern)
+
+
+def plan_replacements(content, runs, pattern, replacement, regex, join_chars=0, batch_chars=None):
+    """
+    (count, regions) for replacing every non-overlapping match of pattern.
+    runs are sorted offset runs of content. A region is (start, end,
+    new_text, new_runs): old offsets and the colored text replacing them,
+    with runs relative to the region start. Matches closer than join_chars
+    share a region until it spans batch_chars.
+    """
+    spans = []  # [start, end, [(match_start, match_end, new)...]]
+    expanded = {}
+    for match in pattern.finditer(content):
+        start, end = match.span()
+        if start == end:
+            continue  # nothing to show, nothing to replace
+        if regex:
+            # Parsing the template dominates; equal groups expand equally
+            key = (match.group(), match.groups())
+            new = expanded.get(key)
+            if new is None:
+                new = expanded[key] = match.expand(replacement)
+        else:
+            new = replacement
+        if (
+            spans
+            and start - spans[-1][1] <= join_chars
+            and (batch_chars is None or end - spans[-1][0] <= batch_chars)
+        ):
+            spans[-1][1] = end
+            spans[-1][2].append((start, end, new))
+        else:
+            spans.append([start, end, [(start, end, new)]])
+
+    count = 0
+    regions = []
+    r = 0  # first run that may still matter
+    for region_start, region_end, matches in spans:
+        count += len(matches)
+        pieces = []
+        new_runs = []
+        old = region_start  # next old offset to copy
+        shift = -region_start  # new offset minus old, for unchanged text
+        for start, end, new in matches:
+            # Unchanged text before the match keeps its colors
+            while r < len(runs) and runs[r][1] <= old:
+                r += 1
+            while old < start and r < len(runs) and runs[r][0] < start:
+                a, b, color = runs[r]
+                append_run(new_runs, max(a, old) + shift, min(b, start) + shift, color)
+                if b > start:
+                    break
+                r += 1
+            pieces.append(content[old:start])
+            # The replacement takes the color of the first character replaced
+            if new:
+                while r < len(runs) and runs[r][1] <= start:
+                    r += 1
+                if r < len(runs) and runs[r][0] <= start:
+                    append_run(new_runs, start + shift, start + shift + len(new), runs[r][2])
+                pieces.append(new)
+            shift += len(new) - (end - start)
+            old = end
+        regions.append((region_start, region_end, "".join(pieces), new_runs))
+    return count, regions
+
+
+def apply_regions(document, regions):
+    """Rewrite every (start, end, new_text, new_runs) region in one pass."""
+    if not regions:
+        return
+    content, runs = document_text(document), document_runs(document)
+    pieces, new_runs = [], []
+    r = 0
+    kept = 0  # start of the unchanged text before the next region
+    shift = 0
+    for start, end, chars, region_runs in regions + [(len(content), len(content), "", [])]:
+        pieces.append(content[kept:start])
+        while r < len(runs) and runs[r][1] <= kept:
+            r += 1
+        j = r
+        while j < len(runs) and runs[j][0] < start:
+            a, b, color = runs[j]
+            a, b = max(a, kept), min(b, start)
+            if a < b:
+                append_run(new_runs, a + shift, b + shift, color)
+            j += 1
+        base = start + shift
+        for a, b, color in region_runs:
+            append_run(new_runs, base + a, base + b, color)
+        pieces.append(chars)
+        shift += len(chars) - (end - start)
+        kept = end
+    _replace_all_text(document, "".join(pieces), new_runs)
+
+
+def _replace_all_text(document, content, runs):
+    document["lines"] = content.split("\n")
+    _set_runs(document, runs)
+    _changed(document)
+    document["cache"] = {"content": content, "runs": runs}
+
+
+def replace_all(document, query, replacement, options=None):
+    """
+    Replace every match, as the editor's replace all does: a replacement
+    takes the color of the first char it replaces. Returns the count;
+    raises re.error for a bad pattern or replacement template.
+    """
+    options = options or PLAIN_OPTIONS
+    pattern = compile_query(query, options) or re.compile(re.escape(query))
+    # No widget to spare: every match goes in one region, rewritten in one pass
+    content = document_text(document)
+    count, regions = plan_replacements(
+        content, document_runs(document), pattern, replacement, options["regex"], len(content)
+    )
+    apply_regions(document, regions)
+    return count
+
+
+def color_matches(document, query, color, options=None):
+    """Color every match (None clears them); returns the number of matches."""
+    starts, ends = find_all(document, query, options)
+    if starts:
+        # Later ranges win, as each would by painting it in turn; None
+        # paints a gap, dropped afterwards
+        ranges = document_runs(document) + [(a, b, color) for a, b in zip(starts, ends)]
+        runs = [run for run in normalize_runs(ranges) if run[2] is not None]
+        _set_runs(document, runs)
+        _changed(document, text=False)
+        document["cache"]["runs"] = runs
+    return len(starts)
+
+
+# -----------------------------
+# SERIALIZATION
+# -----------------------------
+def document_from_file(path, file_format=None):
+    """Read a note (any registered format, pending journal included)."""
+    return new_document(*read_current(path, file_format or sniff_format(path)))
+
+
+def document_to_file(document, path, file_format=None):
+    """Write a note; the format comes from the extension unless given. Returns the path."""
+    if file_format is None:
+        path, file_format = format_for_save(path)
+    write_file(path, file_format, document_text(document), document_runs(document))
+    return path
+
+
+def document_to_bytes(document, compression="zlib"):
+    """The document as .mini v2 bytes."""
+    return document_bytes(document_text(document), document_runs(document), compression)
+
+
+def document_from_bytes(data):
+    return new_document(*parse_document(data))
+
+
+def document_to_legacy(document):
+    """The document as legacy JSON (.np100)."""
+    return dump_legacy(
+        document_text(document), runs_to_positions(document_runs(document), line_starts(document))
+    )
+
+
+def document_from_legacy(json_content):
+    """Parse legacy JSON; raises ValueError."""
+    content, positions = parse_legacy(json_content)
+    return new_document(content, runs_to_offsets(positions, compute_line_starts(content), len(content)))
+
+
+def document_segments(document):
+    """(text, color) segments for the renderers in exporters.py."""
+    content = document_text(document)
+    chunks = (content[i:i + TEXT_CHUNK_CHARS] for i in range(0, len(content), TEXT_CHUNK_CHARS))
+    return merge_segments(chunks, document_runs(document))
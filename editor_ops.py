@@ -1,26 +1,53 @@
 # editor_ops.py
 import tkinter as tk
-from tkinter import messagebox
-import json
+from lazy import messagebox
 import re
 
+from color_runs import (
+    compute_line_starts,
+    normalize_runs,
+    parse_position,
+    runs_by_color,
+    runs_to_offsets,
+    runs_to_positions,
+)
+from document import (
+    INHERIT,
+    color_range,
+    delete_range,
+    document_from_legacy,
+    document_runs,
+    document_text,
+    document_to_legacy,
+    insert_at,
+    new_document,
+)
+from instrument import instrumented
+from search_engine import schedule_search, clear_search
+from text_hooks import add_change_listener, advance_index, install_change_hook
+
  
 # -----------------------------
 # FONT SIZE
 # -----------------------------
+@instrumented("zoom")
 def increase_font_size(text, font_family, font_size_state):
     """Increase font size by 1."""
     font_size_state["size"] += 1
     text.config(font=(font_family, font_size_state["size"]))
+    text.event_generate("<<FontChanged>>")
 
 
+@instrumented("zoom")
 def decrease_font_size(text, font_family, font_size_state):
     """Decrease font size by 1 (minimum 8)."""
     if font_size_state["size"] > 8:
         font_size_state["size"] -= 1
         text.config(font=(font_family, font_size_state["size"]))
+        text.event_generate("<<FontChanged>>")
 
 
+@instrumented("zoom")
 def zoom_with_wheel(event, text, font_family, font_size_state):
     if event.delta > 0:
         increase_font_size(text, font_family, font_size_state)
@@ -36,37 +63,36 @@ def show_search_bar(search_frame, search_entry):
     search_entry.focus()
 
 
-def hide_search_bar(search_frame, text):
-    search_frame.pack_forget()
-    clear_search_highlight(text)
+def show_replace_bar(search_frame, search_entry, replace_row, replace_entry):
+    search_frame.pack(fill="x")
+    replace_row.pack(fill="x")
+    # Nothing to replace yet: start with what to find
+    (replace_entry if search_entry.get() else search_entry).focus()
 
 
-def search_text(event, text, search_entry):
-    
-    query = search_entry.get()
+def hide_search_bar(search_frame, text):
+    search_frame.pack_forget()
     clear_search_highlight(text)
 
-    if not query:
-        return
 
-    start = "1.0"
-    while True:
-        pos = text.search(query, start, stopindex="end")
-        if not pos:
-            break
-
-        end = f"{pos}+{len(query)}c"
-        text.tag_add("search_highlight", pos, end)
+def close_search_bar(search_frame, search_entry, text, search_state, replace_row=None):
+    search_frame.pack_forget()
+    if replace_row is not None:
+        replace_row.pack_forget()  # Ctrl+F alone brings back just the find row
+    search_entry.delete(0, "end")
+    clear_search(search_state)
+    text.focus_set()
 
-        if start == "1.0":
-            text.mark_set("insert", pos)
-            text.see(pos)
 
-        start = end
+@instrumented("search")
+def search_text(event, search_state):
+    """Debounced search; matches are found off the Tk thread."""
+    schedule_search(search_state)
 
 
 def clear_search_highlight(text):
     text.tag_remove("search_highlight", "1.0", "end")
+    text.tag_remove("search_current", "1.0", "end")
 
 # -----------------------------
 # COLOR TAGS
@@ -83,18 +109,29 @@ def apply_color(text, tag):
 
     text.tag_add(tag, start, end)
 
+def color_tag(color):
+    """Canonical tag name for a palette color (one tag per color)."""
+    return f"color_{color}"
+
+
+def color_tags(text):
+    return [tag for tag in text.tag_names() if tag.startswith("color_")]
+
+
+@instrumented("color")
 def change_text_color(text, color):
-    """Apply a unique color tag to selected text."""
+    """Apply the canonical color tag to selected text."""
     try:
         if text.tag_ranges(tk.SEL):
             start = text.index(tk.SEL_FIRST)
             end = text.index(tk.SEL_LAST)
 
-            for tag in text.tag_names(start):
-                if tag.startswith("color_"):
-                    text.tag_remove(tag, start, end)
+            # Tk keeps each tag's ranges sorted and merged, so trimming the
+            # other colors and adding one tag keeps the runs normalized.
+            for tag in color_tags(text):
+                text.tag_remove(tag, start, end)
 
-            tag_name = f"color_{color}_{start}_{end}".replace(".", "_")
+            tag_name = color_tag(color)
             text.tag_add(tag_name, start, end)
             text.tag_config(tag_name, foreground=color)
         else:
@@ -123,58 +160,179 @@ def change_text_to_yellow(text):
 # -----------------------------
 # COLOR EXPORT / IMPORT
 # -----------------------------
-def has_color_tags(text):
-    return any(tag.startswith("color_") for tag in text.tag_names())
+TAG_COLOR_RE = re.compile(r"color_(#[0-9A-Fa-f]{6})(?:_|$)")
 
+# Ranges per tag_add call when rebuilding tags from a file
+TAG_BATCH = 1000
 
-def export_with_colors(text):
-    content = text.get("1.0", tk.END + "-1c")
 
-    color_tags = [tag for tag in text.tag_names() if tag.startswith("color_")]
-    tag_info = []
+def has_color_tags(text):
+    return any(text.tag_ranges(tag) for tag in color_tags(text))
+
+
+def get_color_runs(text):
+    """Return the document's normalized runs as ((line, col), (line, col), color)."""
+    ranges = []
+    for tag in color_tags(text):
+        match = TAG_COLOR_RE.match(tag)
+        if not match:
+            continue
+        color_hex = match.group(1)
+        ranges_flat = text.tag_ranges(tag)
+        for i in range(0, len(ranges_flat), 2):
+            ranges.append((
+                parse_position(ranges_flat[i]),
+                parse_position(ranges_flat[i + 1]),
+                color_hex,
+            ))
+
+    # Tags are listed lowest priority first, so later ones win overlaps
+    return normalize_runs(ranges)
+
+
+def apply_color_runs(text, runs):
+    """Add normalized runs to the Text, batching ranges per canonical tag."""
+    for color, spans in runs_by_color(runs).items():
+        tag_name = color_tag(color)
+        text.tag_config(tag_name, foreground=color)
+        for i in range(0, len(spans), TAG_BATCH):
+            indices = []
+            for (sl, sc), (el, ec) in spans[i:i + TAG_BATCH]:
+                indices.append(f"{sl}.{sc}")
+                indices.append(f"{el}.{ec}")
+            text.tag_add(tag_name, *indices)
+
 
-    for tag in color_tags:
-        ranges = text.tag_ranges(tag)
-        match = re.match(r"color_(#[0-9A-Fa-f]{6})_", tag)
+# -----------------------------
+# DOCUMENT <-> WIDGET
+# -----------------------------
+# The Text is a view of a document (document.py). bind_document() keeps a
+# document in step with the widget from its change hook, each edit costing
+# the document about what the lines it touched cost, so whatever works on
+# the whole note (saving, exporting, autosave, tab eviction) reads that
+# instead of the widget. The binding sits on the widget (text.document_binding,
+# as the hook sits on text.change_hook). Changes made unobserved
+# (text_hooks.unobserved) leave the document behind; it is read out of the
+# widget again when next asked for. Color tags never overlap in the editor
+# (change_text_color trims the others first), so adding one paints over
+# whatever color the document had there.
+
+
+def bind_document(text):
+    """Keep a document in step with `text` from now on."""
+    if getattr(text, "document_binding", None) is not None:
+        return
+    hook = install_change_hook(text)
+    binding = {"document": None, "unobserved": None, "paused": False, "hook": hook}
+
+    def follow(op, start, end, detail):
+        document = binding["document"]
+        if document is None or binding["paused"]:
+            return
+        if binding["unobserved"] != hook["unobserved"]:
+            binding["document"] = None  # missed changes: read it again
+            return
+
+        if op == "insert":
+            pieces = hook["inserted"] or [(detail, None)]
+            for chars, tags in pieces:
+                color = INHERIT if tags is None else _tags_color(tags)
+                insert_at(document, parse_position(start), chars, color)
+                start = advance_index(start, chars)
+        elif op == "delete":
+            delete_range(document, parse_position(start), parse_position(end))
+        else:
+            match = TAG_COLOR_RE.match(detail)
+            if match:
+                color = match.group(1)
+                if op == "tag_add":
+                    color_range(document, parse_position(start), parse_position(end), color)
+                else:
+                    color_range(
+                        document, parse_position(start), parse_position(end), None, only=color
+                    )
+
+    add_change_listener(text, follow)
+    text.document_binding = binding
+
+
+def _tags_color(tags):
+    color = None
+    for tag in tags:
+        match = TAG_COLOR_RE.match(tag)
         if match:
-            color_hex = match.group(1)
-            for i in range(0, len(ranges), 2):
-                start = str(ranges[i])
-                end = str(ranges[i + 1])
-                tag_info.append({
-                    "color": color_hex,
-                    "start": start,
-                    "end": end
-                })
+            color = match.group(1)
+    return color
+
+
+def release_document(text):
+    """Drop the bound document (the widget was emptied unobserved)."""
+    binding = getattr(text, "document_binding", None)
+    if binding is not None:
+        binding["document"] = None
+
+
+def text_document(text):
+    """
+    The widget's note as a document: the bound one, kept in step with it,
+    else a copy read out of the widget. Treat it as read only.
+    """
+    binding = getattr(text, "document_binding", None)
+    if binding is None:
+        return new_document(*export_document(text))
+    if binding["document"] is None or binding["unobserved"] != binding["hook"]["unobserved"]:
+        _bind(binding, new_document(*export_document(text)))
+    return binding["document"]
 
-    document = {
-        "content": content,
-        "format": "np100",
-        "tags": tag_info
-    }
 
-    return json.dumps(document, ensure_ascii=False, indent=2)
+def _bind(binding, document):
+    binding["document"] = document
+    binding["unobserved"] = binding["hook"]["unobserved"]
+
+
+def show_document(text, document):
+    """Replace the widget's note with a document."""
+    import_document(text, document_text(document), document_runs(document))
+
+
+@instrumented("export")
+def export_with_colors(text):
+    return document_to_legacy(text_document(text))
 
 
+@instrumented("import")
 def import_with_colors(text, json_content):
     try:
-        document = json.loads(json_content)
-        content = document.get("content", "")
-        tags = document.get("tags", [])
+        show_document(text, document_from_legacy(json_content))
+        return True
+    except ValueError:
+        return False
+
+
+def export_document(text):
+    """Return (content, runs) with runs as character offsets (.mini v2)."""
+    content = text.get("1.0", tk.END + "-1c")
+    line_starts = compute_line_starts(content)
+    return content, runs_to_offsets(get_color_runs(text), line_starts, len(content))
 
+
+def import_document(text, content, runs):
+    """Load content plus offset-based runs into the Text."""
+    # A bound document is made from them directly, not edit by edit
+    binding = getattr(text, "document_binding", None)
+    if binding is not None:
+        binding["paused"] = True
+    try:
         text.delete("1.0", tk.END)
         text.insert("1.0", content)
 
-        for tag_data in tags:
-            color = tag_data.get("color")
-            start = tag_data.get("start")
-            end = tag_data.get("end")
-
-            if color and start and end:
-                tag_name = f"color_{color}_{start}_{end}".replace(".", "_")
-                text.tag_add(tag_name, start, end)
-                text.tag_config(tag_name, foreground=color)
+        for tag in color_tags(text):
+            text.tag_delete(tag)
 
-        return True
-    except json.JSONDecodeError:
-        return False
+        apply_color_runs(text, runs_to_positions(runs, compute_line_starts(content)))
+    finally:
+        if binding is not None:
+            binding["paused"] = False
+            binding["document"] = None  # read from the widget if this failed
+    if binding is not None:
+        _bind(binding, new_document(content, runs))
@@ -0,0 +1,230 @@
+# exporters.py
+import argparse
+import html
+import itertools
+import os
+import sys
+
+from formats import sniff_format
+from journal import journal_path, read_current
+from mini_format import TEXT_CHUNK_CHARS, iter_document
+
+PAGE_BACKGROUND = "#1C1C1B"
+PAGE_FOREGROUND = "#CCCCCC"
+
+
+# -----------------------------
+# SEGMENTS
+# -----------------------------
+# Every exporter consumes the same stream of (text, color) segments, color
+# being "#RRGGBB" or None for uncolored text. Segments are produced by
+# walking text chunks and color runs side by side, so no exporter ever
+# holds the whole document or its output.
+
+
+def merge_segments(chunks, runs):
+    """Interleave text chunks with sorted (start, end, color) offset runs."""
+    runs = iter(runs)
+    run = next(runs, None)
+    position = 0
+    for chunk in chunks:
+        chunk_end = position + len(chunk)
+        i = 0
+        while i < len(chunk):
+            here = position + i
+            while run is not None and run[1] <= here:
+                run = next(runs, None)
+            if run is None or run[0] >= chunk_end:
+                yield chunk[i:], None
+                break
+            if run[0] > here:
+                stop, color = run[0], None
+            else:
+                stop, color = min(run[1], chunk_end), run[2]
+            yield chunk[i:stop - position], color
+            i = stop - position
+        position = chunk_end
+
+
+def file_segments(path):
+    """Segments of a note on disk, pending journal included."""
+    file_format = sniff_format(path)
+    if file_format == "mini" and not os.path.exists(journal_path(path)):
+        # v2 stores all text before all runs: read it through two handles
+        with open(path, "rb") as text_file, open(path, "rb") as run_file:
+            chunks = (
+                value for _, value in itertools.takewhile(
+                    lambda record: record[0] == "text", iter_document(text_file)
+                )
+            )
+            runs = (value for kind, value in iter_document(run_file) if kind == "run")
+            yield from merge_segments(chunks, runs)
+        return
+
+    # Legacy JSON and journaled notes only exist whole once parsed
+    content, runs = read_current(path, file_format)
+    chunks = (
+        content[i:i + TEXT_CHUNK_CHARS] for i in range(0, len(content), TEXT_CHUNK_CHARS)
+    )
+    yield from merge_segments(chunks, runs)
+
+
+# -----------------------------
+# RENDERERS
+# -----------------------------
+# Each renderer turns segments into an iterator of output strings.
+
+
+def render_text(segments, title=""):
+    for chunk, _ in segments:
+        yield chunk
+
+
+def render_ansi(segments, title=""):
+    """24-bit color escapes, for terminals and `less -R`."""
+    for chunk, color in segments:
+        chunk = chunk.replace("\x1b", "^[")  # never let a note drive the terminal
+        if color is None:
+            yield chunk
+        else:
+            r, g, b = bytes.fromhex(color[1:])
+            yield f"\x1b[38;2;{r};{g};{b}m{chunk}\x1b[0m"
+
+
+def render_html(segments, title=""):
+    yield (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{html.escape(title)}</title>\n"
+        "<style>\n"
+        f"body {{ background: {PAGE_BACKGROUND}; color: {PAGE_FOREGROUND}; }}\n"
+        "pre { font-family: Consolas, monospace; white-space: pre-wrap; }\n"
+        "</style>\n</head>\n<body>\n<pre>"
+    )
+    for chunk, color in segments:
+        chunk = html.escape(chunk, quote=False)
+        if color is None:
+            yield chunk
+        else:
+            yield f'<span style="color:{color}">{chunk}</span>'
+    yield "</pre>\n</body>\n</html>\n"
+
+
+def render_markdown(segments, title=""):
+    """
+    The note as Markdown source, colored text wrapped in inline HTML spans.
+    Fenced code blocks (and their ``` lines) are left bare, since a span
+    there would show up literally.
+    """
+    in_fence = False
+    pending = []  # start of the current line, until it is known to be a fence or not
+    fence_line = None  # None while undecided
+
+    def emit(chunk, color):
+        if color is None or in_fence or fence_line or chunk in ("", "\n"):
+            return chunk
+        if chunk.endswith("\n"):
+            return f'<span style="color:{color}">{chunk[:-1]}</span>\n'
+        return f'<span style="color:{color}">{chunk}</span>'
+
+    for chunk, color in segments:
+        for piece in chunk.splitlines(keepends=True):
+            if fence_line is None:
+                pending.append((piece, color))
+                head = "".join(p for p, _ in pending).lstrip(" \t")
+                if len(head) >= 3 or piece.endswith("\n"):
+                    fence_line = head.startswith("```")
+                    yield "".join(emit(p, c) for p, c in pending)
+                    pending.clear()
+            else:
+                yield emit(piece, color)
+
+            if piece.endswith("\n"):
+                if fence_line:
+                    in_fence = not in_fence
+                fence_line = None
+    if pending:
+        yield "".join(emit(p, c) for p, c in pending)
+
+
+FORMATS = {
+    "html": (render_html, ".html"),
+    "ansi": (render_ansi, ".ans"),
+    "markdown": (render_markdown, ".md"),
+    "text": (render_text, ".txt"),
+}
+
+EXTENSION_FORMATS = {".html": "html", ".htm": "html", ".md": "markdown",
+                     ".markdown": "markdown", ".ans": "ansi", ".txt": "text"}
+
+
+def format_for_path(path):
+    return EXTENSION_FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def write_export(out, segments, file_format, title=""):
+    """Stream rendered segments to the text file object `out`."""
+    render = FORMATS[file_format][0]
+    for part in render(segments, title):
+        out.write(part)
+
+
+def export_to_path(path, segments, file_format, title=""):
+    """Write an export next to its final name, then move it into place."""
+    tmp = path + ".export.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as out:
+            write_export(out, segments, file_format, title)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# -----------------------------
+# COMMAND LINE
+# -----------------------------
+#   mini_notes cat NOTE [--plain]                 colored text on stdout
+#   mini_notes export NOTE [-f FORMAT] [-o OUT]   html/markdown/ansi/text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mini_notes", description="Export mini_notes files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cat = commands.add_parser("cat", help="print a note with its colors (pipe into less -R)")
+    cat.add_argument("note")
+    cat.add_argument("--plain", action="store_true", help="no color escapes")
+
+    export = commands.add_parser("export", help="convert a note to another format")
+    export.add_argument("note")
+    export.add_argument("-f", "--format", choices=sorted(FORMATS),
+                        help="default: from the -o extension, else html")
+    export.add_argument("-o", "--output", help="output file (default: stdout)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "cat":
+        file_format, output = ("text" if args.plain else "ansi"), None
+    else:
+        file_format = args.format or (args.output and format_for_path(args.output)) or "html"
+        output = args.output
+
+    title = os.path.basename(args.note)
+    try:
+        if output:
+            export_to_path(output, file_segments(args.note), file_format, title)
+        else:
+            sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+            write_export(sys.stdout, file_segments(args.note), file_format, title)
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader (head, less) went away; that is not an error
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    except (OSError, ValueError) as e:
+        print(f"mini_notes: {args.note}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,38 @@
 # file_ops.py
 import os
 import sys
-import json
 import tkinter as tk
-from tkinter import filedialog, messagebox
-from locks import is_file_already_open, remove_file_lock
+from lazy import filedialog, messagebox
+from config import CHUNKED_LOAD_THRESHOLD, LARGE_FILE_THRESHOLD
+from formats import (
+    DEFAULT_SAVE_FORMAT,
+    format_for_save,
+    get_format,
+    open_filetypes,
+    read_file,
+    save_filetypes,
+    sniff_format,
+)
+from document import document_segments, document_to_file
+from editor_ops import import_document, text_document
+from exporters import export_to_path, format_for_path
+from chunked_load import start_chunked_load, cancel_chunked_load
+from large_file import open_large_file, close_large_file, save_annotations
+from autosave import discard_snapshot, mark_clean
+from dirty import is_dirty, mark_saved, saved_hash
+from doc_cache import cache_lookup, cache_store, file_stat, load_cached
+from instrument import instrumented, record_document_memory
+from workspace_index import index_file
+from watcher import watch_synced
+from undo import reset_undo, suspend_undo
+from journal import (
+    append_pending,
+    can_append,
+    discard_journal,
+    resume_journal,
+    start_journal,
+    stop_journal,
+)
 
 
 
@@ -27,81 +55,116 @@ def get_current_content(text):
     return content
 
 
-def has_unsaved_changes(text):
-    return text.edit_modified()
-
-
-def reset_original_content(state, text, export_with_colors, has_color_tags):
-    """Update original_content after save/open."""
-    if state["file_format"] == "np100" or has_color_tags(text):
-        state["original_content"] = export_with_colors(text)
-    else:
-        state["original_content"] = get_current_content(text)
+def has_unsaved_changes(text, state):
+    return is_dirty(text, state)
 
 
 # -----------------------------
 # LOAD FILE
 # -----------------------------
+@instrumented("load")
 def load_file(file_path, text, root, state, import_with_colors, export_with_colors):
 
 
     """
     state = {
-        "original_content": ...,
         "file_format": ...,
         "current_file_path": ...
     }
     """
+    stop_journal(text, state)
+    suspend_undo(state)
+
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
+        size = os.path.getsize(file_path)
+        file_format = sniff_format(file_path)
+
+        # Huge plain text is memory-mapped and shown a window at a time
+        if (
+            "scrollbar" in state
+            and file_format == "txt"
+            and size >= LARGE_FILE_THRESHOLD
+        ):
+            cancel_chunked_load(state)
+            open_large_file(file_path, text, root, state)
+            return
 
-        ext = os.path.splitext(file_path)[1].lower()
+        close_large_file(state)
 
-        is_mini = (
-            ext in (".mini", ".np100")
-            or (content.strip().startswith("{") and '"format":"np100"' in content)
-        )
+        # Big files stream in from a worker thread instead of blocking Tk
+        if "status" in state and size >= CHUNKED_LOAD_THRESHOLD:
+            start_chunked_load(
+                file_path, text, root, state, file_format, cache_lookup(file_path, file_format)
+            )
+            return
 
-        if is_mini:
-            if import_with_colors(text, content):
-                state["file_format"] = "np100"
-                state["original_content"] = export_with_colors(text)
-            else:
-                raise ValueError("Could not parse NP100/MINI file.")
-        else:
-            text.delete("1.0", tk.END)
-            text.insert("1.0", content)
-            state["file_format"] = "txt"
-            state["original_content"] = content
+        cancel_chunked_load(state)
 
+        # A note opened before comes decoded, with its baseline hash
+        cached = load_cached(file_path, file_format)
+        if cached is not None:
+            content, runs, known_hash = cached
+        else:
+            stat = file_stat(file_path)
+            content, runs = read_file(file_path, file_format)
+            known_hash = None
+        import_document(text, content, runs)
+        state["file_format"] = file_format
         state["current_file_path"] = file_path
+        replayed = resume_journal(text, state, file_path, file_format)
+
         root.title(f"mini_notes - {os.path.basename(file_path)}")
-        text.edit_modified(False)
+        mark_saved(text, state, known_hash=None if replayed else known_hash)
+        if cached is None:
+            cache_store(
+                file_path, file_format, stat, [content], runs,
+                None if replayed else saved_hash(state),
+            )
+        watch_synced(state)
+        mark_clean(state)
+        record_document_memory(file_path)
+        index_file(state.get("index"), file_path)
 
     except Exception as e:
         text.delete("1.0", tk.END)
         text.insert("1.0", f"Error opening file: {e}")
-        state["original_content"] = ""
         state["file_format"] = "txt"
         state["current_file_path"] = None
+        mark_saved(text, state)
+        watch_synced(state)
+
+    finally:
+        # A chunked load resets the history itself once it finishes
+        if not state.get("loading"):
+            reset_undo(state)
 
 
-def open_file(text, root, state, import_with_colors, export_with_colors):
+@instrumented("open")
+def open_file(open_path):
+    """Ask for a file; open_path(file_path) shows it (in a tab)."""
     file_path = filedialog.askopenfilename(
         title="Open File",
-        filetypes=[
-            ("All Supported Files", "*.mini *.np100 *.txt"),
-            ("Mini Notes Files", "*.mini *.np100"),
-            ("Mini Files", "*.mini"),
-            ("Legacy NP100 Files", "*.np100"),
-            ("Text Files", "*.txt"),
-            ("All Files", "*.*"),
-        ],
+        filetypes=open_filetypes(),
+    )
+
+    if file_path:
+        open_path(file_path)
+
+
+def open_large(text, root, state):
+    """Open any plain-text file in large file mode, whatever its size."""
+    file_path = filedialog.askopenfilename(
+        title="Open Large File",
+        filetypes=[("Text Files", "*.txt *.log"), ("All Files", "*.*")],
     )
 
     if file_path:
-        load_file(file_path, text, root, state, import_with_colors, export_with_colors)
+        cancel_chunked_load(state)
+        stop_journal(text, state)
+        try:
+            open_large_file(file_path, text, root, state)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not open file: {e}")
 
 
 # -----------------------------
@@ -110,28 +173,39 @@ def open_file(text, root, state, import_with_colors, export_with_colors):
 def _perform_save(
     file_path, text, state, export_with_colors, get_current_content
 ):
+    previous_path = state.get("current_file_path")
     try:
-        ext = os.path.splitext(file_path)[1].lower()
-
-        if ext == ".txt":
-            content = get_current_content(text)
-            state["file_format"] = "txt"
-
-        elif ext in (".mini", ".np100"):
-            content = export_with_colors(text)
-            state["file_format"] = "np100"
-
+        file_path, state["file_format"] = format_for_save(file_path)
+
+        # Journaled save: append just the edits made since the last save
+        if state.get("journal_enabled") and can_append(
+            state, file_path, state["file_format"]
+        ):
+            append_pending(state)
+            state["current_file_path"] = file_path
+            mark_saved(text, state)
+            watch_synced(state)
+            discard_snapshot(state, file_path)
+            index_file(state.get("index"), file_path)
+            return True
+
+        document_to_file(text_document(text), file_path, state["file_format"])
+
+        # The file now holds every edit, so any journal for it is stale
+        discard_journal(file_path)
+        if state.get("journal_enabled"):
+            start_journal(text, state, file_path, state["file_format"])
         else:
-            base_path = os.path.splitext(file_path)[0]
-            file_path = base_path + ".mini"
-            content = export_with_colors(text)
-            state["file_format"] = "np100"
+            stop_journal(text, state)
 
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
-
-        state["original_content"] = content
         state["current_file_path"] = file_path
+        mark_saved(text, state)
+        watch_synced(state)
+
+        # Saved work needs no recovery snapshot, under either name
+        discard_snapshot(state, previous_path)
+        discard_snapshot(state, file_path)
+        index_file(state.get("index"), file_path)
 
         return True
 
@@ -140,18 +214,23 @@ def _perform_save(
         return False
 
 
+@instrumented("save")
 def save_file_as(text, state, export_with_colors, get_current_content):
+    if state.get("loading"):
+        return False
+
+    if state.get("large_file"):
+        messagebox.showinfo(
+            "Large File", "Files opened in large file mode cannot be saved under a new name."
+        )
+        return False
+
     initial_dir = os.path.expanduser("~/Documents")
 
     file_path = filedialog.asksaveasfilename(
         initialdir=initial_dir,
-        defaultextension=".mini",
-        filetypes=[
-            ("Mini Notes", "*.mini"),
-            ("NP100 Notes", "*.np100"),
-            ("Text files", "*.txt"),
-            ("All files", "*.*")
-        ],
+        defaultextension=get_format(DEFAULT_SAVE_FORMAT)["extensions"][0],
+        filetypes=save_filetypes(),
         title="Save notes as...",
     )
 
@@ -165,7 +244,18 @@ def save_file_as(text, state, export_with_colors, get_current_content):
     return result
 
 
+@instrumented("save")
 def save_file(text, state, export_with_colors, get_current_content):
+    if state.get("loading"):
+        return False  # the document is still streaming in
+
+    if state.get("large_file"):
+        # The mapped file is read-only; only its annotations are saved
+        result = save_annotations(state["large_file"])
+        if not result:
+            messagebox.showerror("Error", "Could not save annotations.")
+        return result
+
     if state["current_file_path"] and os.path.exists(state["current_file_path"]):
         result = _perform_save(
             state["current_file_path"],
@@ -181,28 +271,46 @@ def save_file(text, state, export_with_colors, get_current_content):
 
 
 # -----------------------------
-# WINDOW CLOSE HANDLING
+# EXPORT
 # -----------------------------
-def on_closing(root, text, state, save_file, has_unsaved_changes):
-    
+@instrumented("export")
+def export_file_as(text, state):
+    """Export what the editor shows (unsaved edits included) as HTML, Markdown or ANSI."""
+    if state.get("loading"):
+        return False
 
-    if state["current_file_path"]:
-        remove_file_lock(state["current_file_path"])
+    if state.get("large_file"):
+        messagebox.showinfo("Large File", "Files opened in large file mode cannot be exported.")
+        return False
 
-    if has_unsaved_changes(text):
-        response = messagebox.askyesnocancel(
-            "Confirm Exit", "Do you want to save changes before closing?"
-        )
+    current = state["current_file_path"]
+    name = os.path.splitext(os.path.basename(current))[0] if current else "notes"
 
-        if response is None:
-            return
+    file_path = filedialog.asksaveasfilename(
+        initialdir=os.path.dirname(current) if current else os.path.expanduser("~/Documents"),
+        initialfile=name + ".html",
+        defaultextension=".html",
+        filetypes=[
+            ("HTML", "*.html"),
+            ("Markdown", "*.md"),
+            ("ANSI colored text", "*.ans"),
+            ("Plain text", "*.txt"),
+        ],
+        title="Export notes as...",
+    )
 
-        if response:
-            if save_file():
-                root.after(10, root.destroy)
-            return
-        else:
-            root.destroy()
-            return
+    if not file_path:
+        return False
+
+    try:
+        export_to_path(
+            file_path,
+            document_segments(text_document(text)),
+            format_for_path(file_path) or "html",
+            name,
+        )
+        return True
+    except OSError as e:
+        messagebox.showerror("Error", f"Could not export file: {e}")
+        return False
 
-    root.destroy()
@@ -0,0 +1,253 @@
+# formats.py
+import os
+import re
+
+from color_runs import compute_line_starts, runs_to_offsets, runs_to_positions
+from config import MINI_COMPRESSION
+from mini_format import (
+    TEXT_CHUNK_CHARS,
+    dump_legacy,
+    is_mini_v2,
+    iter_document,
+    load_document,
+    parse_legacy,
+    save_document,
+)
+
+# Bytes read to recognize a file; sniffers never see more
+SNIFF_BYTES = 4096
+
+DEFAULT_OPEN_FORMAT = "txt"  # nothing else recognized the file
+DEFAULT_SAVE_FORMAT = "mini"  # unknown extensions are saved as .mini
+
+
+# -----------------------------
+# FORMAT REGISTRY
+# -----------------------------
+# Every file format is a dict registered here:
+#
+#   label            name shown in file dialogs
+#   extensions       extensions it saves under, default first
+#   sniff(head)      True if the first SNIFF_BYTES bytes are this format,
+#                    for a file with one of its extensions
+#   marker(head)     stricter test for files whose extension no format
+#                    knows: a signature no plain text file would start with
+#   open_extensions  extensions that imply it when no sniffer matched
+#   read(path)       -> (content, runs as character offsets)
+#   write(path, content, runs)
+#   stream(path)     optional: yields ("text", chunk, bytes_read) in order
+#                    and ("run", (start, end, color)) records in order, as
+#                    soon as each is known (with its text or after all of
+#                    it); without it chunked loading slices what read()
+#                    returns
+#   colors           False if the format drops color runs
+#
+# Files are recognized by extension first. Where an extension is shared
+# (.mini is binary v2 or legacy JSON) the header decides between the
+# formats claiming it; a file with an unknown extension is only taken for
+# a note if a marker matches. Sniffing never overrides an extension, so a
+# .txt that happens to hold JSON stays text. Opening never reads more
+# than the header to decide.
+
+FORMATS = {}
+
+
+def register_format(name, label, extensions, read, write, sniff=None,
+                    marker=None, open_extensions=(), stream=None, colors=True):
+    FORMATS[name] = {
+        "name": name,
+        "label": label,
+        "extensions": tuple(extensions),
+        "sniff": sniff,
+        "marker": marker,
+        "open_extensions": tuple(open_extensions),
+        "read": read,
+        "write": write,
+        "stream": stream,
+        "colors": colors,
+    }
+
+
+def get_format(name):
+    return FORMATS[name]
+
+
+def sniff_format(path):
+    """Name of the format path is in, from its header and extension."""
+    ext = os.path.splitext(path)[1].lower()
+    claiming = [
+        name for name, codec in FORMATS.items()
+        if ext in codec["extensions"] or ext in codec["open_extensions"]
+    ]
+    if len(claiming) == 1:
+        return claiming[0]
+
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+    if claiming:
+        for name in claiming:
+            sniff = FORMATS[name]["sniff"]
+            if sniff is not None and sniff(head):
+                return name
+        for name in claiming:
+            if ext in FORMATS[name]["open_extensions"]:
+                return name
+        return claiming[0]
+    for name, codec in FORMATS.items():
+        if codec["marker"] is not None and codec["marker"](head):
+            return name
+    return DEFAULT_OPEN_FORMAT
+
+
+def format_for_save(path):
+    """(path, format name) a save to path should use."""
+    base, ext = os.path.splitext(path)
+    ext = ext.lower()
+    for name, codec in FORMATS.items():
+        if ext in codec["extensions"]:
+            return path, name
+    return base + FORMATS[DEFAULT_SAVE_FORMAT]["extensions"][0], DEFAULT_SAVE_FORMAT
+
+
+def read_file(path, file_format):
+    """(content, offset runs) of a file in the given format."""
+    return FORMATS[file_format]["read"](path)
+
+
+def write_file(path, file_format, content, runs):
+    FORMATS[file_format]["write"](path, content, runs)
+
+
+def stream_file(path, file_format):
+    """Items as described for "stream", whether or not the format streams."""
+    codec = FORMATS[file_format]
+    if codec["stream"] is not None:
+        yield from codec["stream"](path)
+        return
+
+    content, runs = codec["read"](path)
+    yield from stream_decoded(content, runs, os.path.getsize(path))
+
+
+def stream_decoded(content, runs, size):
+    """
+    Stream items for a document already in memory: each text chunk is
+    followed by the runs that start in it, so they can be tagged with it.
+    """
+    total = max(len(content), 1)
+    r = 0
+    for i in range(0, len(content), TEXT_CHUNK_CHARS):
+        yield "text", content[i:i + TEXT_CHUNK_CHARS], size * i // total
+        while r < len(runs) and runs[r][0] < i + TEXT_CHUNK_CHARS:
+            yield "run", runs[r]
+            r += 1
+    for run in runs[r:]:
+        yield "run", run
+
+
+def _patterns(extensions):
+    return " ".join("*" + ext for ext in extensions)
+
+
+def open_filetypes():
+    """filetypes for an open dialog: everything known, then each format."""
+    known = []
+    for codec in FORMATS.values():
+        for ext in codec["extensions"] + codec["open_extensions"]:
+            if ext not in known:
+                known.append(ext)
+    return (
+        [("All Supported Files", _patterns(known))]
+        + [(codec["label"], _patterns(codec["extensions"])) for codec in FORMATS.values()]
+        + [("All Files", "*.*")]
+    )
+
+
+def save_filetypes():
+    return (
+        [(codec["label"], _patterns(codec["extensions"])) for codec in FORMATS.values()]
+        + [("All files", "*.*")]
+    )
+
+
+# -----------------------------
+# BUILT-IN FORMATS
+# -----------------------------
+def _read_mini(path):
+    return load_document(path)
+
+
+def _write_mini(path, content, runs):
+    save_document(path, content, runs, MINI_COMPRESSION)
+
+
+def _stream_mini(path):
+    with open(path, "rb") as f:
+        for kind, value in iter_document(f):
+            if kind == "text":
+                yield "text", value, f.tell()
+            else:
+                yield "run", value
+
+
+# Legacy JSON as the editor has always written it (json.dumps with
+# indent=2, "content" first), or compact with "format" up front
+LEGACY_HEAD_RE = re.compile(rb'\A\s*\{\s*"(?:content|format|tags)"\s*:')
+
+
+# Outside .np100/.mini only the explicit marker counts: plenty of JSON
+# starts with a "content" or "format" key
+LEGACY_MARKER_RE = re.compile(rb'"format"\s*:\s*"np100"')
+
+
+def _sniff_np100(head):
+    return LEGACY_HEAD_RE.match(head) is not None
+
+
+def _marker_np100(head):
+    return _sniff_np100(head) and LEGACY_MARKER_RE.search(head) is not None
+
+
+def _read_np100(path):
+    with open(path, "r", encoding="utf-8") as f:
+        content, positions = parse_legacy(f.read())
+    return content, runs_to_offsets(positions, compute_line_starts(content), len(content))
+
+
+def _write_np100(path, content, runs):
+    data = dump_legacy(content, runs_to_positions(runs, compute_line_starts(content)))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(data)
+
+
+def _read_txt(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read(), []
+
+
+def _write_txt(path, content, runs):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _stream_txt(path):
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(TEXT_CHUNK_CHARS)
+            if not chunk:
+                return
+            yield "text", chunk, f.buffer.tell()
+
+
+register_format(
+    "mini", "Mini Notes", [".mini"], _read_mini, _write_mini,
+    sniff=is_mini_v2, marker=is_mini_v2, stream=_stream_mini,
+)
+register_format(
+    "np100", "NP100 Notes", [".np100"], _read_np100, _write_np100,
+    sniff=_sniff_np100, marker=_marker_np100, open_extensions=[".np100", ".mini"],  # v1 .mini was JSON
+)
+register_format(
+    "txt", "Text files", [".txt"], _read_txt, _write_txt,
+    stream=_stream_txt, colors=False,
+)
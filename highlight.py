@@ -0,0 +1,355 @@
+# highlight.py
+import queue
+import re
+import threading
+from array import array
+
+from color_runs import compute_line_starts, offset_to_position
+from config import (
+    HIGHLIGHT_APPLY_LINES,
+    HIGHLIGHT_CHUNK_LINES,
+    HIGHLIGHT_COLORS,
+    HIGHLIGHT_DELAY_MS,
+)
+from text_hooks import add_change_listener, remove_change_listener
+
+HIGHLIGHT_POLL_MS = 10
+
+
+# -----------------------------
+# LEXER (pure, runs on the worker)
+# -----------------------------
+# Only fenced blocks are highlighted:
+#
+#   ```powershell            (also ps, ps1, pwsh)
+#   Get-ChildItem -Recurse
+#   ```
+#
+# A line's lexer state is one small int: 0 outside any fence, otherwise
+# language * 4 + mode, where mode tracks the constructs that span lines
+# (PowerShell block comments and here-strings). States are what make edits
+# incremental: relexing stops at the first line past the edit whose end
+# state is unchanged, because nothing below it can change either.
+
+OUTSIDE, PS, SH, OTHER = 0, 1, 2, 3
+NORMAL, BLOCK_COMMENT, HERE_DOUBLE, HERE_SINGLE = 0, 1, 2, 3
+
+FENCE_LANGUAGES = {
+    "powershell": PS, "ps": PS, "ps1": PS, "pwsh": PS,
+    "sh": SH, "bash": SH, "shell": SH, "zsh": SH, "console": SH,
+}
+
+PS_TOKEN = re.compile(r"""
+     (?P<block_open><\#)
+    |(?P<comment>\#.*)
+    |(?P<here_open>@["'][ \t]*$)
+    |(?P<string>"(?:`.|[^"`])*"?|'(?:''|[^'])*'?)
+    |(?P<variable>\$(?:\{[^}]*\}|[\w:?]+))
+    |(?P<operator>-(?:eq|ne|gt|ge|lt|le|like|notlike|match|notmatch|contains
+                    |notcontains|in|notin|replace|split|join|and|or|not|xor
+                    |is|isnot|as|band|bor|f)\b)
+    |(?P<parameter>-[A-Za-z]\w*)
+    |(?P<cmdlet>\b[A-Za-z]+-[A-Za-z]+\b)
+    |(?P<keyword>\b(?:if|elseif|else|switch|foreach|for|while|do|until|function
+                   |filter|param|begin|process|end|return|break|continue|try
+                   |catch|finally|throw|trap|exit|in)\b)
+    |(?P<number>\b\d+(?:\.\d+)?(?:[kmgt]b)?\b)
+""", re.X | re.I)
+
+SH_TOKEN = re.compile(r"""
+     (?P<comment>(?:^|(?<=\s))\#.*)
+    |(?P<string>"(?:\\.|[^"\\])*"?|'[^']*'?)
+    |(?P<variable>\$(?:\{[^}]*\}|\w+|[?$#@!*0-9]))
+    |(?P<parameter>(?:^|(?<=\s))--?[A-Za-z][\w-]*)
+    |(?P<keyword>\b(?:if|then|else|elif|fi|for|in|do|done|while|until|case
+                   |esac|function|return|export|local|sudo)\b)
+    |(?P<number>\b\d+\b)
+""", re.X)
+
+
+def lex_lines(lines, state):
+    """Lex consecutive lines: returns (end state per line, spans per line)."""
+    ends = []
+    spans = []
+    for line in lines:
+        state, line_spans = _lex_line(line, state)
+        if line_spans and not line.isascii():
+            line_spans = _tk_columns(line, line_spans)
+        ends.append(state)
+        spans.append(line_spans)
+    return ends, spans
+
+
+def _tk_columns(line, spans):
+    """Spans as Tk columns, where an emoji takes two (color_runs.py)."""
+    line_starts = compute_line_starts(line)
+    return [
+        (offset_to_position(line_starts, start)[1], offset_to_position(line_starts, end)[1], kind)
+        for start, end, kind in spans
+    ]
+
+
+def _lex_line(line, state):
+    stripped = line.strip()
+    if stripped.startswith("```"):
+        if state == OUTSIDE:
+            info = stripped[3:].strip().split(" ")[0].lower()
+            return FENCE_LANGUAGES.get(info, OTHER) * 4, [(0, len(line), "fence")]
+        if stripped == "```":
+            return OUTSIDE, [(0, len(line), "fence")]
+
+    language, mode = divmod(state, 4)
+    if language == PS:
+        mode, spans = _lex_powershell(line, mode)
+        return PS * 4 + mode, spans
+    if language == SH:
+        return state, [(m.start(), m.end(), m.lastgroup) for m in SH_TOKEN.finditer(line)]
+    return state, []
+
+
+def _lex_powershell(line, mode):
+    spans = []
+    pos = 0
+
+    if mode == BLOCK_COMMENT:
+        close = line.find("#>")
+        if close < 0:
+            return mode, [(0, len(line), "comment")]
+        spans.append((0, close + 2, "comment"))
+        pos = close + 2
+    elif mode in (HERE_DOUBLE, HERE_SINGLE):
+        closer = '"@' if mode == HERE_DOUBLE else "'@"
+        if not line.startswith(closer):
+            return mode, [(0, len(line), "string")]
+        spans.append((0, 2, "string"))
+        pos = 2
+
+    while True:
+        m = PS_TOKEN.search(line, pos)
+        if m is None:
+            return NORMAL, spans
+        kind = m.lastgroup
+        if kind == "block_open":
+            close = line.find("#>", m.end())
+            if close < 0:
+                spans.append((m.start(), len(line), "comment"))
+                return BLOCK_COMMENT, spans
+            spans.append((m.start(), close + 2, "comment"))
+            pos = close + 2
+        elif kind == "here_open":
+            spans.append((m.start(), len(line), "string"))
+            return HERE_DOUBLE if m.group()[1] == '"' else HERE_SINGLE, spans
+        else:
+            spans.append((m.start(), m.end(), kind))
+            pos = m.end()
+
+
+def _worker(jobs, results):
+    while True:
+        request, first, state, lines = jobs.get()
+        results.put((request, first) + lex_lines(lines, state))
+
+
+# -----------------------------
+# TK SIDE
+# -----------------------------
+# The Tk thread keeps one end state per line (an array spliced as lines are
+# added or removed, so it stays aligned) and the range of lines an edit
+# made dirty. It hands the worker a chunk of lines starting at the first
+# dirty one, compares the returned end states with the stored ones to see
+# where the change stops, and asks for another chunk only if it does not.
+# Results are applied visible lines first, HIGHLIGHT_APPLY_LINES at a time.
+# Auto tags are "syn_*", kept below every other tag so manual colors win,
+# and never saved: only color_* tags are part of the document.
+
+
+def start_highlighter(text, state):
+    if state.get("highlight") is not None:
+        return state["highlight"]
+
+    jobs, results = queue.Queue(), queue.Queue()
+    threading.Thread(target=_worker, args=(jobs, results), daemon=True).start()
+
+    last_line = _last_line(text)
+    hl = {
+        "text": text,
+        "states": array("h", [-1]) * last_line,
+        "dirty": [1, last_line],
+        "pending": {},  # line -> spans waiting to be tagged
+        "jobs": jobs,
+        "results": results,
+        "request": 0,  # id of the chunk in flight; edits make it stale
+        "busy": False,
+        "after_id": None,
+        "apply_id": None,
+    }
+    for kind, color in HIGHLIGHT_COLORS.items():
+        text.tag_configure("syn_" + kind, foreground=color)
+        text.tag_lower("syn_" + kind)
+
+    hl["listener"] = lambda *change: _on_change(hl, *change)
+    add_change_listener(text, hl["listener"])
+    state["highlight"] = hl
+    _schedule(hl)
+    return hl
+
+
+def stop_highlighter(state):
+    hl = state.get("highlight")
+    if hl is None:
+        return
+    state["highlight"] = None
+    text = hl["text"]
+    remove_change_listener(text, hl["listener"])
+    hl["request"] += 1
+    for after_id in (hl["after_id"], hl["apply_id"]):
+        if after_id is not None:
+            text.after_cancel(after_id)
+    for kind in HIGHLIGHT_COLORS:
+        text.tag_delete("syn_" + kind)
+
+
+def _last_line(text):
+    return int(text.index("end-1c").split(".")[0])
+
+
+def _on_change(hl, op, start, end, detail):
+    if op not in ("insert", "delete"):
+        return
+    line = int(start.split(".")[0])
+    states = hl["states"]
+
+    if op == "insert":
+        added = detail.count("\n")
+        # New entries go before the edited line's, so its old end state
+        # lines up with the line that now ends where it used to
+        if added:
+            states[line - 1:line - 1] = array("h", [-1]) * added
+
+        def moved(n):
+            return n + added if n > line else n
+
+        touched = (line, line + added)
+    else:
+        removed = int(end.split(".")[0]) - line
+        if removed:
+            del states[line - 1:line - 1 + removed]
+
+        def moved(n):
+            if n <= line:
+                return n
+            return line if n <= line + removed else n - removed
+
+        touched = (line, line)
+
+    dirty = hl["dirty"]
+    if dirty is None:
+        hl["dirty"] = list(touched)
+    else:
+        hl["dirty"] = [min(moved(dirty[0]), touched[0]), max(moved(dirty[1]), touched[1])]
+
+    if hl["pending"]:
+        hl["pending"] = {
+            moved(n): spans for n, spans in hl["pending"].items()
+            if not touched[0] <= moved(n) <= touched[1]
+        }
+
+    hl["request"] += 1  # a chunk in flight was cut from the old text
+    hl["busy"] = False
+    _schedule(hl)
+
+
+def _schedule(hl):
+    if hl["after_id"] is None and not hl["busy"] and hl["dirty"] is not None:
+        hl["after_id"] = hl["text"].after(HIGHLIGHT_DELAY_MS, lambda: _request(hl))
+
+
+def _request(hl):
+    hl["after_id"] = None
+    if hl["dirty"] is None or hl["busy"]:
+        return
+    text = hl["text"]
+    first = hl["dirty"][0]
+    count = min(HIGHLIGHT_CHUNK_LINES, len(hl["states"]) - first + 1)
+    if count <= 0:
+        hl["dirty"] = None
+        return
+
+    lines = text.get(f"{first}.0", f"{first + count}.0").split("\n")[:count]
+    state = hl["states"][first - 2] if first > 1 else OUTSIDE
+    hl["request"] += 1
+    request = hl["request"]
+    hl["busy"] = True
+    hl["jobs"].put((request, first, state, lines))
+    text.after(HIGHLIGHT_POLL_MS, lambda: _poll(hl, request))
+
+
+def _poll(hl, request):
+    if request != hl["request"]:
+        return  # superseded by an edit, which already rescheduled
+    while True:
+        try:
+            done, first, ends, spans = hl["results"].get_nowait()
+        except queue.Empty:
+            hl["text"].after(HIGHLIGHT_POLL_MS, lambda: _poll(hl, request))
+            return
+        if done == request:
+            break  # older chunks were cut from text that has changed since
+    hl["busy"] = False
+
+    states = hl["states"]
+    dirty_end = hl["dirty"][1]
+    line = first
+    for end_state, line_spans in zip(ends, spans):
+        old = states[line - 1]
+        states[line - 1] = end_state
+        hl["pending"][line] = line_spans
+        if line >= dirty_end and end_state == old:
+            hl["dirty"] = None  # converged: the rest of the document stands
+            break
+        line += 1
+    else:
+        if line > len(states):
+            hl["dirty"] = None
+        else:
+            hl["dirty"] = [line, max(dirty_end, line)]
+
+    _schedule(hl)
+    if hl["apply_id"] is None:
+        hl["apply_id"] = hl["text"].after_idle(lambda: _apply(hl))
+
+
+def _apply(hl):
+    hl["apply_id"] = None
+    pending = hl["pending"]
+    if not pending:
+        return
+    text = hl["text"]
+
+    top = int(text.index("@0,0").split(".")[0])
+    bottom = int(text.index(f"@0,{text.winfo_height()}").split(".")[0])
+    visible = [n for n in range(top, bottom + 1) if n in pending]
+    batch = visible or sorted(pending)[:HIGHLIGHT_APPLY_LINES]
+
+    by_kind = {kind: [] for kind in HIGHLIGHT_COLORS}
+    for n in batch:
+        for start, end, kind in pending.pop(n):
+            by_kind[kind] += (f"{n}.{start}", f"{n}.{end}")
+
+    # One remove per tag per block of consecutive lines (through the next
+    # line start: a newline typed inside a token inherits its tag), one add
+    # per tag
+    batch.sort()
+    block_start = batch[0]
+    for i, n in enumerate(batch):
+        if i + 1 == len(batch) or batch[i + 1] != n + 1:
+            for kind in HIGHLIGHT_COLORS:
+                text.tag_remove("syn_" + kind, f"{block_start}.0", f"{n + 1}.0")
+            if i + 1 < len(batch):
+                block_start = batch[i + 1]
+    for kind, indices in by_kind.items():
+        if indices:
+            text.tag_add("syn_" + kind, *indices)
+
+    if pending:
+        hl["apply_id"] = text.after(1, lambda: _apply(hl))
@@ -0,0 +1,182 @@
+# instance.py
+import json
+import os
+import queue
+import socket
+import stat
+import threading
+
+from lazy import tempfile
+from locks import normalize_path
+
+CONNECT_TIMEOUT = 0.5
+POLL_MS = 100
+
+
+# -----------------------------
+# SINGLE INSTANCE
+# -----------------------------
+# The first mini_notes listens on a per-user Unix socket. A later launch
+# with a file argument connects, sends the path and exits; the running
+# process opens it (or just raises its window when the file is already
+# showing). Without AF_UNIX (older Windows Pythons) every launch simply
+# runs on its own.
+#
+# Protocol: one JSON line {"open": "<absolute path>"} answered by "ok\n".
+#
+# The socket lives where only its user can reach it: $XDG_RUNTIME_DIR, or
+# else a private (0700) directory in the temp dir that must belong to us.
+# Anything else there (someone else's directory, a symlink, loose
+# permissions) means no single instance rather than talking to a stranger.
+
+
+def _private_dir():
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return runtime
+    if not hasattr(os, "getuid"):  # Windows: the temp dir is per-user
+        return tempfile.gettempdir()
+
+    path = os.path.join(tempfile.gettempdir(), f"mini_notes-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return None
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        return None
+    return path
+
+
+def socket_path():
+    """Path of this user's instance socket, or None if there is no safe place."""
+    directory = _private_dir()
+    return os.path.join(directory, "mini_notes.sock") if directory else None
+
+
+def _available():
+    return hasattr(socket, "AF_UNIX")
+
+
+def forward_open(file_path):
+    """Hand file_path to a running instance; True if one took it."""
+    if not _available():
+        return False
+
+    path = socket_path()
+    if path is None:
+        return False
+
+    message = json.dumps({"open": normalize_path(file_path)}) + "\n"
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(CONNECT_TIMEOUT)
+            client.connect(path)
+            client.sendall(message.encode("utf-8"))
+            return client.makefile("r", encoding="utf-8").readline().strip() == "ok"
+    except OSError:
+        return False  # nobody listening (or a dead socket file)
+
+
+def start_instance_server(root, on_open):
+    """
+    Listen for forwarded opens; on_open(path) runs on the Tk thread.
+    Returns the server dict, or None when another instance already serves.
+    """
+    if not _available():
+        return None
+
+    path = socket_path()
+    if path is None:
+        return None
+    server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server_socket.bind(path)
+    except OSError:
+        # Either a live server or a socket file left by a crash
+        if _probe(path):
+            server_socket.close()
+            return None
+        try:
+            os.remove(path)
+            server_socket.bind(path)
+        except OSError:
+            server_socket.close()
+            return None
+
+    server_socket.listen(8)
+    server = {
+        "socket": server_socket,
+        "path": path,
+        "requests": queue.Queue(),
+        "closed": False,
+    }
+    threading.Thread(target=_serve, args=(server,), daemon=True).start()
+
+    def poll():
+        if server["closed"]:
+            return
+        while True:
+            try:
+                file_path = server["requests"].get_nowait()
+            except queue.Empty:
+                break
+            on_open(file_path)
+        root.after(POLL_MS, poll)
+
+    root.after(POLL_MS, poll)
+    return server
+
+
+def _probe(path):
+    """True if something answers on the socket at path."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(CONNECT_TIMEOUT)
+            client.connect(path)
+            return True
+    except OSError:
+        return False
+
+
+def stop_instance_server(server):
+    if server is None or server["closed"]:
+        return
+    server["closed"] = True
+    try:
+        server["socket"].close()
+    finally:
+        try:
+            os.remove(server["path"])
+        except OSError:
+            pass
+
+
+# -----------------------------
+# LISTENER (background thread)
+# -----------------------------
+def _serve(server):
+    while not server["closed"]:
+        try:
+            conn, _ = server["socket"].accept()
+        except OSError:
+            return  # socket closed on exit
+        with conn:
+            try:
+                conn.settimeout(CONNECT_TIMEOUT)
+                line = conn.makefile("r", encoding="utf-8").readline()
+                file_path = json.loads(line).get("open")
+                if file_path:
+                    server["requests"].put(file_path)
+                conn.sendall(b"ok\n")
+            except (OSError, ValueError, AttributeError):
+                pass
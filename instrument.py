@@ -0,0 +1,155 @@
+# instrument.py
+import functools
+import json
+import time
+import tracemalloc
+from collections import deque
+
+from config import INSTRUMENT_BUCKETS_MS, INSTRUMENT_RING_SIZE
+from text_hooks import proxy_stats
+
+
+# -----------------------------
+# HOT-PATH INSTRUMENTATION
+# -----------------------------
+# Handlers are wrapped once, at definition, with @instrumented("name").
+# While disabled a wrapper costs one dict lookup before calling through.
+# Enabled, each call records its latency in a per-handler histogram, the
+# number of Text widget commands it issued (counted by the change hook's
+# proxy), and an entry in a ring buffer of recent calls. With tracemalloc
+# on, every loaded document also gets a memory snapshot.
+
+STATS = {
+    "enabled": False,
+    "handlers": {},
+    "recent": deque(maxlen=INSTRUMENT_RING_SIZE),
+    "memory": {},
+}
+
+
+def instrumented(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not STATS["enabled"]:
+                return fn(*args, **kwargs)
+            calls = proxy_stats["calls"]
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - t0) * 1000, proxy_stats["calls"] - calls)
+        return wrapper
+    return decorate
+
+
+def record(name, ms, tcl_calls):
+    handler = STATS["handlers"].get(name)
+    if handler is None:
+        handler = STATS["handlers"][name] = {
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "tcl_calls": 0,
+            "buckets": [0] * (len(INSTRUMENT_BUCKETS_MS) + 1),
+        }
+    handler["count"] += 1
+    handler["total_ms"] += ms
+    handler["max_ms"] = max(handler["max_ms"], ms)
+    handler["tcl_calls"] += tcl_calls
+
+    bucket = 0
+    while bucket < len(INSTRUMENT_BUCKETS_MS) and ms > INSTRUMENT_BUCKETS_MS[bucket]:
+        bucket += 1
+    handler["buckets"][bucket] += 1
+
+    STATS["recent"].append((time.time(), name, round(ms, 3), tcl_calls))
+
+
+def track_key_latency(text):
+    """
+    Time each keypress until Tk has redrawn after it: the class binding
+    inserts the character after this one runs, and the nested after_idle
+    lands behind the redisplay that insert schedules.
+    """
+    def on_key(event):
+        if not STATS["enabled"]:
+            return
+        calls = proxy_stats["calls"]
+        t0 = time.perf_counter()
+
+        def done():
+            record("key", (time.perf_counter() - t0) * 1000, proxy_stats["calls"] - calls)
+
+        text.after_idle(lambda: text.after_idle(done))
+
+    text.bind("<Key>", on_key, add="+")
+
+
+# -----------------------------
+# CONTROL
+# -----------------------------
+def set_enabled(enabled):
+    STATS["enabled"] = enabled
+
+
+def set_tracemalloc(enabled):
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def reset_stats():
+    STATS["handlers"].clear()
+    STATS["recent"].clear()
+    STATS["memory"].clear()
+
+
+def record_document_memory(file_path):
+    """Snapshot traced memory for the document just loaded (tracemalloc on)."""
+    if not tracemalloc.is_tracing():
+        return
+    current, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+    STATS["memory"][file_path or "untitled"] = {
+        "time": time.time(),
+        "current_kb": current // 1024,
+        "peak_kb": peak // 1024,
+        "top": [
+            {"where": str(stat.traceback[0]), "kb": stat.size // 1024, "count": stat.count}
+            for stat in top
+        ],
+    }
+
+
+def summary():
+    """Handler stats as a JSON-ready dict, slowest total first."""
+    handlers = {}
+    for name, h in sorted(STATS["handlers"].items(), key=lambda i: -i[1]["total_ms"]):
+        handlers[name] = {
+            "count": h["count"],
+            "mean_ms": round(h["total_ms"] / h["count"], 3),
+            "max_ms": round(h["max_ms"], 3),
+            "tcl_calls_per_call": round(h["tcl_calls"] / h["count"], 1),
+            "histogram_ms": dict(zip(
+                [f"<={edge}" for edge in INSTRUMENT_BUCKETS_MS] + [f">{INSTRUMENT_BUCKETS_MS[-1]}"],
+                h["buckets"],
+            )),
+        }
+    return handlers
+
+
+def dump_stats(path):
+    document = {
+        "enabled": STATS["enabled"],
+        "tracemalloc": tracemalloc.is_tracing(),
+        "handlers": summary(),
+        "recent": [
+            {"time": t, "handler": name, "ms": ms, "tcl_calls": calls}
+            for t, name, ms, calls in STATS["recent"]
+        ],
+        "memory": STATS["memory"],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
@@ -0,0 +1,510 @@
+# journal.py
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+
+from color_runs import (
+    append_run,
+    compute_line_starts,
+    normalize_runs,
+    paint_run,
+    parse_position,
+    position_to_offset,
+    runs_to_offsets,
+    runs_to_positions,
+    tk_length,
+)
+from config import JOURNAL_COMPACT_BYTES
+from formats import read_file, write_file
+from text_hooks import (
+    add_change_listener,
+    advance_index,
+    install_change_hook,
+    remove_change_listener,
+)
+
+# -----------------------------
+# EDIT JOURNAL
+# -----------------------------
+# In journaled save mode a save appends the edits made since the previous
+# save to "<file>.journal" instead of rewriting the file:
+#
+#   header   b"MNJ1 " + hash of the base file + b"\n"
+#   records  u32 length | u32 crc32 | JSON list of ops
+#
+# One record per save, so a record torn by a crash is a torn save; it fails
+# its length/crc check and is ignored along with anything after it. Ops use
+# Tk positions as recorded by the change hook:
+#
+#   ["i", "l.c", chars]       insert; the text takes the tags on both sides
+#   ["i", "l.c", chars, hex]  insert with exactly that color ("": none)
+#   ["d", "l.c", "l.c"]       delete
+#   ["t+", "l.c", "l.c", hex] color added
+#   ["t-", "l.c", "l.c", hex] color removed
+#
+# Once the journal passes JOURNAL_COMPACT_BYTES a worker thread folds it
+# into the base file. The header hash ties a journal to one exact base, so
+# a journal left over from before a compaction or a full save never
+# replays twice. A compaction writes the journal for the new base, holding
+# the records appended meanwhile, to "<file>.journal.next" before it
+# replaces the base: a crash at any point leaves one journal or the other
+# matching whichever base is on disk.
+
+JOURNAL_MAGIC = b"MNJ1 "
+RECORD_HEADER = struct.Struct(">II")
+
+
+def journal_path(file_path):
+    return file_path + ".journal"
+
+
+def _next_path(file_path):
+    """The journal a compaction prepared for its new base."""
+    return journal_path(file_path) + ".next"
+
+
+def hash_file(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path):
+    """[size, mtime_ns, journal size]: a new journal record changes the note too."""
+    st = os.stat(path)
+    try:
+        journal_size = os.path.getsize(journal_path(path))
+    except OSError:
+        journal_size = -1
+    return [st.st_size, st.st_mtime_ns, journal_size]
+
+
+def _header(base_hash):
+    return JOURNAL_MAGIC + base_hash.encode("ascii") + b"\n"
+
+
+# -----------------------------
+# READING
+# -----------------------------
+def read_journal(file_path, base_hash, limit=None):
+    """
+    Return (ops, valid_size) for the journal of file_path, or (None, 0) when
+    there is none or it belongs to a different base. valid_size is where
+    the last intact record ends.
+    """
+    header = _header(base_hash)
+    data = _journal_data(journal_path(file_path), header, limit)
+    if data is None:
+        # Compaction replaced the base but died before its journal
+        data = _journal_data(_next_path(file_path), header, limit)
+    if data is None:
+        return None, 0
+
+    ops = []
+    pos = len(header)
+    while pos + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, pos)
+        payload = data[pos + RECORD_HEADER.size:pos + RECORD_HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break  # torn or corrupt tail
+        try:
+            ops.extend(json.loads(payload.decode("utf-8")))
+        except ValueError:
+            break
+        pos += RECORD_HEADER.size + length
+
+    return ops, pos
+
+
+def _journal_data(path, header, limit):
+    try:
+        with open(path, "rb") as f:
+            data = f.read() if limit is None else f.read(limit)
+    except OSError:
+        return None
+    return data if data.startswith(header) else None
+
+
+def replay_into_text(text, ops):
+    """Re-apply journaled ops to a Text that holds the base document."""
+    for op in ops:
+        kind = op[0]
+        if kind == "i" and len(op) > 3:
+            if op[3]:
+                text.insert(op[1], op[2], "color_" + op[3])
+                text.tag_config("color_" + op[3], foreground=op[3])
+            else:
+                text.insert(op[1], op[2], "")
+        elif kind == "i":
+            text.insert(op[1], op[2])
+        elif kind == "d":
+            text.delete(op[1], op[2])
+        elif kind == "t+":
+            tag = "color_" + op[3]
+            text.tag_add(tag, op[1], op[2])
+            text.tag_config(tag, foreground=op[3])
+        elif kind == "t-":
+            text.tag_remove("color_" + op[3], op[1], op[2])
+
+
+def _has_journal(file_path):
+    return os.path.exists(journal_path(file_path)) or os.path.exists(_next_path(file_path))
+
+
+def replay_journal_file(text, file_path):
+    """Apply file_path's journal, if any, to the freshly loaded Text."""
+    if not _has_journal(file_path):
+        return False
+    ops, _ = read_journal(file_path, hash_file(file_path))
+    if not ops:
+        return False
+    replay_into_text(text, ops)
+    return True
+
+
+def resume_journal(text, state, file_path, file_format):
+    """
+    Called once a file has been loaded into the Text: replays its journal
+    and, in journaled save mode, starts recording. Returns True when the
+    journal changed the document.
+    """
+    replayed = replay_journal_file(text, file_path)
+    if state.get("journal_enabled"):
+        start_journal(text, state, file_path, file_format)
+    return replayed
+
+
+# -----------------------------
+# PURE-PYTHON REPLAY (compaction)
+# -----------------------------
+# Ops carry Tk positions, so columns here are Tk columns (tk_length()):
+# lines are only sliced through _at()
+
+def _at(line, col):
+    """Index into the str `line` of Tk column col."""
+    if line.isascii():
+        return col
+    return position_to_offset(compute_line_starts(line), (1, col), len(line))
+
+
+def _clamp(lines, position):
+    line, col = position
+    if line > len(lines):
+        return len(lines), tk_length(lines[-1])
+    return line, min(col, tk_length(lines[line - 1]))
+
+
+def _shift_insert(q, p, chars, parts):
+    """Where position q ends up after inserting chars at p (q >= p)."""
+    line, col = p
+    newlines = len(parts) - 1
+    if q[0] == line:
+        if newlines:
+            return line + newlines, q[1] - col + tk_length(parts[-1])
+        return line, q[1] + tk_length(chars)
+    return q[0] + newlines, q[1]
+
+
+def _shift_delete(q, a, b):
+    if q <= a:
+        return q
+    if q <= b:
+        return a
+    if q[0] == b[0]:
+        return a[0], a[1] + q[1] - b[1]
+    return q[0] - (b[0] - a[0]), q[1]
+
+
+def _insert(lines, runs, p, chars, color=None, tagged=False):
+    """Insert chars at p; tagged: it gets exactly color, not its neighbours'."""
+    line, col = p
+    current = lines[line - 1]
+    at = _at(current, col)
+    parts = chars.split("\n")
+    if len(parts) == 1:
+        lines[line - 1] = current[:at] + chars + current[at:]
+    else:
+        lines[line - 1:line] = (
+            [current[:at] + parts[0]] + parts[1:-1] + [parts[-1] + current[at:]]
+        )
+
+    # Tk only tags inserted text when the tag is on both sides of it: a run
+    # starting at p moves right, a run ending at p stays put. Text inserted
+    # with a tag list (tagged) gets exactly its tags instead.
+    for i, (start, end, run_color) in enumerate(runs):
+        if end < p or (end == p and start < p):
+            continue
+        if start >= p:
+            start = _shift_insert(start, p, chars, parts)
+        end = _shift_insert(end, p, chars, parts)
+        runs[i] = (start, end, run_color)
+
+    if tagged:
+        paint_run(runs, p, _shift_insert(p, p, chars, parts), color)
+
+
+def _delete(lines, runs, a, b):
+    if b <= a:
+        return
+    first, last = lines[a[0] - 1], lines[b[0] - 1]
+    lines[a[0] - 1:b[0]] = [first[:_at(first, a[1])] + last[_at(last, b[1]):]]
+    shifted = []
+    for start, end, color in runs:
+        start, end = _shift_delete(start, a, b), _shift_delete(end, a, b)
+        if start < end:
+            # Same-color runs that now touch become one, as one Tk tag would
+            append_run(shifted, start, end, color)
+    runs[:] = shifted
+
+
+def _remove_color(runs, a, b, color):
+    kept = []
+    for start, end, run_color in runs:
+        if run_color != color or end <= a or start >= b:
+            kept.append((start, end, run_color))
+            continue
+        if start < a:
+            kept.append((start, a, run_color))
+        if end > b:
+            kept.append((b, end, run_color))
+    runs[:] = kept
+
+
+def replay(content, runs, ops):
+    """Apply ops to (content, offset runs) without Tk; returns the same shape."""
+    lines = content.split("\n")
+    positions = runs_to_positions(runs, compute_line_starts(content))
+
+    for op in ops:
+        kind = op[0]
+        if kind == "i":
+            position = _clamp(lines, parse_position(op[1]))
+            if len(op) > 3:
+                _insert(lines, positions, position, op[2], op[3] or None, tagged=True)
+            else:
+                _insert(lines, positions, position, op[2])
+        elif kind == "d":
+            a = _clamp(lines, parse_position(op[1]))
+            b = _clamp(lines, parse_position(op[2]))
+            _delete(lines, positions, a, b)
+        elif kind in ("t+", "t-"):
+            a = _clamp(lines, parse_position(op[1]))
+            b = _clamp(lines, parse_position(op[2]))
+            if a >= b:
+                continue
+            if kind == "t+":
+                paint_run(positions, a, b, op[3])
+            else:
+                _remove_color(positions, a, b, op[3])
+
+    content = "\n".join(lines)
+    positions = normalize_runs(positions)
+    return content, runs_to_offsets(positions, compute_line_starts(content), len(content))
+
+
+# -----------------------------
+# BASE FILE I/O (pure Python)
+# -----------------------------
+def read_current(path, file_format):
+    """The base file with any pending journal applied: (content, offset runs)."""
+    content, runs = read_file(path, file_format)
+    if not _has_journal(path):
+        return content, runs
+    ops, _ = read_journal(path, hash_file(path))
+    if ops:
+        content, runs = replay(content, runs, ops)
+    return content, runs
+
+
+# -----------------------------
+# SESSION (Tk thread)
+# -----------------------------
+def start_journal(text, state, file_path, file_format):
+    """
+    Begin journaling edits against the file just loaded or fully saved.
+    An existing journal for the same base is kept (minus any torn tail).
+    """
+    stop_journal(text, state)
+
+    base_hash = hash_file(file_path)
+    _settle_journal(file_path, base_hash)
+    ops, valid_size = read_journal(file_path, base_hash)
+    path = journal_path(file_path)
+
+    if ops is None:
+        with open(path, "wb") as f:
+            f.write(_header(base_hash))
+        valid_size = len(_header(base_hash))
+    elif os.path.getsize(path) != valid_size:
+        with open(path, "r+b") as f:
+            f.truncate(valid_size)
+
+    session = {
+        "path": file_path,
+        "format": file_format,
+        "base_hash": base_hash,
+        "size": valid_size,
+        "pending": [],
+        "lock": threading.Lock(),
+        "compacting": False,
+        "compacted": None,  # os.stat of the base the last compaction wrote
+        "closed": False,
+    }
+
+    hook = install_change_hook(text)
+
+    def record(op, start, end, detail):
+        if op == "insert" and hook["inserted"] is not None:
+            for chars, tags in hook["inserted"]:
+                if tags is None:
+                    session["pending"].append(["i", start, chars])
+                else:
+                    session["pending"].append(["i", start, chars, _tags_color(tags)])
+                start = advance_index(start, chars)
+        elif op == "insert":
+            session["pending"].append(["i", start, detail])
+        elif op == "delete":
+            session["pending"].append(["d", start, end])
+        elif start != end:
+            kind = "t+" if op == "tag_add" else "t-"
+            session["pending"].append([kind, start, end, detail[len("color_"):]])
+
+    session["listener"] = record
+    add_change_listener(text, record)
+    state["journal"] = session
+    return session
+
+
+def _tags_color(tags):
+    """The color an insert's tag list gives its text, "" for none."""
+    colors = [tag[len("color_"):] for tag in tags if tag.startswith("color_")]
+    return colors[-1] if colors else ""
+
+
+def _settle_journal(file_path, base_hash):
+    """Finish or drop what an interrupted compaction left behind."""
+    next_path = _next_path(file_path)
+    if not os.path.exists(next_path):
+        return
+    header = _header(base_hash)
+    current = _journal_data(journal_path(file_path), header, len(header))
+    if current is None and _journal_data(next_path, header, len(header)) is not None:
+        os.replace(next_path, journal_path(file_path))
+    else:
+        os.remove(next_path)
+
+
+def stop_journal(text, state):
+    session = state.get("journal")
+    if session is None:
+        return
+    remove_change_listener(text, session["listener"])
+    with session["lock"]:
+        session["closed"] = True
+    state["journal"] = None
+
+
+def can_append(state, file_path, file_format):
+    session = state.get("journal")
+    return (
+        session is not None
+        and session["path"] == file_path
+        and session["format"] == file_format
+        and os.path.exists(file_path)
+    )
+
+
+def append_pending(state):
+    """Write the edits since the last save as one record."""
+    session = state["journal"]
+    if session["pending"]:
+        payload = json.dumps(
+            session["pending"], ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        with session["lock"]:
+            with open(journal_path(session["path"]), "ab") as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+            session["size"] += len(record)
+        session["pending"] = []
+
+    if session["size"] >= JOURNAL_COMPACT_BYTES and not session["compacting"]:
+        session["compacting"] = True
+        threading.Thread(target=_compact, args=(session,), daemon=True).start()
+
+
+def discard_journal(file_path):
+    """A full save makes any journal for file_path obsolete."""
+    for path in (journal_path(file_path), _next_path(file_path)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# -----------------------------
+# COMPACTION (worker thread)
+# -----------------------------
+def _fsync_file(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def _write_synced(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _compact(session):
+    path = session["path"]
+    tmp = path + ".compact.tmp"
+    try:
+        with session["lock"]:
+            limit = session["size"]
+            base_hash = session["base_hash"]
+
+        ops, valid_size = read_journal(path, base_hash, limit)
+        if ops is None:
+            return
+        content, runs = replay(*read_file(path, session["format"]), ops)
+        write_file(tmp, session["format"], content, runs)
+        _fsync_file(tmp)
+        new_hash = hash_file(tmp)
+
+        with session["lock"]:
+            if session["closed"]:
+                return
+            with open(journal_path(path), "rb") as f:
+                f.seek(valid_size)
+                tail = f.read()
+
+            # The new base's journal is on disk before the base is: dying
+            # before the replace leaves the old pair, after it the new base
+            # with its .next journal, which read_journal() falls back to
+            new_journal = _header(new_hash) + tail
+            _write_synced(_next_path(path), new_journal)
+            os.replace(tmp, path)
+            session["compacted"] = os.stat(path)
+            os.replace(_next_path(path), journal_path(path))
+
+            session["base_hash"] = new_hash
+            session["size"] = len(new_journal)
+    except (OSError, ValueError):
+        pass  # the journal stays valid; compaction is retried on a later save
+    finally:
+        session["compacting"] = False
+        if os.path.exists(tmp):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
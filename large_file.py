@@ -0,0 +1,571 @@
+# large_file.py
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from color_runs import compute_line_starts, paint_run, position_to_offset, tk_length
+from config import (
+    DATA_DIR,
+    LARGE_WINDOW_LINES,
+    LARGE_WINDOW_MARGIN,
+    LARGE_INDEX_BLOCK,
+)
+from editor_ops import apply_color_runs, get_color_runs
+from search_engine import PLAIN_OPTIONS
+
+NEWLINE = re.compile(b"\n")
+
+# Backward regex search scans the file this many bytes at a time
+FIND_BACK_BLOCK = 4 * 1024 * 1024
+
+INDEX_MAGIC = b"MNIDX1\n"
+
+
+# -----------------------------
+# LARGE FILE MODE
+# -----------------------------
+# The file is memory-mapped and a line-offset index (byte offset of every
+# line start) is built in the background and cached on disk. The Text only
+# ever holds LARGE_WINDOW_LINES lines around the viewport; scrolling near
+# either edge re-renders the window. Color annotations are kept as runs of
+# byte offsets in a sidecar file, so the file itself is never rewritten.
+
+
+def open_large_file(file_path, text, root, state):
+    close_large_file(state)
+
+    f = open(file_path, "rb")
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    stat = os.stat(file_path)
+
+    view = {
+        "path": file_path,
+        "file": f,
+        "mm": mm,
+        "size": len(mm),
+        "mtime": stat.st_mtime_ns,
+        "text": text,
+        "root": root,
+        "state": state,
+        "index": array("q", [0]),
+        "indexed_bytes": 0,
+        "indexed": False,
+        "closed": False,
+        "win_start": 0,
+        "win_end": 0,
+        "runs": _load_annotations(file_path, len(mm)),
+        "annotations_dirty": False,
+        "rewindow_id": None,
+        "find_token": 0,
+        "find_after_id": None,
+    }
+    state["large_file"] = view
+
+    if not _load_index_cache(view):
+        threading.Thread(target=_index_worker, args=(view,), daemon=True).start()
+        root.after(100, lambda: _poll_index(view))
+
+    # Take over the scrollbar and the keys that jump across the file
+    scrollbar = state["scrollbar"]
+    scrollbar["bar"]["suspended"] = True
+    text.configure(yscrollcommand=lambda *a: _on_yscroll(view))
+    scrollbar["canvas"].bind("<Button-1>", lambda e: _on_drag(view, e))
+    scrollbar["canvas"].bind("<B1-Motion>", lambda e: _on_drag(view, e))
+    text.bind("<Control-Home>", lambda e: _jump(view, 0))
+    text.bind("<Control-End>", lambda e: _jump(view, line_count(view) - 1))
+
+    _render(view, 0)
+
+    state["file_format"] = "txt"
+    state["current_file_path"] = file_path
+    root.title(f"mini_notes - {os.path.basename(file_path)} (large file)")
+    text.edit_modified(False)
+
+
+def close_large_file(state):
+    view = state.get("large_file")
+    if view is None:
+        return
+
+    save_annotations(view)
+    view["closed"] = True
+    state["large_file"] = None
+
+    text = view["text"]
+    scrollbar = state["scrollbar"]
+    scrollbar["bar"]["suspended"] = False
+    text.configure(state="normal", yscrollcommand=scrollbar["update"])
+    scrollbar["canvas"].bind("<Button-1>", scrollbar["on_drag"])
+    scrollbar["canvas"].bind("<B1-Motion>", scrollbar["on_drag"])
+    text.unbind("<Control-Home>")
+    text.unbind("<Control-End>")
+    _set_status(view, None)
+
+    try:
+        view["mm"].close()
+    except BufferError:
+        pass  # an index worker still holds a slice; it is dropped with the view
+    view["file"].close()
+
+
+def line_count(view):
+    """Number of complete lines known so far (all lines once indexed)."""
+    n = len(view["index"])
+    return n if view["indexed"] else max(n - 1, 1)
+
+
+def estimated_line_count(view):
+    if view["indexed"] or not view["indexed_bytes"]:
+        return line_count(view)
+    return int(line_count(view) * view["size"] / view["indexed_bytes"])
+
+
+# -----------------------------
+# LINE INDEX
+# -----------------------------
+def _index_worker(view):
+    mm = view["mm"]
+    index = view["index"]
+    size = view["size"]
+    pos = 0
+    try:
+        while pos < size and not view["closed"]:
+            block_end = min(pos + LARGE_INDEX_BLOCK, size)
+            block = mm[pos:block_end]
+            base = pos
+            index.extend(m.end() + base for m in NEWLINE.finditer(block))
+            pos = block_end
+            view["indexed_bytes"] = pos
+    except ValueError:
+        return  # mmap closed under us
+
+    if not view["closed"]:
+        if index[-1] == size and len(index) > 1:
+            index.pop()  # a trailing newline does not start a new line
+        view["indexed"] = True
+        _save_index_cache(view)
+
+
+def _poll_index(view):
+    if view["closed"]:
+        return
+    if view["indexed"]:
+        _set_status(view, None)
+        _draw_thumb(view)
+        return
+    _set_status(view, f"Indexing lines… {view['indexed_bytes'] / view['size']:.0%}")
+    _draw_thumb(view)
+    if view["win_end"] - view["win_start"] < LARGE_WINDOW_LINES:
+        _render(view, view["win_start"], keep_view=True)
+    view["root"].after(200, lambda: _poll_index(view))
+
+
+def _index_cache_path(file_path):
+    key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+    return os.path.join(DATA_DIR, "line_index", f"{key}.idx")
+
+
+def _load_index_cache(view):
+    try:
+        with open(_index_cache_path(view["path"]), "rb") as f:
+            if f.readline() != INDEX_MAGIC:
+                return False
+            size, mtime = map(int, f.readline().split())
+            if size != view["size"] or mtime != view["mtime"]:
+                return False
+            index = array("q")
+            index.frombytes(f.read())
+    except (OSError, ValueError):
+        return False
+
+    view["index"] = index
+    view["indexed_bytes"] = view["size"]
+    view["indexed"] = True
+    return True
+
+
+def _save_index_cache(view):
+    path = _index_cache_path(view["path"])
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(INDEX_MAGIC)
+            f.write(f"{view['size']} {view['mtime']}\n".encode("ascii"))
+            view["index"].tofile(f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # the cache is only an optimization
+
+
+# -----------------------------
+# WINDOW
+# -----------------------------
+def _line_end(view, line):
+    index = view["index"]
+    return index[line + 1] if line + 1 < len(index) else view["size"]
+
+
+def _decode(data):
+    return data.decode("utf-8", errors="replace").replace("\r\n", "\n")
+
+
+def _render(view, start_line, keep_view=False):
+    text = view["text"]
+    _harvest_annotations(view)
+
+    total = line_count(view)
+    start_line = max(0, min(start_line, total - 1))
+    end_line = min(start_line + LARGE_WINDOW_LINES, total)
+
+    first = text.yview()[0] if keep_view else None
+    start_byte = view["index"][start_line]
+    end_byte = _line_end(view, end_line - 1)
+    content = _decode(view["mm"][start_byte:end_byte])
+    if content.endswith("\n"):
+        content = content[:-1]
+
+    text.configure(state="normal")
+    text.delete("1.0", "end")
+    text.insert("1.0", content)
+    view["win_start"] = start_line
+    view["win_end"] = end_line
+    apply_color_runs(text, _window_runs(view))
+    text.configure(state="disabled")
+    text.edit_modified(False)
+
+    if first is not None:
+        text.yview_moveto(first)
+
+
+def _jump(view, line):
+    """Show absolute (0-based) `line` at the top of the editor."""
+    text = view["text"]
+    line = max(0, min(line, line_count(view) - 1))
+    if not view["win_start"] <= line < view["win_end"]:
+        _render(view, line - LARGE_WINDOW_LINES // 4)
+    local = f"{line - view['win_start'] + 1}.0"
+    text.mark_set("insert", local)
+    text.yview(local)
+    return "break"
+
+
+def _on_yscroll(view):
+    _draw_thumb(view)
+    view["text"].event_generate("<<ViewportChanged>>")
+    if view["rewindow_id"] is None:
+        view["rewindow_id"] = view["text"].after_idle(lambda: _maybe_rewindow(view))
+
+
+def _maybe_rewindow(view):
+    view["rewindow_id"] = None
+    if view["closed"]:
+        return
+
+    text = view["text"]
+    top = int(text.index("@0,0").split(".")[0])
+    bottom = int(text.index(f"@0,{text.winfo_height()}").split(".")[0])
+    local_count = view["win_end"] - view["win_start"]
+
+    near_top = top <= LARGE_WINDOW_MARGIN and view["win_start"] > 0
+    near_bottom = (
+        bottom >= local_count - LARGE_WINDOW_MARGIN
+        and view["win_end"] < line_count(view)
+    )
+    if not (near_top or near_bottom):
+        return
+
+    abs_top = view["win_start"] + top - 1
+    insert_line = view["win_start"] + int(text.index("insert").split(".")[0]) - 1
+    _render(view, abs_top - LARGE_WINDOW_LINES // 2)
+    text.yview(f"{abs_top - view['win_start'] + 1}.0")
+    if view["win_start"] <= insert_line < view["win_end"]:
+        text.mark_set("insert", f"{insert_line - view['win_start'] + 1}.0")
+
+
+# -----------------------------
+# SCROLLBAR
+# -----------------------------
+def _visible_top(view):
+    text = view["text"]
+    return view["win_start"] + int(text.index("@0,0").split(".")[0]) - 1
+
+
+def _draw_thumb(view):
+    text = view["text"]
+    scrollbar = view["state"]["scrollbar"]
+    canvas = scrollbar["canvas"]
+    height = canvas.winfo_height()
+    total = max(estimated_line_count(view), 1)
+
+    first, last = text.yview()
+    visible = max((last - first) * (view["win_end"] - view["win_start"]), 1)
+
+    thumb_height = min(height, max(30, height * visible / total))
+    thumb_y = (_visible_top(view) / total) * (height - thumb_height)
+
+    canvas.itemconfigure(scrollbar["thumb"], state="normal")
+    canvas.coords(scrollbar["thumb"], 0, thumb_y, 12, thumb_y + thumb_height)
+
+
+def _on_drag(view, event):
+    height = max(view["state"]["scrollbar"]["canvas"].winfo_height(), 1)
+    fraction = max(0.0, min(1.0, event.y / height))
+    _jump(view, int(fraction * (line_count(view) - 1)))
+
+
+# -----------------------------
+# ANNOTATIONS (byte offsets)
+# -----------------------------
+def _annotations_path(file_path):
+    return file_path + ".annotations.json"
+
+
+def _load_annotations(file_path, size):
+    try:
+        with open(_annotations_path(file_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    runs = []
+    for start, end, color in data.get("runs", []):
+        if start < size:
+            runs.append((start, min(end, size), color))
+    return runs
+
+
+def save_annotations(view):
+    _harvest_annotations(view)
+    if not view["annotations_dirty"]:
+        return True
+    try:
+        with open(_annotations_path(view["path"]), "w", encoding="utf-8") as f:
+            json.dump({"size": view["size"], "runs": view["runs"]}, f)
+    except OSError:
+        return False
+    view["annotations_dirty"] = False
+    return True
+
+
+def _local_to_byte(view, position):
+    line, col = position
+    abs_line = view["win_start"] + line - 1
+    start = view["index"][abs_line]
+    decoded = _decode(view["mm"][start:_line_end(view, abs_line)])
+    # col counts Tk columns: two for a wide character (emoji) under Tcl 8.6
+    at = position_to_offset(compute_line_starts(decoded), (1, col), len(decoded))
+    return start + len(decoded[:at].encode("utf-8"))
+
+
+def _byte_to_local(view, offset):
+    index = view["index"]
+    abs_line = bisect_right(index, offset) - 1
+    col = tk_length(_decode(view["mm"][index[abs_line]:offset]))
+    return abs_line - view["win_start"] + 1, col
+
+
+def _window_bytes(view):
+    start = view["index"][view["win_start"]]
+    end = _line_end(view, view["win_end"] - 1)
+    return start, end
+
+
+def _window_runs(view):
+    """Annotation runs clipped to the window, in local (line, col) positions."""
+    runs = view["runs"]
+    win_start, win_end = _window_bytes(view)
+    starts = [r[0] for r in runs]
+    i = max(bisect_right(starts, win_start) - 1, 0)
+    j = bisect_left(starts, win_end)
+
+    local = []
+    for start, end, color in runs[i:j]:
+        start, end = max(start, win_start), min(end, win_end)
+        if start < end:
+            local.append((_byte_to_local(view, start), _byte_to_local(view, end), color))
+    return local
+
+
+def _harvest_annotations(view):
+    """Fold the colors painted in the current window back into the byte runs."""
+    if view["win_end"] <= view["win_start"]:
+        return
+
+    before = _window_runs(view)
+    after = get_color_runs(view["text"])
+    if before == after:
+        return
+
+    win_start, win_end = _window_bytes(view)
+    paint_run(view["runs"], win_start, win_end, None)
+    for start, end, color in after:
+        paint_run(view["runs"], _local_to_byte(view, start), _local_to_byte(view, end), color)
+    view["annotations_dirty"] = True
+
+
+# -----------------------------
+# SEARCH
+# -----------------------------
+# The mapped bytes are searched directly: a literal with mmap.find, and
+# with any option on, a bytes pattern built like compile_query() builds
+# its str one. On bytes, ignore-case and \w (whole word) only know ASCII.
+
+
+def compile_bytes_query(query, options):
+    """compile_query() for UTF-8 bytes; None for a plain literal."""
+    if not any(options[name] for name in PLAIN_OPTIONS):
+        return None
+    needle = query.encode("utf-8")
+    pattern = needle if options["regex"] else re.escape(needle)
+    if options["whole_word"]:
+        pattern = rb"(?<!\w)(?:" + pattern + rb")(?!\w)"
+    flags = re.MULTILINE | (re.IGNORECASE if options["ignore_case"] else 0)
+    return re.compile(pattern, flags)
+
+
+def _find_forward(pattern, mm, start, stop):
+    for m in pattern.finditer(mm, start, stop):
+        if m.end() > m.start():  # nothing to show for an empty match
+            return m.start(), m.end()
+    return None
+
+
+def _find_backward(pattern, mm, start, stop):
+    """Last match starting in [start, stop), a block at a time from the end."""
+    high = stop
+    while high > start:
+        low = max(start, high - FIND_BACK_BLOCK)
+        found = None
+        for m in pattern.finditer(mm, low, stop):
+            if m.start() >= high:
+                break
+            if m.end() > m.start():
+                found = m.start(), m.end()
+        if found is not None:
+            return found
+        high = low
+    return None
+
+
+def large_find(view, search_state, backwards=False, from_view_top=False):
+    """Find the next occurrence in the mapped file on a worker thread."""
+    query = search_state["search_entry"].get()
+    if not query:
+        return "break"
+    try:
+        pattern = compile_bytes_query(query, search_state["options"])
+    except re.error:
+        search_state["count_label"].config(text="Bad pattern")
+        return "break"
+
+    text = view["text"]
+    if from_view_top:
+        cursor = view["index"][_visible_top(view)]
+    else:
+        line, col = map(int, text.index("insert").split("."))
+        cursor = _local_to_byte(view, (line, col))
+        if not backwards:
+            cursor += 1
+
+    view["find_token"] += 1
+    token = view["find_token"]
+    result = {}
+    needle = query.encode("utf-8")
+    limit = view["size"] if view["indexed"] else view["indexed_bytes"]
+
+    def find_literal():
+        mm = view["mm"]
+        if backwards:
+            pos = mm.rfind(needle, 0, cursor)
+            if pos == -1:
+                pos = mm.rfind(needle, 0, limit)
+        else:
+            pos = mm.find(needle, cursor, limit)
+            if pos == -1:
+                pos = mm.find(needle, 0, limit)
+        return None if pos == -1 else (pos, pos + len(needle))
+
+    def find_pattern():
+        mm = view["mm"]
+        if backwards:
+            return _find_backward(pattern, mm, 0, min(cursor, limit)) or _find_backward(
+                pattern, mm, min(cursor, limit), limit
+            )
+        return _find_forward(pattern, mm, min(cursor, limit), limit) or _find_forward(
+            pattern, mm, 0, limit
+        )
+
+    def worker():
+        try:
+            result["match"] = find_literal() if pattern is None else find_pattern()
+        except ValueError:
+            result["match"] = None
+
+    search_state["count_label"].config(text="…")
+    threading.Thread(target=worker, daemon=True).start()
+    text.after(20, lambda: _poll_find(view, search_state, token, result))
+    return "break"
+
+
+def schedule_large_find(view, search_state):
+    """Debounced search-as-you-type starting at the top of the view."""
+    text = view["text"]
+    query = search_state["search_entry"].get()
+    if query == view.get("typed_query"):
+        return  # navigation keys; Return/F3 search on their own
+    view["typed_query"] = query
+
+    if view["find_after_id"] is not None:
+        text.after_cancel(view["find_after_id"])
+
+    def run():
+        view["find_after_id"] = None
+        large_find(view, search_state, from_view_top=True)
+
+    view["find_after_id"] = text.after(300, run)
+
+
+def _poll_find(view, search_state, token, result):
+    if view["closed"] or token != view["find_token"]:
+        return
+    text = view["text"]
+    if "match" not in result:
+        text.after(20, lambda: _poll_find(view, search_state, token, result))
+        return
+
+    if result["match"] is None:
+        search_state["count_label"].config(text="No results")
+        return
+
+    pos, match_end = result["match"]
+    line = bisect_right(view["index"], pos) - 1
+    _jump(view, max(line - 5, 0))
+    start = _byte_to_local(view, pos)
+    end = _byte_to_local(view, match_end)
+    start_index = f"{start[0]}.{start[1]}"
+    text.tag_remove("search_current", "1.0", "end")
+    text.tag_add("search_current", start_index, f"{end[0]}.{end[1]}")
+    text.mark_set("insert", start_index)
+    text.see(start_index)
+    search_state["count_label"].config(text=f"line {line + 1}")
+
+
+# -----------------------------
+# STATUS
+# -----------------------------
+def _set_status(view, message):
+    status = view["state"].get("status")
+    if status is None:
+        return
+    if message is None:
+        if not view["state"].get("loading"):
+            status["frame"].pack_forget()
+        return
+    status["label"].config(text=message)
+    if not status["frame"].winfo_manager():
+        status["frame"].pack(side="bottom", fill="x")
@@ -0,0 +1,29 @@
+# lazy.py
+import importlib
+
+
+# -----------------------------
+# LAZY IMPORTS
+# -----------------------------
+# Modules that are only needed once the user does something (dialogs, the
+# lzma codec, tempfile and the shutil/bz2/lzma it drags in, the workspace
+# index's sqlite3) are imported on first use instead of during startup. Callers
+# keep writing messagebox.showerror(...) as before.
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+messagebox = LazyModule("tkinter.messagebox")
+filedialog = LazyModule("tkinter.filedialog")
+lzma = LazyModule("lzma")
+tempfile = LazyModule("tempfile")
+sqlite3 = LazyModule("sqlite3")
@@ -1,24 +1,111 @@
 import hashlib
-import tempfile
 import os
 
+from lazy import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# -----------------------------
+# FILE LOCKS
+# -----------------------------
+# One lock file per open document, named after its normalized path. The
+# owning process holds an OS advisory lock on it for as long as it runs and
+# stamps its PID inside (for whoever inspects it), so a lock left behind by
+# a crash is recognised as stale (nobody holds it any more) and taken over
+# instead of blocking the file forever.
+#
+# Lock files are never deleted. Another process may already have the file
+# open, waiting to lock it; unlinking it would let that process lock the
+# orphaned file while a third creates and locks a fresh one.
+
+_held = {}  # lock path -> open fd of the locks this process owns
+
+
+def normalize_path(file_path):
+    return os.path.normcase(os.path.realpath(os.path.abspath(file_path)))
+
 
 def get_lock_path(file_path):
-    h = hashlib.md5(file_path.encode("utf-8")).hexdigest()
+    h = hashlib.md5(normalize_path(file_path).encode("utf-8")).hexdigest()
     lock_dir = os.path.join(tempfile.gettempdir(), "mini_notes_locks")
     os.makedirs(lock_dir, exist_ok=True)
     return os.path.join(lock_dir, f"{h}.lock")
 
+
+def _try_lock(fd):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
+
+
 def is_file_already_open(file_path):
     lock_path = get_lock_path(file_path)
-    return os.path.exists(lock_path)
+    if lock_path in _held:
+        return True
+    if not os.path.exists(lock_path):
+        return False
+
+    try:
+        fd = os.open(lock_path, os.O_RDWR)
+    except OSError:
+        return False
+    try:
+        if not _try_lock(fd):
+            return True  # a live process holds it
+        # Released, or its owner died: create_file_lock takes it over
+        _unlock(fd)
+        return False
+    finally:
+        os.close(fd)
+
 
 def create_file_lock(file_path):
+    """Take the lock for file_path; False if another process holds it."""
     lock_path = get_lock_path(file_path)
-    with open(lock_path, "w") as f:
-        f.write("locked")
+    if lock_path in _held:
+        return True
+
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    if not _try_lock(fd):
+        os.close(fd)
+        return False
+
+    # On Windows the first byte is the locked region; the PID follows it
+    stamp = f"{os.getpid()}\n".encode("ascii")
+    os.ftruncate(fd, 0)
+    os.lseek(fd, 0, os.SEEK_SET)
+    os.write(fd, stamp if fcntl is not None else b" " + stamp)
+    _held[lock_path] = fd
+    return True
+
 
 def remove_file_lock(file_path):
+    """Release the lock for file_path; the lock file stays for reuse."""
     lock_path = get_lock_path(file_path)
-    if os.path.exists(lock_path):
-        os.remove(lock_path)
\ No newline at end of file
+    fd = _held.pop(lock_path, None)
+    if fd is None:
+        return  # not ours
+    _unlock(fd)
+    os.close(fd)
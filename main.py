@@ -1,5 +1,25 @@
-from app import run_app
+import os
+import sys
+
+from config import SINGLE_INSTANCE
+from instance import forward_open
 
 if __name__ == "__main__":
+    # mini_notes cat / export: headless, never loads Tk. A note that is
+    # itself named "cat" or "export" still opens in the editor.
+    if (
+        len(sys.argv) > 1
+        and sys.argv[1] in ("cat", "export")
+        and not os.path.exists(sys.argv[1])
+    ):
+        from exporters import main
+
+        sys.exit(main(sys.argv[1:]))
+
+    # Hand the file to a running mini_notes before paying for Tk at all
+    if SINGLE_INSTANCE and len(sys.argv) > 1 and forward_open(sys.argv[1]):
+        sys.exit(0)
+
+    from app import run_app
+
     run_app()
-  
\ No newline at end of file
@@ -0,0 +1,319 @@
+# mini_format.py
+import io
+import json
+import zlib
+
+from color_runs import normalize_runs, parse_position
+from lazy import lzma
+
+# -----------------------------
+# MINI v2 CONTAINER
+# -----------------------------
+# header   b"MINI" | version (1 byte) | compression (1 byte)
+# payload  (compressed as a whole when compression != none)
+#   text   chunks of  varint(byte length) + UTF-8 bytes, ended by varint(0)
+#   runs   records of varint(gap from previous run end)
+#                     varint(length, never 0)
+#                     varint(palette index) [+ 3 RGB bytes if index is new]
+#          ended by varint(0) varint(0)
+#
+# Run offsets count characters (code points) of the text. Both directions
+# stream: writers never need the whole document, readers yield as they go.
+
+MAGIC = b"MINI"
+VERSION = 2
+
+COMPRESSION_IDS = {"none": 0, "zlib": 1, "lzma": 2}
+COMPRESSION_NAMES = {v: k for k, v in COMPRESSION_IDS.items()}
+
+READ_BLOCK = 256 * 1024
+TEXT_CHUNK_CHARS = 256 * 1024
+
+
+class MiniFormatError(ValueError):
+    pass
+
+
+def is_mini_v2(head):
+    """True when the first bytes of a file are a v2 header."""
+    return head[:4] == MAGIC
+
+
+# -----------------------------
+# VARINTS
+# -----------------------------
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+# -----------------------------
+# WRITER
+# -----------------------------
+def write_document(f, text_chunks, runs, compression="zlib"):
+    """
+    Stream a document to the binary file object `f`.
+
+    `text_chunks` is an iterable of strings and `runs` an iterable of
+    sorted, non-overlapping (start, end, "#RRGGBB") character offsets.
+    """
+    if compression not in COMPRESSION_IDS:
+        raise MiniFormatError(f"Unknown compression: {compression}")
+
+    f.write(MAGIC + bytes((VERSION, COMPRESSION_IDS[compression])))
+
+    if compression == "zlib":
+        compressor = zlib.compressobj(6)
+    elif compression == "lzma":
+        compressor = lzma.LZMACompressor()
+    else:
+        compressor = None
+
+    def emit(data):
+        if compressor is None:
+            f.write(data)
+        else:
+            f.write(compressor.compress(bytes(data)))
+
+    for chunk in text_chunks:
+        if not chunk:
+            continue
+        data = chunk.encode("utf-8")
+        header = bytearray()
+        encode_varint(len(data), header)
+        emit(header)
+        emit(data)
+
+    out = bytearray()
+    encode_varint(0, out)
+
+    palette = {}
+    previous_end = 0
+    for start, end, color in runs:
+        if end <= start:
+            continue
+        encode_varint(start - previous_end, out)
+        encode_varint(end - start, out)
+        index = palette.get(color)
+        if index is None:
+            index = palette[color] = len(palette)
+            encode_varint(index, out)
+            out += bytes.fromhex(color.lstrip("#"))
+        else:
+            encode_varint(index, out)
+        previous_end = end
+
+        if len(out) >= READ_BLOCK:
+            emit(out)
+            out = bytearray()
+
+    encode_varint(0, out)
+    encode_varint(0, out)
+    emit(out)
+
+    if compressor is not None:
+        f.write(compressor.flush())
+
+
+def _text_chunks(content):
+    return (
+        content[i:i + TEXT_CHUNK_CHARS]
+        for i in range(0, len(content), TEXT_CHUNK_CHARS)
+    )
+
+
+def save_document(path, content, runs, compression="zlib"):
+    with open(path, "wb") as f:
+        write_document(f, _text_chunks(content), runs, compression)
+
+
+def document_bytes(content, runs, compression="zlib"):
+    """A whole document encoded in memory (an evicted tab, say)."""
+    f = io.BytesIO()
+    write_document(f, _text_chunks(content), runs, compression)
+    return f.getvalue()
+
+
+# -----------------------------
+# READER
+# -----------------------------
+def _payload_reader(f, compression):
+    """Return read(n) and read_varint() over the decompressed payload."""
+    if compression == "zlib":
+        decompressor = zlib.decompressobj()
+    elif compression == "lzma":
+        decompressor = lzma.LZMADecompressor()
+    else:
+        decompressor = None
+
+    buffer = bytearray()
+    pos = 0
+
+    def inflate():
+        """Up to READ_BLOCK more payload bytes, or None at the end."""
+        if decompressor is None:
+            return f.read(READ_BLOCK) or None
+        # Output is capped: a block of repetitive text can inflate a
+        # thousandfold, and readers are meant to stream
+        if compression == "zlib":
+            raw = decompressor.unconsumed_tail or f.read(READ_BLOCK)
+            if not raw:
+                return decompressor.flush() or None
+            return decompressor.decompress(raw, READ_BLOCK)
+        if decompressor.eof:
+            return None
+        raw = f.read(READ_BLOCK) if decompressor.needs_input else b""
+        if not raw and decompressor.needs_input:
+            return None
+        return decompressor.decompress(raw, READ_BLOCK)
+
+    def fill(n):
+        nonlocal pos
+        if len(buffer) - pos >= n:
+            return
+        del buffer[:pos]
+        pos = 0
+        while len(buffer) < n:
+            data = inflate()
+            if data is None:
+                break
+            buffer.extend(data)
+
+    def read(n):
+        nonlocal pos
+        fill(n)
+        if len(buffer) - pos < n:
+            raise MiniFormatError("Truncated .mini file")
+        data = bytes(buffer[pos:pos + n])
+        pos += n
+        return data
+
+    def read_varint():
+        nonlocal pos
+        shift = 0
+        value = 0
+        while True:
+            if pos >= len(buffer):
+                fill(1)
+                if pos >= len(buffer):
+                    raise MiniFormatError("Truncated .mini file")
+            byte = buffer[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    return read, read_varint
+
+
+def iter_document(f):
+    """
+    Stream a v2 document from the binary file object `f`.
+
+    Yields ("text", str) chunks in order, then ("run", (start, end, color))
+    records in order.
+    """
+    header = f.read(6)
+    if len(header) < 6 or not is_mini_v2(header):
+        raise MiniFormatError("Not a mini v2 file")
+    if header[4] != VERSION:
+        raise MiniFormatError(f"Unsupported .mini version {header[4]}")
+    if header[5] not in COMPRESSION_NAMES:
+        raise MiniFormatError(f"Unknown compression id {header[5]}")
+
+    read, read_varint = _payload_reader(f, COMPRESSION_NAMES[header[5]])
+
+    while True:
+        length = read_varint()
+        if length == 0:
+            break
+        yield "text", read(length).decode("utf-8")
+
+    palette = []
+    previous_end = 0
+    while True:
+        gap = read_varint()
+        length = read_varint()
+        if length == 0:
+            break
+        index = read_varint()
+        if index == len(palette):
+            palette.append("#" + read(3).hex().upper())
+        elif index > len(palette):
+            raise MiniFormatError("Corrupt palette index")
+        start = previous_end + gap
+        previous_end = start + length
+        yield "run", (start, previous_end, palette[index])
+
+
+def _read_all(f):
+    parts = []
+    runs = []
+    for kind, value in iter_document(f):
+        if kind == "text":
+            parts.append(value)
+        else:
+            runs.append(value)
+    return "".join(parts), runs
+
+
+def load_document(path):
+    """Read a whole v2 file: returns (content, runs)."""
+    with open(path, "rb") as f:
+        return _read_all(f)
+
+
+def parse_document(data):
+    """(content, runs) of bytes made by document_bytes()."""
+    return _read_all(io.BytesIO(data))
+
+
+# -----------------------------
+# LEGACY JSON (.np100 / v1 .mini)
+# -----------------------------
+def runs_from_tag_data(tags):
+    """
+    Normalize the "tags" list of a legacy document into (line, col) runs.
+    Older files stored one range per coloring action, overlapping freely;
+    this compacts them.
+    """
+    ranges = []
+    for tag_data in tags:
+        color = tag_data.get("color")
+        start = tag_data.get("start")
+        end = tag_data.get("end")
+
+        if color and start and end:
+            ranges.append((parse_position(start), parse_position(end), color))
+
+    return normalize_runs(ranges)
+
+
+def parse_legacy(json_content):
+    """Legacy JSON text -> (content, runs as (line, col) positions); ValueError if not a note."""
+    document = json.loads(json_content)
+    if not isinstance(document, dict) or not isinstance(document.get("content", ""), str):
+        raise ValueError("Not a mini_notes document")
+    return document.get("content", ""), runs_from_tag_data(document.get("tags", []))
+
+
+def dump_legacy(content, runs):
+    """(content, (line, col) runs) -> legacy JSON text."""
+    tag_info = []
+    for (sl, sc), (el, ec), color_hex in runs:
+        tag_info.append({
+            "color": color_hex,
+            "start": f"{sl}.{sc}",
+            "end": f"{el}.{ec}"
+        })
+
+    document = {
+        "content": content,
+        "format": "np100",
+        "tags": tag_info
+    }
+
+    return json.dumps(document, ensure_ascii=False, indent=2)
@@ -0,0 +1,433 @@
+# minimap.py
+import math
+import queue
+import threading
+from array import array
+
+from color_runs import parse_position
+from config import (
+    MINIMAP_DELAY_MS,
+    MINIMAP_LEVELS,
+    MINIMAP_LINE_CHARS,
+    MINIMAP_RESCAN_LINES,
+    MINIMAP_ROW_PX,
+    MINIMAP_WIDTH,
+    POWERSHELL_ACCENT,
+    POWERSHELL_BG,
+)
+from editor_ops import TAG_COLOR_RE, color_tags
+from instrument import instrumented
+from scroll_thumb import schedule_thumb_update
+from text_hooks import add_change_listener, remove_change_listener
+
+MINIMAP_POLL_MS = 20
+
+# Canvas tag of every item the minimap draws
+MINIMAP_TAG = "minimap"
+
+
+# -----------------------------
+# LINE COUNTS + ROW SHADES (pure, also run on the worker)
+# -----------------------------
+# The strip is drawn from one array per color holding, for every line, how
+# many of its chars carry that color (capped at MINIMAP_LINE_CHARS; a range
+# running past a line's end counts as reaching the cap, since line lengths
+# are not kept). A row of the strip covers a slice of lines and is shaded
+# from the sums of those slices: the color with the most chars, lighter or
+# darker by how much of the slice is colored.
+
+
+def _zeros(n):
+    return array("H", [0]) * n
+
+
+def _add_range(counts, start, end, lo, hi):
+    """Count the range start..end ((line, col) pairs) into lines lo..hi of counts."""
+    cap = MINIMAP_LINE_CHARS
+    (l1, c1), (l2, c2) = start, end
+    if l1 == l2:
+        if lo <= l1 <= hi:
+            counts[l1 - 1] = min(cap, counts[l1 - 1] + min(c2, cap) - min(c1, cap))
+        return
+    if lo <= l1 <= hi:
+        counts[l1 - 1] = min(cap, counts[l1 - 1] + cap - min(c1, cap))
+    first, last = max(l1 + 1, lo), min(l2 - 1, hi)
+    if first <= last:
+        counts[first - 1:last] = array("H", [cap]) * (last - first + 1)
+    if lo <= l2 <= hi and c2:
+        counts[l2 - 1] = min(cap, counts[l2 - 1] + min(c2, cap))
+
+
+def count_lines(ranges, lines):
+    """{color: per-line counts} from {color: ["tag ranges" output, ...]}."""
+    counts = {}
+    for color, strings in ranges.items():
+        column = counts[color] = _zeros(lines)
+        for string in strings:
+            indices = iter(string.split())
+            for start, end in zip(indices, indices):
+                _add_range(column, parse_position(start), parse_position(end), 1, lines)
+    return counts
+
+
+def row_lines(row, rows, lines):
+    """Lines [first, stop) (0-based) shown by a row; a short note repeats lines."""
+    first = row * lines // rows
+    return first, max((row + 1) * lines // rows, first + 1)
+
+
+def _shade(color, density):
+    level = min(MINIMAP_LEVELS, max(1, math.ceil(density * MINIMAP_LEVELS)))
+    mix = level / MINIMAP_LEVELS
+    bg = [int(POWERSHELL_BG[i:i + 2], 16) for i in (1, 3, 5)]
+    fg = [int(color[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{round(b + (f - b) * mix):02x}" for b, f in zip(bg, fg))
+
+
+def row_fills(counts, lines, rows, first_row, stop_row):
+    """Fill color of each row in [first_row, stop_row)."""
+    fills = []
+    for row in range(first_row, stop_row):
+        a, b = row_lines(row, rows, lines)
+        best, best_chars, total = None, 0, 0
+        for color, column in sorted(counts.items()):  # ties go the same way every time
+            chars = sum(column[a:b])
+            total += chars
+            if chars > best_chars:
+                best, best_chars = color, chars
+        if best is None:
+            fills.append(POWERSHELL_BG)
+        else:
+            fills.append(_shade(best, total / ((b - a) * MINIMAP_LINE_CHARS)))
+    return fills
+
+
+def _worker(jobs, results):
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        token, kind, args = job
+        if kind == "count":
+            results.put((token, kind, count_lines(*args)))
+        else:
+            layout, counts, lines, rows = args
+            results.put((token, kind, (layout, rows, row_fills(counts, lines, rows, 0, rows))))
+
+
+# -----------------------------
+# TK SIDE
+# -----------------------------
+# Edits cost the change listener a splice of the count arrays (new or
+# joined lines, as scroll_thumb.py does for heights) and a dirty line range;
+# nothing is counted or drawn per keystroke. Every MINIMAP_DELAY_MS at most,
+# a dirty range is recounted with a few tag nextrange calls on the Tk
+# thread, and only the rows showing those lines are reshaded and, if their
+# color changed, reconfigured. A range of more than MINIMAP_RESCAN_LINES
+# (a load, a paste, replace all) is recounted on the worker from the
+# tags' ranges instead, and when the line count changes every row covers
+# different lines, so all of them are reshaded on the worker too. Edits
+# made while the worker counts are logged and replayed onto its result.
+#
+# The canvas is the scroll thumb's (scroll_thumb.py hands it the viewport
+# and clicks while the minimap is on): the thumb is hidden, the canvas
+# widens to MINIMAP_WIDTH and a frame marks the lines in view. Large file
+# mode draws its own thumb there, so the strip hides until it is over.
+
+
+def start_minimap(text, state):
+    if state.get("minimap") is not None:
+        return state["minimap"]
+
+    jobs, results = queue.Queue(), queue.Queue()
+    threading.Thread(target=_worker, args=(jobs, results), daemon=True).start()
+
+    scrollbar = state["scrollbar"]
+    canvas = scrollbar["canvas"]
+    bar = scrollbar["bar"]
+    lines = _last_line(text)
+    mm = {
+        "text": text,
+        "canvas": canvas,
+        "bar": bar,
+        "lines": lines,
+        "counts": {},  # color -> array of colored chars per line
+        "dirty": [1, lines],  # lines to recount
+        "redraw": None,  # lines whose rows need reshading
+        "layout": 0,  # moves whenever lines are added or removed
+        "drawn": None,  # (layout, rows) the shades were computed for
+        "items": [],  # one rectangle per row
+        "fills": [],
+        "marker": canvas.create_rectangle(
+            0, 0, 0, 0, outline=POWERSHELL_ACCENT, tags=(MINIMAP_TAG,)
+        ),
+        "thumb_width": canvas.cget("width"),
+        "hidden": False,
+        "jobs": jobs,
+        "results": results,
+        "token": 0,  # id of the job in flight; stopping makes it stale
+        "busy": None,  # kind of the job in flight
+        "log": [],  # (line, added, removed) since a count job started
+        "after_id": None,
+    }
+    mm["view"] = lambda: draw_viewport(mm)
+    mm["jump"] = lambda event: jump_to(mm, event)
+
+    canvas.itemconfigure(bar["thumb"], state="hidden")
+    canvas.config(width=MINIMAP_WIDTH)
+    bar["minimap"] = mm
+
+    mm["listener"] = lambda *change: _on_change(mm, *change)
+    add_change_listener(text, mm["listener"])
+    state["minimap"] = mm
+    schedule_thumb_update(bar)  # lays the rows out once the canvas has a size
+    _schedule(mm)
+    return mm
+
+
+def stop_minimap(state):
+    mm = state.get("minimap")
+    if mm is None:
+        return
+    state["minimap"] = None
+    text, canvas, bar = mm["text"], mm["canvas"], mm["bar"]
+    remove_change_listener(text, mm["listener"])
+    mm["token"] += 1
+    mm["jobs"].put(None)
+    if mm["after_id"] is not None:
+        text.after_cancel(mm["after_id"])
+
+    canvas.delete(MINIMAP_TAG)
+    canvas.config(width=mm["thumb_width"])
+    bar["minimap"] = None
+    if not bar["suspended"]:
+        canvas.itemconfigure(bar["thumb"], state="normal")
+    schedule_thumb_update(bar)
+
+
+def _last_line(text):
+    return int(text.index("end-1c").split(".")[0])
+
+
+def _splice(counts, line, added, removed):
+    """Make room for lines added after `line`, or drop the ones joined into it."""
+    for column in counts.values():
+        if added:
+            column[line:line] = _zeros(added)
+        else:
+            del column[line:line + removed]
+
+
+def _on_change(mm, op, start, end, detail):
+    line = int(start.split(".")[0])
+    added = removed = 0
+    if op == "insert":
+        added = detail.count("\n")
+        touched = (line, line + added)
+    elif op == "delete":
+        removed = int(end.split(".")[0]) - line
+        touched = (line, line)
+    else:  # a color tag added or removed
+        touched = (line, int(end.split(".")[0]))
+
+    if added or removed:
+        _splice(mm["counts"], line, added, removed)
+        mm["lines"] += added - removed
+        mm["layout"] += 1
+        if mm["busy"] == "count":
+            mm["log"].append((line, added, removed))
+
+    def moved(n):
+        if n <= line:
+            return n
+        return line if n <= line + removed else n + added - removed
+
+    for key in ("dirty", "redraw"):
+        span = mm[key]
+        if span is not None:
+            mm[key] = [moved(span[0]), moved(span[1])]
+    dirty = mm["dirty"]
+    if dirty is None:
+        mm["dirty"] = list(touched)
+    else:
+        mm["dirty"] = [min(dirty[0], touched[0]), max(dirty[1], touched[1])]
+    _schedule(mm)
+
+
+def _schedule(mm):
+    if mm["after_id"] is None and mm["busy"] is None:
+        mm["after_id"] = mm["text"].after(MINIMAP_DELAY_MS, lambda: _update(mm))
+
+
+def _update(mm):
+    mm["after_id"] = None
+    if mm["busy"] is not None:
+        return  # the job's result reschedules
+    canvas, bar = mm["canvas"], mm["bar"]
+    if bar["suspended"]:
+        if not mm["hidden"]:
+            mm["hidden"] = True
+            canvas.itemconfigure(MINIMAP_TAG, state="hidden")
+        mm["dirty"] = [1, mm["lines"]]  # recount whatever is loaded after it
+        return
+    if mm["hidden"]:
+        mm["hidden"] = False
+        canvas.itemconfigure(MINIMAP_TAG, state="normal")
+        canvas.itemconfigure(bar["thumb"], state="hidden")
+        schedule_thumb_update(bar)
+
+    if mm["dirty"] is not None:
+        lo, hi = mm["dirty"]
+        hi = min(hi, mm["lines"])
+        lo = min(lo, hi)
+        mm["dirty"] = None
+        if hi - lo >= MINIMAP_RESCAN_LINES:
+            _request_count(mm)
+            return
+        _recount(mm, lo, hi)
+        redraw = mm["redraw"]
+        mm["redraw"] = [lo, hi] if redraw is None else [min(redraw[0], lo), max(redraw[1], hi)]
+    _redraw(mm)
+
+
+def _recount(mm, lo, hi):
+    text = mm["text"]
+    counts = mm["counts"]
+    for column in counts.values():
+        column[lo - 1:hi] = _zeros(hi - lo + 1)
+
+    start, stop = f"{lo}.0", f"{hi + 1}.0"
+    for tag in color_tags(text):
+        match = TAG_COLOR_RE.match(tag)
+        if not match:
+            continue
+        column = counts.get(match.group(1))
+        if column is None:
+            column = counts[match.group(1)] = _zeros(mm["lines"])
+        # A range that starts above the dirty lines may still cover them
+        found = text.tag_prevrange(tag, start)
+        if found:
+            _add_range(column, parse_position(found[0]), parse_position(found[1]), lo, hi)
+        found = text.tag_nextrange(tag, start, stop)
+        while found:
+            _add_range(column, parse_position(found[0]), parse_position(found[1]), lo, hi)
+            found = text.tag_nextrange(tag, found[1], stop)
+
+
+def _request_count(mm):
+    text = mm["text"]
+    ranges = {}
+    for tag in color_tags(text):
+        match = TAG_COLOR_RE.match(tag)
+        if match:
+            # One string per tag rather than a Python object per index
+            ranges.setdefault(match.group(1), []).append(
+                text.tk.eval(f"{text._w} tag ranges {tag}")
+            )
+    mm["log"] = []
+    _submit(mm, "count", (ranges, mm["lines"]))
+
+
+def _redraw(mm):
+    rows = len(mm["items"])
+    if not rows:
+        return  # laid out by the first draw_viewport()
+    lines = mm["lines"]
+    if mm["drawn"] != (mm["layout"], rows):
+        mm["redraw"] = None
+        if lines > MINIMAP_RESCAN_LINES:
+            counts = {color: column[:] for color, column in mm["counts"].items()}
+            _submit(mm, "rows", (mm["layout"], counts, lines, rows))
+            return
+        _paint(mm, 0, row_fills(mm["counts"], lines, rows, 0, rows))
+        mm["drawn"] = (mm["layout"], rows)
+        return
+    if mm["redraw"] is None:
+        return
+    lo, hi = mm["redraw"]
+    mm["redraw"] = None
+    first = max(0, (lo - 1) * rows // lines - 1)
+    stop = min(rows, -(-hi * rows // lines) + 1)
+    _paint(mm, first, row_fills(mm["counts"], lines, rows, first, stop))
+
+
+def _paint(mm, first, fills):
+    canvas = mm["canvas"]
+    for row, fill in enumerate(fills, first):
+        if mm["fills"][row] != fill:
+            mm["fills"][row] = fill
+            canvas.itemconfigure(mm["items"][row], fill=fill)
+
+
+def _submit(mm, kind, args):
+    mm["token"] += 1
+    token = mm["token"]
+    mm["busy"] = kind
+    mm["jobs"].put((token, kind, args))
+    mm["text"].after(MINIMAP_POLL_MS, lambda: _poll(mm, token))
+
+
+def _poll(mm, token):
+    if token != mm["token"]:
+        return  # stopped
+    try:
+        _, kind, result = mm["results"].get_nowait()
+    except queue.Empty:
+        mm["text"].after(MINIMAP_POLL_MS, lambda: _poll(mm, token))
+        return
+    mm["busy"] = None
+
+    if kind == "count":
+        for line, added, removed in mm["log"]:
+            _splice(result, line, added, removed)
+        mm["log"] = []
+        mm["counts"] = result
+        mm["drawn"] = None
+    else:
+        layout, rows, fills = result
+        if rows == len(mm["items"]):
+            _paint(mm, 0, fills)
+            mm["drawn"] = (layout, rows)  # stale if lines moved since: redone next update
+    _schedule(mm)
+
+
+# -----------------------------
+# VIEWPORT + JUMPS (called by scroll_thumb.py)
+# -----------------------------
+def draw_viewport(mm):
+    """Frame the lines in view; lays the rows out again when the canvas resized."""
+    text, canvas = mm["text"], mm["canvas"]
+    height = canvas.winfo_height()
+    rows = max(1, height // MINIMAP_ROW_PX)
+    if rows != len(mm["items"]):
+        canvas.delete(*mm["items"])
+        step = height / rows
+        mm["items"] = [
+            canvas.create_rectangle(
+                0, row * step, MINIMAP_WIDTH, (row + 1) * step,
+                fill=POWERSHELL_BG, outline="", tags=(MINIMAP_TAG,),
+            )
+            for row in range(rows)
+        ]
+        mm["fills"] = [POWERSHELL_BG] * rows
+        canvas.tag_raise(mm["marker"])
+        _schedule(mm)
+
+    lines = max(mm["lines"], 1)
+    top = int(text.index("@0,0").split(".")[0]) - 1
+    bottom = int(text.index(f"@0,{text.winfo_height()}").split(".")[0])
+    y0 = top * height / lines
+    y1 = max(bottom * height / lines, y0 + 2)
+    canvas.coords(mm["marker"], 0, y0, MINIMAP_WIDTH - 1, y1)
+
+
+@instrumented("minimap_jump")
+def jump_to(mm, event):
+    """Click or drag on the strip: center the lines under the pointer."""
+    text = mm["text"]
+    height = max(mm["canvas"].winfo_height(), 1)
+    fraction = max(0.0, min(1.0, event.y / height))
+    line = int(fraction * mm["lines"]) + 1
+    top = int(text.index("@0,0").split(".")[0])
+    bottom = int(text.index(f"@0,{text.winfo_height()}").split(".")[0])
+    text.yview(f"{max(1, line - (bottom - top) // 2)}.0")
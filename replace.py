@@ -0,0 +1,197 @@
+# replace.py
+import queue
+import re
+import threading
+
+from color_runs import compute_line_starts, inserted_index, offset_to_position, runs_to_offsets
+from document import plan_replacements
+from editor_ops import TAG_BATCH, color_tag, color_tags, get_color_runs
+from instrument import instrumented
+from search_engine import clear_search, compile_query, offset_to_index, run_search, search_is_current
+from text_hooks import advance_index, get_generation
+from undo import seal_undo_step
+
+# How often the Tk thread checks for a finished replace-all plan
+REPLACE_POLL_MS = 20
+
+# Replace all rewrites the Text a region at a time: matches closer than
+# REPLACE_JOIN_CHARS share one region, and a region stops taking matches
+# once it spans REPLACE_BATCH_CHARS
+REPLACE_JOIN_CHARS = 64 * 1024
+REPLACE_BATCH_CHARS = 1024 * 1024
+
+
+# -----------------------------
+# FIND / REPLACE
+# -----------------------------
+# Matches come from the search engine (search_engine.py), found on a
+# snapshot off the Tk thread. Replacing one match is a delete and an insert
+# at its offsets. Replace all plans every edit in a worker thread from a
+# snapshot of the text and its color runs (document.plan_replacements(),
+# shared with headless documents): nearby matches are merged into
+# regions, each rewritten with one delete and one insert, bottom-up so the
+# snapshot's indices stay valid, then re-colored with one tag_add per color
+# per TAG_BATCH ranges. Text outside the regions keeps its tags untouched;
+# inside, unchanged text keeps its colors and a replacement takes the color
+# of the first character it replaces. All of it happens in one Tk callback,
+# so it is one undo step. Replacements are inserted with an empty tag list
+# and colored after; undo (undo.py) and the journal (journal.py) record
+# that tag list with the insert, so redo and a reload color them the same.
+
+
+def _replacement(match, replacement, regex):
+    # Only a regex replacement understands \1 and \g<name>
+    return match.expand(replacement) if regex else replacement
+
+
+def _color_at(tag_names):
+    tags = [tag for tag in tag_names if str(tag).startswith("color_")]
+    return str(tags[-1]) if tags else None
+
+
+@instrumented("replace")
+def replace_current(state, doc_state, replacement):
+    """Replace the current match and move on to the next one."""
+    text = state["text"]
+    if not search_is_current(state) or state["current"] < 0:
+        run_search(state)  # stale or no match yet: find first, replace next time
+        return
+
+    start = state["matches"][state["current"]]
+    end = state["ends"][state["current"]]
+    new = replacement
+    if state["pattern"] is not None:
+        match = state["pattern"].match(state["content"], start)
+        try:
+            new = _replacement(match, replacement, state["options"]["regex"])
+        except (re.error, IndexError):
+            state["count_label"].config(text="Bad replacement")
+            return
+
+    start_index = offset_to_index(state, start)
+    end_index = offset_to_index(state, end)
+    tag = _color_at(text.tag_names(start_index))
+
+    seal_undo_step(text, doc_state)
+    text.delete(start_index, end_index)
+    if new:
+        text.insert(start_index, new, "")
+        if tag is not None:
+            text.tag_add(tag, start_index, advance_index(start_index, new))
+    seal_undo_step(text, doc_state)
+
+    text.mark_set("insert", advance_index(start_index, new))
+    run_search(state)
+
+
+# -----------------------------
+# REPLACE ALL
+# -----------------------------
+def _replace_worker(job, content, runs, pattern, replacement, regex):
+    try:
+        line_starts = compute_line_starts(content)
+        runs = runs_to_offsets(runs, line_starts, len(content))
+        count, regions = plan_replacements(
+            content, runs, pattern, replacement, regex, REPLACE_JOIN_CHARS, REPLACE_BATCH_CHARS
+        )
+        edits = []
+        for start, end, chars, new_runs in regions:
+            position = offset_to_position(line_starts, start)
+            edits.append((
+                "{}.{}".format(*position),
+                "{}.{}".format(*offset_to_position(line_starts, end)),
+                chars,
+                _region_tags(chars, position, new_runs),
+            ))
+        job["results"].put((count, edits))
+    except (re.error, IndexError):
+        job["results"].put(None)
+
+
+def _region_tags(chars, position, runs):
+    """{tag: [index, index, ...]} for runs of chars inserted at position."""
+    line_starts = compute_line_starts(chars)
+    by_tag = {}
+    for a, b, color in runs:
+        by_tag.setdefault(color_tag(color), []).extend((
+            inserted_index(line_starts, position, a),
+            inserted_index(line_starts, position, b),
+        ))
+    return by_tag
+
+
+@instrumented("replace_all")
+def replace_all(state, doc_state, replacement):
+    """Replace every match, planned off the Tk thread, applied as one undo step."""
+    text = state["text"]
+    query = state["search_entry"].get()
+    if not query:
+        return
+    try:
+        pattern = compile_query(query, state["options"])
+    except re.error:
+        state["count_label"].config(text="Bad pattern")
+        return
+    if pattern is None:
+        pattern = re.compile(re.escape(query))
+
+    # Matches are only valid for this exact text: any edit restarts
+    job = {
+        "generation": get_generation(text),
+        "results": queue.Queue(),
+        "replacement": replacement,
+    }
+    state["replace_job"] = job
+    state["count_label"].config(text="Replacing…")
+    threading.Thread(
+        target=_replace_worker,
+        args=(
+            job, text.get("1.0", "end-1c"), get_color_runs(text),
+            pattern, replacement, state["options"]["regex"],
+        ),
+        daemon=True,
+    ).start()
+    text.after(REPLACE_POLL_MS, lambda: _poll_replace(state, doc_state, job))
+
+
+def _poll_replace(state, doc_state, job):
+    text = state["text"]
+    if state.get("replace_job") is not job:
+        return  # superseded or cancelled
+    try:
+        result = job["results"].get_nowait()
+    except queue.Empty:
+        text.after(REPLACE_POLL_MS, lambda: _poll_replace(state, doc_state, job))
+        return
+
+    state["replace_job"] = None
+    if result is None:
+        state["count_label"].config(text="Bad replacement")
+        return
+    if job["generation"] != get_generation(text):
+        replace_all(state, doc_state, job["replacement"])
+        return
+    _apply_edits(state, doc_state, *result)
+
+
+@instrumented("replace_apply")
+def _apply_edits(state, doc_state, count, edits):
+    text = state["text"]
+    clear_search(state)
+    if edits:
+        configured = set(color_tags(text))
+        seal_undo_step(text, doc_state)
+        for start, end, chars, by_tag in reversed(edits):
+            text.delete(start, end)
+            if chars:
+                text.insert(start, chars, "")
+            for tag, indices in by_tag.items():
+                if tag not in configured:
+                    text.tag_config(tag, foreground=tag[len("color_"):])
+                    configured.add(tag)
+                for i in range(0, len(indices), 2 * TAG_BATCH):
+                    text.tag_add(tag, *indices[i:i + 2 * TAG_BATCH])
+        seal_undo_step(text, doc_state)
+        text.mark_set("insert", edits[0][0])
+        text.see("insert")
+    state["count_label"].config(text=f"{count} replaced")
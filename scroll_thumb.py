@@ -0,0 +1,226 @@
+# scroll_thumb.py
+import time
+from array import array
+import tkinter.font as tkfont
+
+from config import SCROLL_MEASURE_BUDGET_MS, SCROLL_REFINE_DELAY_MS
+from instrument import instrumented
+from text_hooks import add_change_listener
+
+MIN_THUMB = 30
+MAX_THUMB_FRACTION = 0.6
+
+
+# -----------------------------
+# SCROLL THUMB
+# -----------------------------
+# The thumb size needs the document height in pixels. Asking Tk for it
+# (count -ypixels 1.0 end after update_idletasks) lays out the whole
+# document, so instead the pixel height of every logical line is cached
+# here. Edits only forget the lines they touch, font and width changes
+# forget everything, and forgotten lines are re-measured a few at a time
+# (visible ones first) while an average stands in for them. All redraws
+# go through one after_idle callback, so there is at most one per frame.
+# While a minimap (minimap.py) is set on the bar, those redraws and the
+# canvas clicks go to it instead of the thumb.
+
+
+def create_scroll_thumb(text, canvas, thumb):
+    bar = {
+        "text": text,
+        "canvas": canvas,
+        "thumb": thumb,
+        "heights": array("i", [-1]),  # pixels per line, -1 = not measured
+        "known": 0,  # sum of the measured heights
+        "unknown": 1,
+        "scan": 0,
+        "linespace": 1,
+        "width": None,
+        "after_id": None,
+        "refine_id": None,
+        "suspended": False,  # large file mode draws its own thumb
+        "minimap": None,  # minimap.py, drawn in place of the thumb
+    }
+
+    add_change_listener(text, lambda *change: _on_change(bar, *change))
+    text.bind("<Configure>", lambda e: _on_configure(bar, e), add="+")
+    text.bind("<<FontChanged>>", lambda e: invalidate_all(bar), add="+")
+
+    invalidate_all(bar)
+    return bar
+
+
+def on_yscroll(bar, first, last):
+    """yscrollcommand of the Text."""
+    schedule_thumb_update(bar)
+    # Let viewport-bound features (search highlights) follow the scroll
+    bar["text"].event_generate("<<ViewportChanged>>")
+
+
+@instrumented("scroll")
+def on_drag(bar, event):
+    """Drag or click on the scrollbar canvas: move the text to match."""
+    if bar["minimap"] is not None:
+        bar["minimap"]["jump"](event)
+        return
+    canvas_height = max(bar["canvas"].winfo_height(), 1)
+    y = max(0, min(canvas_height, event.y))
+    bar["text"].yview_moveto(y / canvas_height)
+
+
+def schedule_thumb_update(bar):
+    if bar["after_id"] is None:
+        bar["after_id"] = bar["text"].after_idle(lambda: _refresh(bar))
+
+
+# -----------------------------
+# CACHE INVALIDATION
+# -----------------------------
+def invalidate_all(bar):
+    """Forget every line height (font or wrap width changed)."""
+    text = bar["text"]
+    lines = int(text.index("end-1c").split(".")[0])
+    bar["heights"] = array("i", [-1]) * lines
+    bar["known"] = 0
+    bar["unknown"] = lines
+    bar["scan"] = 0
+    bar["linespace"] = max(tkfont.Font(font=text.cget("font")).metrics("linespace"), 1)
+    schedule_thumb_update(bar)
+
+
+def _forget(bar, lo, hi):
+    """Mark heights[lo:hi] unmeasured."""
+    heights = bar["heights"]
+    for i in range(lo, min(hi, len(heights))):
+        if heights[i] >= 0:
+            bar["known"] -= heights[i]
+            bar["unknown"] += 1
+            heights[i] = -1
+
+
+def _drop(bar, lo, hi):
+    """Remove heights[lo:hi] (lines joined by a delete)."""
+    _forget(bar, lo, hi)
+    bar["unknown"] -= len(bar["heights"][lo:hi])
+    del bar["heights"][lo:hi]
+
+
+def _on_change(bar, op, start, end, detail):
+    if op not in ("insert", "delete"):
+        return  # color tags don't change line heights
+
+    line = int(start.split(".")[0]) - 1
+    _forget(bar, line, line + 1)
+
+    if op == "insert":
+        newlines = detail.count("\n")
+        if newlines:
+            bar["heights"][line + 1:line + 1] = array("i", [-1]) * newlines
+            bar["unknown"] += newlines
+    else:
+        end_line = int(end.split(".")[0]) - 1
+        if end_line > line:
+            _drop(bar, line + 1, end_line + 1)
+
+    bar["scan"] = min(bar["scan"], line)
+    schedule_thumb_update(bar)
+
+
+def _on_configure(bar, event):
+    # Wrapped lines reflow when the width changes
+    if event.width != bar["width"]:
+        bar["width"] = event.width
+        invalidate_all(bar)
+    else:
+        schedule_thumb_update(bar)
+
+
+# -----------------------------
+# MEASURE + DRAW
+# -----------------------------
+def _measure(bar, lo, hi, deadline):
+    text = bar["text"]
+    heights = bar["heights"]
+    call = text.tk.call
+    for i in range(lo, min(hi, len(heights))):
+        if heights[i] >= 0:
+            continue
+        if time.perf_counter() > deadline:
+            return False
+        # -update lays out just this line if Tk hasn't yet
+        pixels = int(call(text._w, "count", "-update", "-ypixels", f"{i + 1}.0", f"{i + 2}.0"))
+        heights[i] = pixels
+        bar["known"] += pixels
+        bar["unknown"] -= 1
+    return True
+
+
+@instrumented("scroll_refresh")
+def _refresh(bar):
+    bar["after_id"] = None
+    if bar["suspended"]:
+        return
+    if bar["minimap"] is not None:
+        # The strip maps lines, not pixels: no heights to measure meanwhile
+        bar["minimap"]["view"]()
+        return
+
+    text = bar["text"]
+    if len(bar["heights"]) != int(text.index("end-1c").split(".")[0]):
+        invalidate_all(bar)  # edits bypassed the change hook
+
+    deadline = time.perf_counter() + SCROLL_MEASURE_BUDGET_MS / 1000
+    height = text.winfo_height()
+    top = int(text.index("@0,0").split(".")[0]) - 1
+    bottom = int(text.index(f"@0,{height}").split(".")[0])
+
+    if _measure(bar, top, bottom, deadline) and bar["unknown"]:
+        heights = bar["heights"]
+        while bar["unknown"] and time.perf_counter() < deadline:
+            try:
+                bar["scan"] = heights.index(-1, bar["scan"])
+            except ValueError:
+                bar["scan"] = 0
+                continue
+            _measure(bar, bar["scan"], bar["scan"] + 64, deadline)
+
+    _draw(bar)
+
+    # Keep refining in the background until every line is measured
+    if bar["unknown"] and bar["refine_id"] is None:
+        def refine():
+            bar["refine_id"] = None
+            schedule_thumb_update(bar)
+
+        bar["refine_id"] = text.after(SCROLL_REFINE_DELAY_MS, refine)
+
+
+def document_height(bar):
+    """Document height in pixels; unmeasured lines count as the average."""
+    measured = len(bar["heights"]) - bar["unknown"]
+    average = bar["known"] / measured if measured else bar["linespace"]
+    return bar["known"] + bar["unknown"] * average
+
+
+def _draw(bar):
+    text = bar["text"]
+    canvas = bar["canvas"]
+    thumb = bar["thumb"]
+
+    total = document_height(bar)
+    visible = float(text.winfo_height())
+    canvas_height = canvas.winfo_height()
+
+    if total <= visible:
+        canvas.itemconfigure(thumb, state="hidden")
+        return
+
+    canvas.itemconfigure(thumb, state="normal")
+
+    proportional_height = canvas_height * (visible / total)
+    max_thumb = canvas_height * MAX_THUMB_FRACTION
+    thumb_height = max(MIN_THUMB, min(max_thumb, proportional_height))
+    first = text.yview()[0]
+    thumb_y = first * (canvas_height - thumb_height)
+
+    canvas.coords(thumb, 0, thumb_y, 12, thumb_y + thumb_height)
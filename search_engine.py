@@ -0,0 +1,338 @@
+# search_engine.py
+import queue
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+from color_runs import compute_line_starts, offset_to_position, parse_position, position_to_offset
+from instrument import instrumented
+from text_hooks import get_generation
+
+# Delay between the last keystroke and the search
+SEARCH_DEBOUNCE_MS = 150
+
+# How often the Tk thread checks for a finished background search
+SEARCH_POLL_MS = 20
+
+# Never tag more than this many matches per screen
+VIEWPORT_MATCH_LIMIT = 2000
+
+# Search options, all off: a literal, case-sensitive search
+PLAIN_OPTIONS = {"regex": False, "ignore_case": False, "whole_word": False}
+
+
+# -----------------------------
+# STATE
+# -----------------------------
+def create_search_state(text, search_entry, count_label, options=None):
+    """
+    Search state for one editor. Matches are kept as sorted arrays of start
+    and end character offsets into a snapshot of the text taken when the
+    search ran. `options` ({"regex", "ignore_case", "whole_word"}) may be
+    shared between editors.
+    """
+    return {
+        "text": text,
+        "search_entry": search_entry,
+        "count_label": count_label,
+        "options": options if options is not None else dict(PLAIN_OPTIONS),
+        "query": "",
+        "key": None,  # (query, options) the matches are for
+        "pattern": None,  # compiled query, None for a plain literal search
+        "matches": array("q"),
+        "ends": array("q"),
+        "current": -1,
+        "content": None,
+        "line_starts": None,
+        "generation": -1,
+        "token": 0,
+        "results": queue.Queue(),
+        "after_id": None,
+        "viewport_after_id": None,
+        "replace_job": None,  # replace all waiting for its plan (replace.py)
+    }
+
+
+# -----------------------------
+# QUERIES
+# -----------------------------
+
+def _options_key(options):
+    return tuple(bool(options[name]) for name in PLAIN_OPTIONS)
+
+
+def compile_query(query, options):
+    """
+    Pattern for query under options, or None when it is a plain literal
+    (searched with str.find). Raises re.error for a bad regex.
+    """
+    if not any(_options_key(options)):
+        return None
+    pattern = query if options["regex"] else re.escape(query)
+    if options["whole_word"]:
+        pattern = rf"(?<!\w)(?:{pattern})(?!\w)"
+    flags = re.MULTILINE | (re.IGNORECASE if options["ignore_case"] else 0)
+    return re.compile(pattern, flags)
+
+
+# -----------------------------
+# MATCHING (worker thread)
+# -----------------------------
+def find_matches(content, query, candidates=None, pattern=None):
+    """
+    (starts, ends) of every match. A plain literal (pattern None) finds
+    overlapping occurrences; when `candidates` holds the matches of a prefix
+    of it, only those positions are re-checked. Empty regex matches are
+    skipped: there is nothing to show or replace.
+    """
+    matches = array("q")
+    if pattern is not None:
+        ends = array("q")
+        for m in pattern.finditer(content):
+            if m.end() > m.start():
+                matches.append(m.start())
+                ends.append(m.end())
+        return matches, ends
+
+    if candidates is not None:
+        startswith = content.startswith
+        matches.extend(pos for pos in candidates if startswith(query, pos))
+    else:
+        find = content.find
+        pos = find(query)
+        while pos != -1:
+            matches.append(pos)
+            pos = find(query, pos + 1)
+    return matches, array("q", (pos + len(query) for pos in matches))
+
+
+def _search_worker(token, content, line_starts, key, pattern, candidates, results):
+    if line_starts is None:
+        line_starts = compute_line_starts(content)
+    matches, ends = find_matches(content, key[0], candidates, pattern)
+    results.put((token, key, pattern, matches, ends, line_starts))
+
+
+# -----------------------------
+# TK SIDE
+# -----------------------------
+def schedule_search(state):
+    """Debounce typing: run the search once the user pauses."""
+    text = state["text"]
+    if state["after_id"] is not None:
+        text.after_cancel(state["after_id"])
+    state["after_id"] = text.after(SEARCH_DEBOUNCE_MS, lambda: run_search(state))
+
+
+@instrumented("search")
+def run_search(state):
+    text = state["text"]
+    state["after_id"] = None
+    query = state["search_entry"].get()
+
+    if not query:
+        clear_search(state)
+        return
+
+    try:
+        pattern = compile_query(query, state["options"])
+    except re.error:
+        clear_search(state)
+        state["count_label"].config(text="Bad pattern")
+        return
+
+    candidates = None
+    generation = get_generation(text)
+    key = (query,) + _options_key(state["options"])
+    if key == state["key"] and generation == state["generation"]:
+        return  # e.g. the release of Return after stepping to a match
+    if generation != state["generation"] or state["content"] is None:
+        _snapshot(state, generation)
+    elif (
+        pattern is None
+        and state["key"] is not None
+        and state["key"][1:] == key[1:]
+        and query.startswith(state["query"])
+    ):
+        # Extending a literal query can only drop matches
+        candidates = state["matches"]
+
+    state["token"] += 1
+    state["count_label"].config(text="…")
+    threading.Thread(
+        target=_search_worker,
+        args=(
+            state["token"], state["content"], state["line_starts"],
+            key, pattern, candidates, state["results"],
+        ),
+        daemon=True,
+    ).start()
+    token = state["token"]
+    text.after(SEARCH_POLL_MS, lambda: _poll_results(state, token))
+
+
+def _poll_results(state, token):
+    text = state["text"]
+    if token != state["token"]:
+        return  # superseded by a newer search or cleared
+
+    result = None
+    while True:
+        try:
+            item = state["results"].get_nowait()
+        except queue.Empty:
+            break
+        if item[0] == token:
+            result = item
+
+    if result is None:
+        text.after(SEARCH_POLL_MS, lambda: _poll_results(state, token))
+        return
+
+    _, key, pattern, matches, ends, line_starts = result
+    if state["generation"] != get_generation(text):
+        run_search(state)  # the text changed while searching
+        return
+
+    state["query"] = key[0]
+    state["key"] = key
+    state["pattern"] = pattern
+    state["matches"] = matches
+    state["ends"] = ends
+    state["line_starts"] = line_starts
+
+    # First match after the cursor, wrapping to the top
+    cursor = _index_to_offset(state, text.index("insert"))
+    current = bisect_left(matches, cursor)
+    state["current"] = current if current < len(matches) else (0 if matches else -1)
+
+    _show_current(state)
+
+
+@instrumented("search_step")
+def search_next(state):
+    _step(state, 1)
+    return "break"
+
+
+@instrumented("search_step")
+def search_previous(state):
+    _step(state, -1)
+    return "break"
+
+
+def _step(state, delta):
+    if state["generation"] != get_generation(state["text"]):
+        run_search(state)
+        return
+    if not state["matches"]:
+        return
+    state["current"] = (state["current"] + delta) % len(state["matches"])
+    _show_current(state)
+
+
+def _show_current(state):
+    text = state["text"]
+    matches = state["matches"]
+    text.tag_remove("search_current", "1.0", "end")
+
+    if not matches:
+        state["count_label"].config(text="No results")
+        refresh_viewport(state)
+        return
+
+    start = offset_to_index(state, matches[state["current"]])
+    end = offset_to_index(state, state["ends"][state["current"]])
+    text.mark_set("insert", start)
+    text.see(start)
+    text.tag_add("search_current", start, end)
+    state["count_label"].config(text=f"{state['current'] + 1}/{len(matches)}")
+    refresh_viewport(state)
+
+
+def refresh_viewport(state):
+    """Highlight only the matches inside the visible lines."""
+    text = state["text"]
+    state["viewport_after_id"] = None
+    text.tag_remove("search_highlight", "1.0", "end")
+
+    matches = state["matches"]
+    if not matches or not state["query"]:
+        return
+
+    if state["generation"] != get_generation(text):
+        return  # offsets are stale until the next search
+
+    first_line = int(text.index("@0,0").split(".")[0])
+    last_line = int(text.index(f"@0,{text.winfo_height()}").split(".")[0])
+    line_starts = state["line_starts"]
+
+    ends = state["ends"]
+    low = line_starts[first_line - 1]
+    high = line_starts[last_line] if last_line < len(line_starts) else len(state["content"])
+
+    i = bisect_left(matches, low)
+    while i > 0 and ends[i - 1] > low:
+        i -= 1  # starts above the screen, ends on it
+    j = min(bisect_left(matches, high), i + VIEWPORT_MATCH_LIMIT)
+    if i >= j:
+        return
+
+    indices = []
+    for k in range(i, j):
+        indices.append(offset_to_index(state, matches[k]))
+        indices.append(offset_to_index(state, ends[k]))
+    text.tag_add("search_highlight", *indices)
+
+
+def schedule_viewport_refresh(state):
+    """Coalesce scroll notifications into one refresh per idle cycle."""
+    if state["query"] and state["viewport_after_id"] is None:
+        state["viewport_after_id"] = state["text"].after_idle(
+            lambda: refresh_viewport(state)
+        )
+
+
+def clear_search(state):
+    text = state["text"]
+    if state["after_id"] is not None:
+        text.after_cancel(state["after_id"])
+        state["after_id"] = None
+    state["token"] += 1
+    state["replace_job"] = None
+    state["query"] = ""
+    state["key"] = None
+    state["pattern"] = None
+    state["matches"] = array("q")
+    state["ends"] = array("q")
+    state["current"] = -1
+    state["content"] = None
+    state["line_starts"] = None
+    state["count_label"].config(text="")
+    text.tag_remove("search_highlight", "1.0", "end")
+    text.tag_remove("search_current", "1.0", "end")
+
+
+def search_is_current(state):
+    """True when the matches are for the text and query showing now."""
+    key = (state["search_entry"].get(),) + _options_key(state["options"])
+    return key == state["key"] and state["generation"] == get_generation(state["text"])
+
+
+def _snapshot(state, generation):
+    state["content"] = state["text"].get("1.0", "end-1c")
+    state["line_starts"] = None
+    state["generation"] = generation
+
+
+# -----------------------------
+# OFFSET <-> INDEX
+# -----------------------------
+def offset_to_index(state, offset):
+    """Tk index of an offset into the searched snapshot."""
+    return "{}.{}".format(*offset_to_position(state["line_starts"], offset))
+
+
+def _index_to_offset(state, index):
+    return position_to_offset(state["line_starts"], parse_position(index), len(state["content"]))
@@ -0,0 +1,477 @@
+# tabs.py
+import os
+import queue
+import threading
+import tkinter as tk
+
+from autosave import discard_snapshot, stop_autosave, take_snapshot
+from chunked_load import cancel_chunked_load
+from config import TAB_KEEP_RESIDENT, TAB_MEMORY_BUDGET
+from dirty import carry_saved, is_dirty, looks_dirty
+from document import copy_document, document_to_bytes
+from editor_ops import color_tags, import_document, release_document, text_document
+from highlight import start_highlighter, stop_highlighter
+from minimap import start_minimap, stop_minimap
+from journal import stop_journal
+from large_file import close_large_file, save_annotations
+from lazy import messagebox
+from locks import create_file_lock, normalize_path, remove_file_lock
+from mini_format import parse_document
+from scroll_thumb import invalidate_all
+from text_hooks import get_generation, unobserved
+from ui import build_editor
+from undo import undo_usage
+from watcher import stop_watcher, watch_recheck
+
+TAB_POLL_MS = 50  # waiting for an eviction to finish compressing
+TAB_REFRESH_MS = 500  # tab labels (name, unsaved mark)
+
+# Resident memory is estimated, since Tk keeps no per-widget accounting:
+# the text B-tree stores about a byte per character plus a record per line
+# and two toggles per color run; an empty editor costs WIDGET_BYTES. The
+# tab's document (document.py) holds the text again, as a str per line.
+CHAR_BYTES = 1
+LINE_BYTES = 160
+TOGGLE_BYTES = 48
+WIDGET_BYTES = 64 * 1024
+DOCUMENT_LINE_BYTES = 64
+
+
+# -----------------------------
+# TABS
+# -----------------------------
+# Every tab is an editor (Text + scroll thumb) with its own state dict;
+# only the current one is packed, so switching between resident tabs is a
+# pack_forget/pack. Tabs are used in LRU order: past TAB_MEMORY_BUDGET the
+# least recently used inactive ones are evicted. Eviction keeps the widget
+# and every service attached to it (undo, journal, dirty tracking,
+# autosave, watcher) and only swaps the document out:
+#
+#   1. the tab's document (editor_ops.text_document) is copied on the Tk
+#      thread and compressed into a .mini v2 blob by a worker thread
+#   2. back on the Tk thread, if the tab is still inactive and unedited,
+#      the widget is emptied with no change listener seeing it
+#      (text_hooks.unobserved), the document is dropped and
+#      state["evicted"] holds the blob
+#   3. showing the tab again puts the same document back the same way, so
+#      undo history, pending journal ops and saved/unsaved status all stay
+#      valid; highlighting and the minimap restart and the watcher looks at
+#      the file again
+#
+# Loading and large file tabs are never evicted.
+
+
+def create_tabs(root, ui, make_state, save, on_switch):
+    """
+    make_state(editor) builds a new tab's state dict (services started),
+    save(text, state) returns True once saved, on_switch(tab) runs after a
+    tab became the current one.
+    """
+    tabs = {
+        "root": root,
+        "bar": ui["tab_bar"],
+        "area": ui["editor_area"],
+        "list": [],
+        "current": None,
+        "clock": 0,  # bumped on every switch; tab["used"] orders the LRU
+        "make_state": make_state,
+        "save": save,
+        "on_switch": on_switch,
+        "evictions": queue.Queue(),
+        "polling": False,
+    }
+    root.after(TAB_REFRESH_MS, lambda: _refresh_tick(tabs))
+    return tabs
+
+
+def new_tab(tabs, editor=None):
+    """Open an empty tab (on `editor`, if already built) and show it."""
+    if editor is None:
+        editor = build_editor(tabs["area"])
+    tab = {
+        "frame": editor["frame"],
+        "text": editor["text"],
+        "state": None,
+        "label": None,
+        "used": 0,
+        "bytes": 0,  # estimated resident memory
+        "measured": None,  # text generation the estimate was made at
+        "evicting": False,
+        "closed": False,
+    }
+    tab["state"] = tabs["make_state"](editor)
+    tabs["list"].append(tab)
+
+    label = tk.Label(tabs["bar"], padx=10, pady=2, bg="#1C1C1B", fg="#CCCCCC")
+    label.bind("<Button-1>", lambda e: switch_tab(tabs, tab))
+    label.bind("<Button-2>", lambda e: close_tab(tabs, tab))
+    label.pack(side="left")
+    tab["label"] = label
+
+    if len(tabs["list"]) == 2:
+        tabs["bar"].pack(fill="x", before=tabs["area"])
+    switch_tab(tabs, tab)
+    return tab
+
+
+def current_tab(tabs):
+    return tabs["current"]
+
+
+def tab_name(tab):
+    path = tab["state"]["current_file_path"]
+    return os.path.basename(path) if path else "Untitled"
+
+
+def switch_tab(tabs, tab):
+    previous = tabs["current"]
+    tabs["clock"] += 1
+    tab["used"] = tabs["clock"]
+    if previous is tab:
+        return
+
+    if previous is not None:
+        previous["frame"].pack_forget()
+    tabs["current"] = tab
+    if tab["state"].get("evicted") is not None:
+        _rehydrate(tab)
+    tab["frame"].pack(expand=True, fill="both")
+    tab["text"].focus_set()
+
+    tabs["root"].title(f"mini_notes - {tab_name(tab)}")
+    _refresh_labels(tabs)
+    tabs["on_switch"](tab)
+    # Measured and enforced once the switch has been painted
+    tabs["root"].after_idle(lambda: enforce_budget(tabs))
+
+
+def next_tab(tabs, step=1):
+    if len(tabs["list"]) > 1:
+        i = tabs["list"].index(tabs["current"])
+        switch_tab(tabs, tabs["list"][(i + step) % len(tabs["list"])])
+    return "break"
+
+
+def find_tab(tabs, file_path):
+    wanted = normalize_path(file_path)
+    for tab in tabs["list"]:
+        path = tab["state"]["current_file_path"]
+        if path and normalize_path(path) == wanted:
+            return tab
+    return None
+
+
+def _is_blank(tab):
+    """An untitled tab nobody has typed into, fit to take a file."""
+    text, state = tab["text"], tab["state"]
+    return (
+        state["current_file_path"] is None
+        and not state.get("loading")
+        and not state.get("large_file")
+        and state.get("evicted") is None
+        and text.compare("end-1c", "==", "1.0")
+    )
+
+
+def blank_tab(tabs):
+    """The current tab if it is blank, else a new one."""
+    tab = tabs["current"]
+    if tab is None or not _is_blank(tab):
+        tab = new_tab(tabs)
+    return tab
+
+
+def open_in_tab(tabs, file_path, load):
+    """
+    Show file_path (File > Open, a forwarded launch, a workspace result):
+    in the tab that already has it, else in the current tab if that is
+    blank, else in a new one. load(path, text, state) reads it in.
+    Returns the tab, or None if another process has the file open.
+    """
+    root = tabs["root"]
+    root.deiconify()
+    root.lift()
+    root.focus_force()
+
+    tab = find_tab(tabs, file_path)
+    if tab is not None:
+        switch_tab(tabs, tab)
+        return tab
+
+    if not create_file_lock(file_path):
+        messagebox.showinfo("Open File", "That file is already open in another window.")
+        return None
+
+    tab = blank_tab(tabs)
+    state = tab["state"]
+    try:
+        load(file_path, tab["text"], state)
+    finally:
+        # A load that failed (or raised) leaves the tab without the file
+        if not state.get("loading") and state["current_file_path"] != file_path:
+            remove_file_lock(file_path)
+    tabs["root"].title(f"mini_notes - {tab_name(tab)}")
+    _refresh_labels(tabs)
+    return tab
+
+
+# -----------------------------
+# CLOSING
+# -----------------------------
+def _ask_save(tabs, tab, title):
+    """False if the user cancelled or the save failed."""
+    text, state = tab["text"], tab["state"]
+    if not is_dirty(text, state):
+        return True
+    switch_tab(tabs, tab)  # show what the question is about
+    response = messagebox.askyesnocancel(
+        title, f"Do you want to save changes to {tab_name(tab)}?"
+    )
+    if response is None:
+        return False
+    return not response or tabs["save"](text, state)
+
+
+def close_tab(tabs, tab=None):
+    tab = tab or tabs["current"]
+    if not _ask_save(tabs, tab, "Close Tab"):
+        return "break"
+
+    _dispose(tab)
+    tabs["list"].remove(tab)
+    tab["label"].destroy()
+    if len(tabs["list"]) == 1:
+        tabs["bar"].pack_forget()
+
+    if tabs["current"] is tab:
+        tabs["current"] = None
+        if tabs["list"]:
+            switch_tab(tabs, max(tabs["list"], key=lambda t: t["used"]))
+        else:
+            new_tab(tabs)
+    tab["frame"].destroy()
+    return "break"
+
+
+def close_window(tabs):
+    """WM_DELETE_WINDOW: ask about every unsaved tab, then quit."""
+    for tab in list(tabs["list"]):
+        if not _ask_save(tabs, tab, "Confirm Exit"):
+            return
+    for tab in tabs["list"]:
+        state = tab["state"]
+        if state.get("large_file"):
+            save_annotations(state["large_file"])
+        if state["current_file_path"]:
+            remove_file_lock(state["current_file_path"])
+    tabs["root"].destroy()
+
+
+def _dispose(tab):
+    """Stop everything the tab runs; a closed tab leaves nothing to recover."""
+    text, state = tab["text"], tab["state"]
+    tab["closed"] = True
+    cancel_chunked_load(state)
+    if state.get("large_file"):
+        save_annotations(state["large_file"])
+        close_large_file(state)
+    stop_journal(text, state)
+    stop_highlighter(state)
+    stop_minimap(state)
+    stop_watcher(state)
+    _drop_search(state)
+    discard_snapshot(state, state["current_file_path"])
+    stop_autosave(text, state)
+    if state["current_file_path"]:
+        remove_file_lock(state["current_file_path"])
+
+
+def _drop_search(state):
+    search_state = state.get("search_state")
+    if search_state is None:
+        return
+    search_state["token"] += 1  # ignore a search still running
+    search_state["replace_job"] = None
+    if search_state["after_id"] is not None:
+        search_state["text"].after_cancel(search_state["after_id"])
+    state["search_state"] = None  # made again when searched
+
+
+# -----------------------------
+# LABELS
+# -----------------------------
+def _refresh_labels(tabs):
+    for tab in tabs["list"]:
+        name = tab_name(tab)
+        if looks_dirty(tab["text"], tab["state"]):
+            name += " •"
+        bg = "#4A4A4A" if tab is tabs["current"] else "#1C1C1B"
+        if tab["label"].cget("text") != name or tab["label"].cget("bg") != bg:
+            tab["label"].config(text=name, bg=bg)
+
+
+def _refresh_tick(tabs):
+    if tabs["list"]:
+        _refresh_labels(tabs)
+    tabs["root"].after(TAB_REFRESH_MS, lambda: _refresh_tick(tabs))
+
+
+# -----------------------------
+# MEMORY
+# -----------------------------
+def _resident_bytes(tab):
+    text, state = tab["text"], tab["state"]
+    chars = int(text.tk.call(text._w, "count", "-chars", "1.0", "end"))
+    lines = int(text.index("end-1c").split(".")[0])
+    toggles = sum(len(text.tag_ranges(tag)) for tag in color_tags(text))
+    usage = undo_usage(state)
+    return (
+        WIDGET_BYTES
+        + chars * CHAR_BYTES * 2
+        + lines * (LINE_BYTES + DOCUMENT_LINE_BYTES)
+        + toggles * TOGGLE_BYTES
+        + (usage["stored_bytes"] if usage is not None else 0)
+    )
+
+
+def _measure(tabs, tab):
+    """Estimated resident bytes; inactive tabs are only measured again after an edit."""
+    generation = get_generation(tab["text"])
+    if tab is tabs["current"] or tab["measured"] != generation:
+        tab["bytes"] = _resident_bytes(tab)
+        tab["measured"] = generation
+    return tab["bytes"]
+
+
+def tab_memory(tabs):
+    """Per tab: {"name", "status" (current/resident/evicted), "bytes"}."""
+    report = []
+    for tab in tabs["list"]:
+        evicted = tab["state"].get("evicted")
+        if evicted is not None:
+            usage = undo_usage(tab["state"])
+            size = WIDGET_BYTES + len(evicted["blob"])
+            size += usage["stored_bytes"] if usage is not None else 0
+            status = "evicted"
+        else:
+            size = _measure(tabs, tab)
+            status = "current" if tab is tabs["current"] else "resident"
+        report.append({"name": tab_name(tab), "status": status, "bytes": size})
+    return report
+
+
+def enforce_budget(tabs):
+    """Evict least recently used tabs while resident memory is over budget."""
+    resident = [
+        tab for tab in tabs["list"]
+        if tab["state"].get("evicted") is None and not tab["evicting"]
+    ]
+    total = sum(_measure(tabs, tab) for tab in resident)
+    if total <= TAB_MEMORY_BUDGET:
+        return
+
+    recent = sorted(tabs["list"], key=lambda t: t["used"], reverse=True)[:TAB_KEEP_RESIDENT]
+    for tab in sorted(resident, key=lambda t: t["used"]):
+        if total <= TAB_MEMORY_BUDGET:
+            break
+        state = tab["state"]
+        if (
+            tab is tabs["current"]
+            or tab in recent
+            or state.get("loading")
+            or state.get("large_file")
+        ):
+            continue
+        evict_tab(tabs, tab)
+        total -= tab["bytes"]
+
+
+# -----------------------------
+# EVICTION
+# -----------------------------
+def evict_tab(tabs, tab):
+    text, state = tab["text"], tab["state"]
+    # Unsaved edits reach the recovery snapshot before leaving the widget
+    take_snapshot(text, state)
+    job = {
+        "tab": tab,
+        "generation": get_generation(text),
+        "document": copy_document(text_document(text)),
+        "dirty": is_dirty(text, state),
+        "view": (text.yview()[0], text.index("insert")),
+        "blob": None,
+    }
+    tab["evicting"] = True
+    threading.Thread(target=_compress, args=(job, tabs["evictions"]), daemon=True).start()
+    if not tabs["polling"]:
+        tabs["polling"] = True
+        tabs["root"].after(TAB_POLL_MS, lambda: _poll_evictions(tabs))
+
+
+def _compress(job, results):
+    job["blob"] = document_to_bytes(job.pop("document"), "zlib")
+    results.put(job)
+
+
+def _poll_evictions(tabs):
+    try:
+        while True:
+            _finish_eviction(tabs, tabs["evictions"].get_nowait())
+    except queue.Empty:
+        pass
+
+    if any(tab["evicting"] for tab in tabs["list"]):
+        tabs["root"].after(TAB_POLL_MS, lambda: _poll_evictions(tabs))
+    else:
+        tabs["polling"] = False
+
+
+def _finish_eviction(tabs, job):
+    tab = job["tab"]
+    tab["evicting"] = False
+    text, state = tab["text"], tab["state"]
+    if (
+        tab["closed"]
+        or tab is tabs["current"]
+        or state.get("loading")
+        or state.get("large_file")
+        or get_generation(text) != job["generation"]
+    ):
+        return  # shown or changed meanwhile: it stays resident
+
+    highlighted = state.get("highlight") is not None
+    minimapped = state.get("minimap") is not None
+    stop_highlighter(state)
+    stop_minimap(state)
+    _drop_search(state)  # it holds a copy of the text
+    with unobserved(text):
+        text.delete("1.0", "end")
+    release_document(text)
+    state["evicted"] = {
+        "blob": job["blob"],
+        "dirty": job["dirty"],
+        "view": job["view"],
+        "highlight": highlighted,
+        "minimap": minimapped,
+    }
+    invalidate_all(state["scrollbar"]["bar"])
+
+
+def _rehydrate(tab):
+    text, state = tab["text"], tab["state"]
+    evicted = state["evicted"]
+    content, runs = parse_document(evicted["blob"])
+    with unobserved(text):
+        import_document(text, content, runs)
+    state["evicted"] = None
+    carry_saved(text, state, evicted["dirty"])
+    invalidate_all(state["scrollbar"]["bar"])
+
+    first, insert = evicted["view"]
+    text.mark_set("insert", insert)
+    text.yview_moveto(first)
+    if evicted["highlight"]:
+        start_highlighter(text, state)
+    if evicted["minimap"]:
+        start_minimap(text, state)
+    watch_recheck(state)  # the file may have changed while evicted
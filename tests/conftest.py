@@ -0,0 +1,31 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def editor():
+    """(text, state) of a Text set up as app.py sets up a tab; skipped without a display."""
+    tk = pytest.importorskip("tkinter")
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    root.withdraw()
+
+    from editor_ops import bind_document
+    from text_hooks import install_change_hook
+    from undo import start_undo
+
+    text = tk.Text(root)
+    state = {}
+    install_change_hook(text)
+    bind_document(text)
+    start_undo(text, state)
+    yield text, state
+    root.destroy()
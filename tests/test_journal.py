@@ -0,0 +1,107 @@
+# tests/test_journal.py
+import json
+import zlib
+
+import pytest
+
+from color_runs import WIDE_COLUMNS
+from editor_ops import export_document
+from formats import write_file
+from journal import (
+    RECORD_HEADER,
+    _header,
+    append_pending,
+    hash_file,
+    journal_path,
+    read_current,
+    replay,
+    start_journal,
+    stop_journal,
+)
+
+RED = "#DE3B28"
+BLUE = "#8AB5FF"
+EMOJI = "\U0001F600"
+
+
+def write_journal(path, *records, tail=b""):
+    with open(journal_path(path), "wb") as f:
+        f.write(_header(hash_file(path)))
+        for ops in records:
+            payload = json.dumps(ops).encode("utf-8")
+            f.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        f.write(tail)
+
+
+# -----------------------------
+# PURE-PYTHON REPLAY
+# -----------------------------
+def test_plain_insert_takes_color_on_both_sides():
+    ops = [["d", "1.1", "1.2"], ["i", "1.1", "Y"]]
+    assert replay("aXb", [(0, 1, RED), (2, 3, RED)], ops) == ("aYb", [(0, 3, RED)])
+
+
+def test_tagged_insert_gets_exactly_its_color():
+    runs = [(0, 1, RED), (2, 3, RED)]
+    ops = [["d", "1.1", "1.2"], ["i", "1.1", "Y", ""]]
+    assert replay("aXb", runs, ops) == ("aYb", runs)
+
+    ops = [["i", "1.1", "Y\nZ", BLUE]]
+    assert replay("ab", [(0, 2, RED)], ops) == ("aY\nZb", [(0, 1, RED), (1, 4, BLUE), (4, 5, RED)])
+
+
+@pytest.mark.skipif(not WIDE_COLUMNS, reason="Tk counts characters, not UTF-16 units")
+def test_replay_counts_tk_columns():
+    # The emoji is two columns in the widget the ops were recorded from
+    ops = [["i", "1.2", "x"], ["t+", "1.0", "1.3", RED]]
+    content, runs = replay(f"{EMOJI}b", [], ops)
+    assert content == f"{EMOJI}xb"
+    assert runs == [(0, 2, RED)]
+
+
+# -----------------------------
+# JOURNAL FILES
+# -----------------------------
+def test_read_current_applies_the_journal(tmp_path):
+    path = str(tmp_path / "note.mini")
+    write_file(path, "mini", "aXb", [(0, 1, RED), (2, 3, RED)])
+    write_journal(path, [["d", "1.1", "1.2"]], [["i", "1.1", "Y", ""], ["t+", "1.0", "1.1", BLUE]])
+    assert read_current(path, "mini") == ("aYb", [(0, 1, BLUE), (2, 3, RED)])
+
+
+def test_torn_record_is_ignored(tmp_path):
+    path = str(tmp_path / "note.mini")
+    write_file(path, "mini", "ab", [])
+    write_journal(path, [["i", "1.2", "c"]], tail=RECORD_HEADER.pack(100, 0) + b'[["i"')
+    assert read_current(path, "mini") == ("abc", [])
+
+
+def test_journal_of_another_base_is_ignored(tmp_path):
+    path = str(tmp_path / "note.mini")
+    write_file(path, "mini", "ab", [])
+    write_journal(path, [["i", "1.2", "c"]])
+    write_file(path, "mini", "ab!", [])
+    assert read_current(path, "mini") == ("ab!", [])
+
+
+# -----------------------------
+# RECORDING (Tk)
+# -----------------------------
+def test_saved_edits_reload_as_shown(editor, tmp_path):
+    text, state = editor
+    path = str(tmp_path / "note.mini")
+    text.insert("1.0", f"aXb {EMOJI} aXb\nline")
+    text.tag_add("color_" + RED, "1.0", "1.1", "1.2", "1.3", "1.7", "1.10")
+    write_file(path, "mini", *export_document(text))
+    start_journal(text, state, path, "mini")
+
+    # As find/replace and the file watcher edit: no color from the neighbours
+    text.delete("1.1", "1.2")
+    text.insert("1.1", "Y", "")
+    text.insert("1.8", "Z", "color_" + BLUE, "W", "")
+    text.insert("2.0", "typed ")
+    text.tag_add("color_" + BLUE, "2.0", "2.5")
+    append_pending(state)
+    stop_journal(text, state)
+
+    assert read_current(path, "mini") == export_document(text)
@@ -0,0 +1,93 @@
+# tests/test_replace.py
+import time
+import tkinter as tk
+
+from editor_ops import export_document
+from formats import write_file
+from journal import append_pending, read_current, start_journal, stop_journal
+from replace import replace_all, replace_current
+from search_engine import create_search_state, run_search
+from undo import redo, reset_undo, undo
+
+RED = "#DE3B28"
+BLUE = "#8AB5FF"
+
+# One X, uncolored between two red runs: a plain insert there would turn red
+CONTENT = "aXb cd\nGet-Item -Path"
+COLORS = [(RED, ("1.0", "1.1", "1.2", "1.5")), (BLUE, ("2.0", "2.8"))]
+AFTER_RUNS = [(0, 1, RED), (2, 5, RED), (7, 15, BLUE)]
+
+
+def start(text, state):
+    text.insert("1.0", CONTENT)
+    for color, indices in COLORS:
+        text.tag_add("color_" + color, *indices)
+    reset_undo(state)
+    return export_document(text)
+
+
+def search_for(text, query):
+    search = create_search_state(text, tk.Entry(text.master), tk.Label(text.master))
+    search["search_entry"].insert(0, query)
+    return search
+
+
+def wait(text, done):
+    deadline = time.monotonic() + 10
+    while not done():
+        assert time.monotonic() < deadline, "replace never finished"
+        text.update()
+        time.sleep(0.005)
+
+
+def replace_everything(text, state, query, replacement):
+    search = search_for(text, query)
+    replace_all(search, state, replacement)
+    wait(text, lambda: search["count_label"].cget("text").endswith("replaced"))
+    return export_document(text)
+
+
+def test_replace_all_between_colored_text(editor):
+    text, state = editor
+    start(text, state)
+    after = replace_everything(text, state, "X", "Y")
+    assert after == ("aYb cd\nGet-Item -Path", AFTER_RUNS)
+
+
+def test_replace_all_undo_redo(editor):
+    text, state = editor
+    before = start(text, state)
+    after = replace_everything(text, state, "X", "Y\nY")
+    assert after == ("aY\nYb cd\nGet-Item -Path", [(0, 1, RED), (4, 7, RED), (9, 17, BLUE)])
+    undo(text, state)
+    assert export_document(text) == before
+    redo(text, state)
+    assert export_document(text) == after
+
+
+def test_replace_current_undo_redo(editor):
+    text, state = editor
+    before = start(text, state)
+    search = search_for(text, "X")
+    text.mark_set("insert", "1.0")
+    run_search(search)
+    wait(text, lambda: search["current"] >= 0)
+    replace_current(search, state, "Z")
+    after = export_document(text)
+    assert after == ("aZb cd\nGet-Item -Path", AFTER_RUNS)
+    undo(text, state)
+    assert export_document(text) == before
+    redo(text, state)
+    assert export_document(text) == after
+
+
+def test_replace_all_survives_a_journaled_save(editor, tmp_path):
+    text, state = editor
+    path = str(tmp_path / "note.mini")
+    write_file(path, "mini", *start(text, state))
+    start_journal(text, state, path, "mini")
+    after = replace_everything(text, state, "X", "Y")
+    assert after == ("aYb cd\nGet-Item -Path", AFTER_RUNS)
+    append_pending(state)
+    stop_journal(text, state)
+    assert read_current(path, "mini") == after
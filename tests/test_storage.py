@@ -0,0 +1,166 @@
+# tests/test_storage.py
+import pytest
+
+from color_runs import (
+    WIDE_COLUMNS,
+    compute_line_starts,
+    normalize_runs,
+    runs_to_offsets,
+    runs_to_positions,
+)
+from document import (
+    delete_text,
+    document_from_bytes,
+    document_from_file,
+    document_runs,
+    document_segments,
+    document_text,
+    document_to_bytes,
+    document_to_file,
+    insert_text,
+    new_document,
+    recolor,
+)
+from exporters import merge_segments, render_markdown
+from mini_format import load_document, save_document
+
+RED = "#DE3B28"
+BLUE = "#8AB5FF"
+EMOJI = "\U0001F600"
+
+CONTENT = f"Get-Item {EMOJI} -Path\n\n{EMOJI}{EMOJI} done\nlast"
+RUNS = [(0, 8, RED), (9, 10, BLUE), (11, 16, RED), (18, 20, BLUE)]
+
+
+def colors_of(content, runs):
+    colors = [None] * len(content)
+    for start, end, color in runs:
+        colors[start:end] = [color] * (end - start)
+    return colors
+
+
+# -----------------------------
+# COLOR RUNS
+# -----------------------------
+def test_normalize_runs_later_ranges_win():
+    ranges = [(0, 10, RED), (3, 5, BLUE), (5, 12, RED)]
+    assert normalize_runs(ranges) == [(0, 3, RED), (3, 5, BLUE), (5, 12, RED)]
+
+
+def test_offsets_survive_tk_positions():
+    line_starts = compute_line_starts(CONTENT)
+    positions = runs_to_positions(RUNS, line_starts)
+    assert runs_to_offsets(positions, line_starts, len(CONTENT)) == RUNS
+
+
+@pytest.mark.skipif(not WIDE_COLUMNS, reason="Tk counts characters, not UTF-16 units")
+def test_wide_characters_take_two_columns():
+    positions = runs_to_positions(RUNS, compute_line_starts(CONTENT))
+    # " -Path" starts after the emoji, which is columns 9 and 10
+    assert positions[2] == ((1, 12), (1, 17), RED)
+    assert positions[3] == ((3, 0), (3, 4), BLUE)
+
+
+# -----------------------------
+# .MINI V2
+# -----------------------------
+@pytest.mark.parametrize("compression", ["none", "zlib", "lzma"])
+def test_mini_round_trip(tmp_path, compression):
+    path = str(tmp_path / "note.mini")
+    save_document(path, CONTENT, RUNS, compression)
+    assert load_document(path) == (CONTENT, RUNS)
+
+
+def test_mini_round_trip_empty(tmp_path):
+    path = str(tmp_path / "empty.mini")
+    save_document(path, "", [])
+    assert load_document(path) == ("", [])
+
+
+# -----------------------------
+# DOCUMENT
+# -----------------------------
+def test_document_keeps_text_and_runs():
+    document = new_document(CONTENT, RUNS)
+    assert document_text(document) == CONTENT
+    assert document_runs(document) == RUNS
+    assert document_runs(document_from_bytes(document_to_bytes(document))) == RUNS
+
+
+def test_insert_takes_color_on_both_sides_only():
+    document = new_document("aXb", [(0, 3, RED)])
+    insert_text(document, 1, "Y")
+    assert document_runs(document) == [(0, 4, RED)]
+
+    document = new_document("ab", [(0, 1, RED)])
+    insert_text(document, 1, "Y")
+    assert document_runs(document) == [(0, 1, RED)]
+
+    insert_text(document, 1, "Z", BLUE)
+    assert document_text(document) == "aZYb"
+    assert document_runs(document) == [(0, 1, RED), (1, 2, BLUE)]
+
+
+def test_delete_joins_runs_of_one_color():
+    document = new_document("aXb\nc", [(0, 1, RED), (2, 5, RED)])
+    delete_text(document, 1, 2)
+    assert document_text(document) == "ab\nc"
+    assert document_runs(document) == [(0, 4, RED)]
+
+
+def test_edits_across_lines_match_a_flat_string():
+    document = new_document(CONTENT, RUNS)
+    content, colors = CONTENT, colors_of(CONTENT, RUNS)
+    edits = [("insert", 5, "x\ny"), ("delete", 3, 14), ("color", 0, 6, BLUE), ("insert", 0, "\n")]
+    for edit in edits:
+        if edit[0] == "insert":
+            _, at, chars = edit
+            insert_text(document, at, chars)
+            inherited = colors[at - 1] if 0 < at < len(colors) and colors[at - 1] == colors[at] else None
+            content = content[:at] + chars + content[at:]
+            colors[at:at] = [inherited] * len(chars)
+        elif edit[0] == "delete":
+            _, start, end = edit
+            delete_text(document, start, end)
+            content = content[:start] + content[end:]
+            del colors[start:end]
+        else:
+            _, start, end, color = edit
+            recolor(document, start, end, color)
+            colors[start:end] = [color] * (end - start)
+        assert document_text(document) == content
+        assert colors_of(content, document_runs(document)) == colors
+
+
+@pytest.mark.parametrize("name", ["note.mini", "note.np100"])
+def test_file_round_trip(tmp_path, name):
+    path = document_to_file(new_document(CONTENT, RUNS), str(tmp_path / name))
+    document = document_from_file(path)
+    assert document_text(document) == CONTENT
+    assert document_runs(document) == RUNS
+
+
+def test_plain_text_drops_colors(tmp_path):
+    path = document_to_file(new_document(CONTENT, RUNS), str(tmp_path / "note.txt"))
+    document = document_from_file(path)
+    assert document_text(document) == CONTENT
+    assert document_runs(document) == []
+
+
+# -----------------------------
+# EXPORT
+# -----------------------------
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_merge_segments_any_chunking(size):
+    chunks = [CONTENT[i:i + size] for i in range(0, len(CONTENT), size)]
+    segments = list(merge_segments(chunks, RUNS))
+    assert "".join(chars for chars, _ in segments) == CONTENT
+    assert [color for chars, color in segments for _ in chars] == colors_of(CONTENT, RUNS)
+    assert list(document_segments(new_document(CONTENT, RUNS))) == list(merge_segments([CONTENT], RUNS))
+
+
+def test_markdown_leaves_code_fences_bare():
+    segments = [("see ", None), ("this", RED), ("\n```ps\n", None), ("Get-Item", RED), ("\n```\n", None)]
+    markdown = "".join(render_markdown(iter(segments)))
+    assert f'<span style="color:{RED}">this</span>' in markdown
+    assert "\n```ps\nGet-Item\n```\n" in markdown
@@ -0,0 +1,75 @@
+# tests/test_undo.py
+from editor_ops import export_document, text_document
+from document import document_runs, document_text
+from undo import redo, reset_undo, seal_undo_step, undo
+
+RED = "#DE3B28"
+BLUE = "#8AB5FF"
+EMOJI = "\U0001F600"
+
+
+def start(text, state, content, *colors):
+    """Show content colored with (color, tag_add indices) pairs, no history."""
+    text.insert("1.0", content)
+    for color, indices in colors:
+        text.tag_add("color_" + color, *indices)
+    seal_undo_step(text, state)
+    reset_undo(state)
+    text_document(text)  # from here on the bound document follows the edits
+    return export_document(text)
+
+
+def step(text, state, edit):
+    seal_undo_step(text, state)
+    edit()
+    seal_undo_step(text, state)
+    return export_document(text)
+
+
+def assert_round_trip(text, state, before, after):
+    undo(text, state)
+    assert export_document(text) == before
+    redo(text, state)
+    assert export_document(text) == after
+
+
+def test_deleting_colored_text_comes_back_colored(editor):
+    text, state = editor
+    before = start(text, state, f"one {EMOJI} two\nthree", (RED, ("1.0", "1.3")), (BLUE, ("1.4", "2.2")))
+    after = step(text, state, lambda: text.delete("1.2", "2.1"))
+    assert_round_trip(text, state, before, after)
+
+
+def test_recolor_is_undone(editor):
+    text, state = editor
+    before = start(text, state, "some text", (RED, ("1.0", "1.4")))
+
+    def recolor():
+        text.tag_remove("color_" + RED, "1.2", "1.9")
+        text.tag_add("color_" + BLUE, "1.2", "1.9")
+
+    after = step(text, state, recolor)
+    assert_round_trip(text, state, before, after)
+
+
+def test_redo_keeps_the_tags_an_insert_was_made_with(editor):
+    text, state = editor
+    before = start(text, state, "aXb", (RED, ("1.0", "1.1", "1.2", "1.3")))
+
+    def replace():
+        text.delete("1.1", "1.2")
+        text.insert("1.1", "Y", "", "Z", "color_" + BLUE)
+
+    after = step(text, state, replace)
+    assert after == ("aYZb", [(0, 1, RED), (2, 3, BLUE), (3, 4, RED)])
+    assert_round_trip(text, state, before, after)
+
+
+def test_bound_document_follows_undo(editor):
+    text, state = editor
+    start(text, state, "aXb", (RED, ("1.0", "1.3")))
+    after = step(text, state, lambda: text.insert("1.1", "Y", ""))
+    undo(text, state)
+    redo(text, state)
+    document = text_document(text)
+    assert (document_text(document), document_runs(document)) == after
@@ -0,0 +1,265 @@
+# text_hooks.py
+from contextlib import contextmanager
+
+from color_runs import compute_line_starts, position_to_offset, tk_length
+
+
+# -----------------------------
+# CHANGE HOOK
+# -----------------------------
+# Tk has no per-edit event (<<Modified>> only fires when the modified flag
+# flips), so the widget's Tcl command is renamed and routed through Python.
+# Every insert/delete, including the ones Tk's own undo replays, passes
+# through the proxy, bumps a generation counter and notifies listeners.
+# Adding or removing color_* tags is reported too, since colors are part
+# of the document, but it does not move the text generation.
+#
+# While hook["capture"]() is true (the undo history is recording), the
+# proxy also saves what an edit destroys before it happens, readable from
+# listeners as hook["captured"]: for a delete (chars, color runs relative
+# to the start), for a tag change the sub-ranges that actually changed.
+#
+# For an insert, hook["inserted"] tells listeners what tags the new text
+# got: None when the call named none, else its (chars, tag names) pieces;
+# text without tag names (None) took the tags on both sides of it.
+
+# Widget commands seen by every proxy, read by the instrumentation
+proxy_stats = {"calls": 0}
+
+
+def install_change_hook(text):
+    """Install the proxy once and return the hook dict for `text`."""
+    hook = getattr(text, "change_hook", None)
+    if hook is not None:
+        return hook
+
+    hook = {
+        "generation": 0,
+        "listeners": [],
+        "capture": None,
+        "captured": None,
+        "inserted": None,
+        "unobserved": 0,  # unobserved() blocks entered
+    }
+    orig = text._w + "_orig"
+    call = text.tk.call
+    call("rename", text._w, orig)
+
+    def notify(op, start, end, detail=None):
+        for listener in list(hook["listeners"]):
+            listener(op, start, end, detail)
+
+    def insert_start(index):
+        start = call(orig, "index", index)
+        if call(orig, "compare", start, "==", "end"):
+            start = call(orig, "index", "end-1c")
+        return str(start)
+
+    def index_pairs(args):
+        pairs = []
+        for i in range(0, len(args), 2):
+            start = str(call(orig, "index", args[i]))
+            if i + 1 < len(args):
+                end = str(call(orig, "index", args[i + 1]))
+            else:
+                end = str(call(orig, "index", f"{start}+1c"))
+            pairs.append((start, end))
+        return pairs
+
+    def delete_ranges(args):
+        ranges = []
+        for start, end in index_pairs(args):
+            if call(orig, "compare", end, ">", "end-1c"):
+                end = str(call(orig, "index", "end-1c"))
+            if call(orig, "compare", start, "<", end):
+                ranges.append((start, end))
+        # Report bottom-up so every range is valid when its listener runs
+        ranges.sort(key=lambda r: tuple(map(int, r[0].split("."))), reverse=True)
+        return ranges
+
+    def inserted(args):
+        """hook["inserted"] for the chars/tagList arguments of an insert."""
+        if len(args) < 2:
+            return None
+        return [
+            (args[i], tuple(text.tk.splitlist(args[i + 1])) if i + 1 < len(args) else None)
+            for i in range(0, len(args), 2)
+        ]
+
+    def capturing():
+        return hook["capture"] is not None and hook["capture"]()
+
+    def compare(a, op, b):
+        return bool(call(orig, "compare", a, op, b))
+
+    def tagged_ranges(tag, start, end):
+        """Sub-ranges of [start, end) that carry tag."""
+        ranges = []
+        before = call(orig, "tag", "prevrange", tag, start)
+        if before and compare(before[1], ">", start):
+            ranges.append((start, str(before[1]) if compare(before[1], "<", end) else end))
+        index = start
+        while True:
+            found = call(orig, "tag", "nextrange", tag, index, end)
+            if not found:
+                return ranges
+            stop = str(found[1]) if compare(found[1], "<", end) else end
+            ranges.append((str(found[0]), stop))
+            index = stop
+
+    def untagged_ranges(tag, start, end):
+        gaps = []
+        index = start
+        for a, b in tagged_ranges(tag, start, end):
+            if compare(index, "<", a):
+                gaps.append((index, a))
+            index = b
+        if compare(index, "<", end):
+            gaps.append((index, end))
+        return gaps
+
+    def capture_delete(start, end):
+        chars = call(orig, "get", start, end)
+        line_starts = compute_line_starts(chars)
+        runs = []
+        for tag in call(orig, "tag", "names"):
+            tag = str(tag)
+            if tag.startswith("color_"):
+                for a, b in tagged_ranges(tag, start, end):
+                    runs.append((
+                        _offset(start, a, line_starts, len(chars)),
+                        _offset(start, b, line_starts, len(chars)),
+                        tag,
+                    ))
+        return chars, runs
+
+    def proxy(cmd, *args):
+        proxy_stats["calls"] += 1
+        if cmd in ("insert", "delete", "replace") and args:
+            hook["generation"] += 1
+            if not hook["listeners"]:
+                return call((orig, cmd) + args)
+
+        if cmd == "insert" and len(args) >= 2:
+            chars = "".join(args[1::2])
+            start = insert_start(args[0])
+            result = call((orig, cmd) + args)
+            if chars:
+                hook["inserted"] = inserted(args[1:])
+                notify("insert", start, advance_index(start, chars), chars)
+                hook["inserted"] = None
+            return result
+
+        if cmd == "delete" and args:
+            ranges = delete_ranges(args)
+            saved = [capture_delete(*r) for r in ranges] if capturing() else None
+            result = call((orig, cmd) + args)
+            for i, (start, end) in enumerate(ranges):
+                hook["captured"] = saved and saved[i]
+                notify("delete", start, end)
+            hook["captured"] = None
+            return result
+
+        if cmd == "replace" and len(args) >= 3:
+            ranges = delete_ranges(args[:2])
+            chars = "".join(args[2::2])
+            start = ranges[0][0] if ranges else insert_start(args[0])
+            saved = [capture_delete(*r) for r in ranges] if capturing() else None
+            result = call((orig, cmd) + args)
+            for i, (del_start, del_end) in enumerate(ranges):
+                hook["captured"] = saved and saved[i]
+                notify("delete", del_start, del_end)
+            hook["captured"] = None
+            if chars:
+                hook["inserted"] = inserted(args[2:])
+                notify("insert", start, advance_index(start, chars), chars)
+                hook["inserted"] = None
+            return result
+
+        if (
+            cmd == "tag"
+            and len(args) >= 3
+            and args[0] in ("add", "remove")
+            and str(args[1]).startswith("color_")
+            and hook["listeners"]
+        ):
+            tag = str(args[1])
+            pairs = index_pairs(args[2:])
+            saved = None
+            if capturing():
+                find = tagged_ranges if args[0] == "remove" else untagged_ranges
+                saved = [find(tag, *pair) for pair in pairs]
+            result = call((orig, cmd) + args)
+            for i, (start, end) in enumerate(pairs):
+                hook["captured"] = saved and saved[i]
+                notify("tag_" + args[0], start, end, tag)
+            hook["captured"] = None
+            return result
+
+        return call((orig, cmd) + args)
+
+    text.tk.createcommand(text._w, proxy)
+    # Let Misc.destroy() drop the Python command with the widget
+    if text._tclCommands is None:
+        text._tclCommands = []
+    text._tclCommands.append(text._w)
+
+    text.change_hook = hook
+    return hook
+
+
+def _offset(start, index, line_starts, length):
+    """Characters from `start` to `index`; line_starts is of the text between."""
+    sl, sc = map(int, start.split("."))
+    line, col = map(int, str(index).split("."))
+    if line == sl:
+        col -= sc
+    return position_to_offset(line_starts, (line - sl + 1, col), length)
+
+
+def advance_index(index, chars):
+    """Index just past `chars` inserted at `index`, computed without Tcl."""
+    line, col = map(int, index.split("."))
+    newlines = chars.count("\n")
+    if newlines:
+        last_line = chars[chars.rfind("\n") + 1:]
+        return f"{line + newlines}.{tk_length(last_line)}"
+    return f"{line}.{col + tk_length(chars)}"
+
+
+def add_change_listener(text, listener):
+    """
+    Call listener(op, start, end, detail) after every change to `text`.
+
+    op is "insert" (detail: the inserted chars), "delete" (start/end are
+    the range before deletion), "tag_add" or "tag_remove" (detail: the
+    color tag name).
+    """
+    install_change_hook(text)["listeners"].append(listener)
+
+
+def remove_change_listener(text, listener):
+    listeners = install_change_hook(text)["listeners"]
+    if listener in listeners:
+        listeners.remove(listener)
+
+
+def get_generation(text):
+    """Edit counter for `text`; it only moves when the text changes."""
+    return install_change_hook(text)["generation"]
+
+
+@contextmanager
+def unobserved(text):
+    """
+    Changes made inside reach no listener (the generation still moves):
+    for a document taken out of the widget and put back as it was.
+    """
+    hook = install_change_hook(text)
+    hook["unobserved"] += 1
+    listeners = hook["listeners"]
+    hook["listeners"] = []
+    try:
+        yield
+    finally:
+        hook["listeners"] = listeners
@@ -1,6 +1,6 @@
 import tkinter as tk
 from file_ops import open_file
-from editor_ops import clear_search_highlight
+from scroll_thumb import create_scroll_thumb, on_yscroll, on_drag as on_drag_thumb
 
 from config import (
     WINDOW_TITLE, FONT_FAMILY, FONT_SIZE,
@@ -39,9 +39,48 @@ def build_ui(root):
     btn_red = tk.Button(toolbar, text="000", fg="#DE3B28", bg="#DE3B28")
     btn_red.pack(side=tk.LEFT, pady=(3, 2))
 
+    # --- TAB BAR (shown while more than one note is open) ---
+    tab_bar = tk.Frame(root, bg="#1C1C1B")
+
+    # --- EDITOR AREA (one editor per tab, only the current one packed) ---
+    editor_area = tk.Frame(root, bg=POWERSHELL_BG)
+    editor_area.pack(expand=True, fill="both")
+
+    editor = build_editor(editor_area)
+    editor["frame"].pack(expand=True, fill="both")
+
+    # --- STATUS BAR (shown while a large file loads) ---
+    status_frame = tk.Frame(root, bg="#1C1C1B")
+    status_label = tk.Label(status_frame, text="", bg="#1C1C1B", fg="#CCCCCC", anchor="w")
+    status_label.pack(side="left", fill="x", expand=True)
+
+    status_cancel_btn = tk.Button(status_frame, text="Cancel", fg="white", bg="black")
+    status_cancel_btn.pack(side="right")
+
+
+    # --- RETURN ALL IMPORTANT WIDGETS ---
+    return {
+        "menubar_frame": menubar_frame,
+        "toolbar": toolbar,
+        "tab_bar": tab_bar,
+        "editor_area": editor_area,
+        **editor,
+        "status_frame": status_frame,
+        "status_label": status_label,
+        "status_cancel_btn": status_cancel_btn,
+        "btn_yellow": btn_yellow,
+        "btn_green": btn_green,
+        "btn_red": btn_red,
+        "btn_blue": btn_blue,
+        "btn_white": btn_white,  
+    }
+
+
+def build_editor(parent):
+    """A Text and its scroll thumb in a frame; the caller packs the frame."""
+
     # --- MAIN EDITOR FRAME ---
-    editor_frame = tk.Frame(root, bg=POWERSHELL_BG)
-    editor_frame.pack(expand=True, fill="both")
+    editor_frame = tk.Frame(parent, bg=POWERSHELL_BG)
 
     # --- CUSTOM SCROLLBAR ---
     scroll_canvas = tk.Canvas(
@@ -70,66 +109,32 @@ def build_ui(root):
         selectbackground=POWERSHELL_ACCENT,
         selectforeground=POWERSHELL_BG,
         highlightthickness=0,
-        undo=True,
-        autoseparators=True,
-        maxundo=-1,
+        undo=False,  # history is kept by undo.py
         font=(FONT_FAMILY, FONT_SIZE)
     )
     
     text.pack(side="left", expand=True, fill="both")
     text.tag_config("search_highlight", background="yellow", foreground="black")
+    text.tag_config("search_current", background="#FF9632", foreground="black")
 
 
-
-    # --- SEARCH BAR ---
-    search_frame = tk.Frame(root, bg="#414040")
-    search_entry = tk.Entry(search_frame, bg="#414040", fg="#FDFDFB", font="Consolas",insertbackground="#FFFFFE")
-    search_entry.pack(side="left", fill="x", expand=True)
-    
-    def close_search_panel():
-        search_frame.pack_forget()
-        search_entry.delete(0, "end")
-        clear_search_highlight(text)
-        text.focus_set()
-
-    close_search_btn = tk.Button(search_frame, text="X", fg="white", bg="black", command=close_search_panel)
-    close_search_btn.pack(side="right")
-
-
-    
     # --- SYNCHRONIZATION FUNCTIONS ---
 
+    # Thumb geometry comes from cached line heights (see scroll_thumb.py)
+    thumb_bar = create_scroll_thumb(text, scroll_canvas, thumb)
+
     def update_scrollbar(first, last):
         """
         Actualiza la posición y tamaño del thumb cuando el Text hace scroll.
         """
-        first = float(first)
-        last = float(last)
-
-        canvas_height = scroll_canvas.winfo_height()
-
-        # Minimum thumb size
-        thumb_height = max(40, (last - first) * canvas_height)
-
-        y1 = first * canvas_height
-        y2 = y1 + thumb_height
-
-        scroll_canvas.coords(thumb, 0, y1, 12, y2)
+        on_yscroll(thumb_bar, first, last)
 
 
     def on_drag(event):
         """
         Permite arrastrar el thumb para mover el texto.
         """
-        canvas_height = scroll_canvas.winfo_height()
-        y = event.y
-
-        # Limit within the canvas
-        y = max(0, min(canvas_height, y))
-
-        # Convert canvas position → scroll fraction
-        fraction = y / canvas_height
-        text.yview_moveto(fraction)
+        on_drag_thumb(thumb_bar, event)
 
 
     # --- THUMB EVENTS ---
@@ -154,24 +159,72 @@ def build_ui(root):
     scroll_canvas.tag_bind(thumb, "<Enter>", on_enter)
     scroll_canvas.tag_bind(thumb, "<Leave>", on_leave)
 
-    # --- RETURN ALL IMPORTANT WIDGETS ---
     return {
-        "menubar_frame": menubar_frame,
-        "toolbar": toolbar,
+        "frame": editor_frame,
         "text": text,
         "scroll_canvas": scroll_canvas,
         "thumb": thumb,
-        "search_frame": search_frame,
-        "search_entry": search_entry,
-        "btn_yellow": btn_yellow,
-        "btn_green": btn_green,
-        "btn_red": btn_red,
-        "btn_blue": btn_blue,
-        "btn_white": btn_white,  
+        "thumb_bar": thumb_bar,
+        "update_scrollbar": update_scrollbar,
+        "on_drag": on_drag,
     }
-    
 
 
+def build_search_bar(root):
+    """Find/replace bar widgets; built on first use rather than at startup."""
+
+    # --- SEARCH BAR ---
+    search_frame = tk.Frame(root, bg="#414040")
+    find_row = tk.Frame(search_frame, bg="#414040")
+    find_row.pack(fill="x")
+    search_entry = tk.Entry(find_row, bg="#414040", fg="#FDFDFB", font="Consolas",insertbackground="#FFFFFE")
+    search_entry.pack(side="left", fill="x", expand=True)
+
+    close_search_btn = tk.Button(find_row, text="X", fg="white", bg="black")
+    close_search_btn.pack(side="right")
 
+    search_next_btn = tk.Button(find_row, text="▼", fg="white", bg="black")
+    search_next_btn.pack(side="right")
 
-    
+    search_prev_btn = tk.Button(find_row, text="▲", fg="white", bg="black")
+    search_prev_btn.pack(side="right")
+
+    # Toggles: whole word, ignore case, regular expression
+    search_options = {}
+    for name, label in (("whole_word", "W"), ("ignore_case", "Aa"), ("regex", ".*")):
+        var = tk.BooleanVar(search_frame, value=False)
+        button = tk.Checkbutton(
+            find_row, text=label, variable=var, indicatoron=False, width=3,
+            fg="white", bg="black", selectcolor="#6A6A6A",
+            activebackground="#4A4A4A", activeforeground="white",
+        )
+        button.pack(side="right")
+        search_options[name] = (var, button)
+
+    search_count = tk.Label(find_row, text="", bg="#414040", fg="#FDFDFB", width=12)
+    search_count.pack(side="right")
+
+    # --- REPLACE ROW (shown by Ctrl+H) ---
+    replace_row = tk.Frame(search_frame, bg="#414040")
+    replace_entry = tk.Entry(replace_row, bg="#414040", fg="#FDFDFB", font="Consolas",insertbackground="#FFFFFE")
+    replace_entry.pack(side="left", fill="x", expand=True)
+
+    replace_all_btn = tk.Button(replace_row, text="All", fg="white", bg="black")
+    replace_all_btn.pack(side="right")
+
+    replace_btn = tk.Button(replace_row, text="Replace", fg="white", bg="black")
+    replace_btn.pack(side="right")
+
+    return {
+        "search_frame": search_frame,
+        "search_entry": search_entry,
+        "search_count": search_count,
+        "search_prev_btn": search_prev_btn,
+        "search_next_btn": search_next_btn,
+        "close_search_btn": close_search_btn,
+        "search_options": search_options,
+        "replace_row": replace_row,
+        "replace_entry": replace_entry,
+        "replace_btn": replace_btn,
+        "replace_all_btn": replace_all_btn,
+    }
@@ -0,0 +1,372 @@
+# undo.py
+import pickle
+import sys
+import time
+import zlib
+from collections import deque
+
+from color_runs import compute_line_starts, inserted_index, parse_position
+from config import UNDO_COALESCE_MS, UNDO_COMPRESS_MIN_BYTES, UNDO_MEMORY_BUDGET
+from text_hooks import add_change_listener, advance_index, install_change_hook
+
+OP_OVERHEAD = 64  # bytes per recorded op besides its text
+REPLAY_TAG_BATCH = 1000  # ranges per tag_add when restoring deleted colors
+
+
+# -----------------------------
+# UNDO HISTORY
+# -----------------------------
+# Replaces Tk's built-in undo (unbounded, and blind to color tags). Every
+# change reported by the change hook is recorded as an op:
+#
+#   ("i", start, chars, pieces)     insert; pieces: None if it took its
+#                                   neighbours' tags, else the (chars,
+#                                   color tags) it was inserted with
+#   ("d", start, chars, runs)       delete; runs re-color the text on undo
+#   ("t+", tag, [(start, end)...])  color added where it was missing
+#   ("t-", tag, [(start, end)...])  color removed where it was present
+#
+# Ops from one Tk event (typing over a selection, a recolor) form one
+# entry; consecutive typed characters, and consecutive Backspace/Delete
+# presses, keep extending the same entry until a pause, a newline or a
+# jump. Past UNDO_MEMORY_BUDGET the oldest entries are compressed, then
+# dropped; the newest entry is always kept.
+
+
+def start_undo(text, state):
+    history = {
+        "undo": deque(),
+        "redo": [],
+        "open": None,  # entry still collecting ops from the current event
+        "seal_id": None,
+        "bytes": 0,  # raw size of everything in undo + redo
+        "stored": 0,  # what that costs now that some of it is compressed
+        "evicted": 0,
+        "suspended": False,
+        "replaying": False,
+    }
+
+    hook = install_change_hook(text)
+    hook["capture"] = lambda: _recording(history, state)
+    add_change_listener(text, lambda *change: _on_change(text, history, state, hook, *change))
+    state["undo"] = history
+
+    text.bind("<<Undo>>", lambda e: undo(text, state) or "break")
+    text.bind("<<Redo>>", lambda e: redo(text, state) or "break")
+    return history
+
+
+def _recording(history, state):
+    return not (
+        history["suspended"]
+        or history["replaying"]
+        or state.get("loading")
+        or state.get("large_file")
+    )
+
+
+def suspend_undo(state):
+    """Stop recording, e.g. while a document is being replaced."""
+    history = state.get("undo")
+    if history is not None:
+        history["suspended"] = True
+
+
+def seal_undo_step(text, state):
+    """End the current undo step now: the next change starts a new one."""
+    history = state.get("undo")
+    if history is not None:
+        _seal_now(text, history)
+        _enforce_budget(history)
+
+
+def reset_undo(state):
+    """Forget all history (a new document is showing) and record again."""
+    history = state.get("undo")
+    if history is None:
+        return
+    history["undo"].clear()
+    history["redo"].clear()
+    history["open"] = None
+    history["bytes"] = history["stored"] = 0
+    history["suspended"] = False
+
+
+# -----------------------------
+# RECORDING
+# -----------------------------
+def _on_change(text, history, state, hook, op, start, end, detail):
+    if not _recording(history, state):
+        return
+
+    captured = hook["captured"]
+    now = time.monotonic()
+
+    if op == "insert":
+        record = ("i", start, detail, _color_pieces(hook["inserted"]))
+        typing = len(detail) == 1
+    elif op == "delete":
+        if captured is None:
+            return
+        record = ("d", start, captured[0], captured[1])
+        typing = len(captured[0]) == 1
+    else:
+        if not captured:
+            return  # the color was already (or already not) there
+        record = ("t+" if op == "tag_add" else "t-", detail, captured)
+        typing = False
+
+    entry = history["open"]
+    if entry is None and typing:
+        entry = _coalescing_entry(history, record, now)
+    if entry is None:
+        entry = _new_entry(history)
+
+    entry["ops"].append(record)
+    size = _op_size(record)
+    entry["bytes"] += size
+    history["bytes"] += size
+    history["stored"] += size
+    entry["time"] = now
+    if typing and record[0] == "i":
+        entry["typing"] = ("i", end, detail != "\n")
+    elif typing:
+        entry["typing"] = ("d", start, True)
+    else:
+        entry["typing"] = None
+
+    if history["seal_id"] is None:
+        history["seal_id"] = text.after_idle(lambda: _seal(history, state))
+
+
+def _color_pieces(inserted):
+    """hook["inserted"] with only the color tags, as the insert args to replay."""
+    if inserted is None:
+        return None
+    return tuple(
+        (chars, None if tags is None else tuple(t for t in tags if t.startswith("color_")))
+        for chars, tags in inserted
+    )
+
+
+def _coalescing_entry(history, record, now):
+    """The previous entry, if record continues the typing it ended with."""
+    if not history["undo"]:
+        return None
+    last = history["undo"][-1]
+    typing = last.get("typing")
+    if (
+        typing is None
+        or not typing[2]
+        or last["compressed"]
+        or (now - last["time"]) * 1000 > UNDO_COALESCE_MS
+    ):
+        return None
+
+    kind, position, _ = typing
+    if record[0] == "i" and kind == "i":
+        continues = record[1] == position
+    elif record[0] == "d" and kind == "d":
+        # Backspace ends where the last one started; Delete keeps the start
+        continues = record[1] == position or advance_index(record[1], record[2]) == position
+    else:
+        continues = False
+    if not continues:
+        return None
+    history["open"] = last
+    return last
+
+
+def _new_entry(history):
+    entry = {"ops": [], "bytes": 0, "compressed": None, "time": 0.0, "typing": None}
+    history["undo"].append(entry)
+    history["open"] = entry
+    # A new edit makes the redo branch unreachable
+    for old in history["redo"]:
+        _forget(history, old)
+    history["redo"].clear()
+    return entry
+
+
+def _seal(history, state):
+    history["seal_id"] = None
+    history["open"] = None
+    _enforce_budget(history)
+
+
+def _op_size(record):
+    size = OP_OVERHEAD
+    if record[0] in ("i", "d"):
+        size += sys.getsizeof(record[2])
+        if record[0] == "d":
+            size += OP_OVERHEAD * len(record[3])
+    else:
+        size += OP_OVERHEAD * len(record[2])
+    return size
+
+
+# -----------------------------
+# MEMORY BUDGET
+# -----------------------------
+def _stored_size(entry):
+    return len(entry["compressed"]) if entry["compressed"] is not None else entry["bytes"]
+
+
+def _compress(history, entry):
+    data = zlib.compress(pickle.dumps(entry["ops"], pickle.HIGHEST_PROTOCOL), 1)
+    if len(data) >= entry["bytes"]:
+        return False
+    history["stored"] -= entry["bytes"] - len(data)
+    entry["compressed"] = data
+    entry["ops"] = None
+    return True
+
+
+def _ops(entry):
+    if entry["compressed"] is not None:
+        return pickle.loads(zlib.decompress(entry["compressed"]))
+    return entry["ops"]
+
+
+def _forget(history, entry):
+    history["bytes"] -= entry["bytes"]
+    history["stored"] -= _stored_size(entry)
+
+
+def _enforce_budget(history):
+    if history["stored"] <= UNDO_MEMORY_BUDGET:
+        return
+
+    # Oldest first: compress what is worth compressing...
+    for entry in history["undo"]:
+        if history["stored"] <= UNDO_MEMORY_BUDGET:
+            return
+        if entry["compressed"] is None and entry["bytes"] >= UNDO_COMPRESS_MIN_BYTES:
+            _compress(history, entry)
+
+    # ...then drop the oldest entries, always keeping the newest one
+    while history["stored"] > UNDO_MEMORY_BUDGET and len(history["undo"]) > 1:
+        _forget(history, history["undo"].popleft())
+        history["evicted"] += 1
+
+
+def undo_usage(state):
+    history = state.get("undo")
+    if history is None:
+        return None
+    return {
+        "undo_entries": len(history["undo"]),
+        "redo_entries": len(history["redo"]),
+        "compressed": sum(
+            1 for e in list(history["undo"]) + history["redo"] if e["compressed"] is not None
+        ),
+        "bytes": history["bytes"],
+        "stored_bytes": history["stored"],
+        "budget_bytes": UNDO_MEMORY_BUDGET,
+        "evicted": history["evicted"],
+    }
+
+
+# -----------------------------
+# UNDO / REDO
+# -----------------------------
+def undo(text, state):
+    history = state.get("undo")
+    if history is None or not history["undo"]:
+        return
+    _seal_now(text, history)
+    entry = history["undo"].pop()
+    entry["typing"] = None
+    cursor = _replay(text, history, reversed(_ops(entry)), backwards=True)
+    history["redo"].append(entry)
+    _place_cursor(text, cursor)
+
+
+def redo(text, state):
+    history = state.get("undo")
+    if history is None or not history["redo"]:
+        return
+    _seal_now(text, history)
+    entry = history["redo"].pop()
+    entry["typing"] = None
+    cursor = _replay(text, history, _ops(entry), backwards=False)
+    history["undo"].append(entry)
+    _place_cursor(text, cursor)
+
+
+def _seal_now(text, history):
+    if history["seal_id"] is not None:
+        text.after_cancel(history["seal_id"])
+        history["seal_id"] = None
+    history["open"] = None
+    if history["undo"]:
+        history["undo"][-1]["typing"] = None  # later typing starts afresh
+
+
+def _replay(text, history, ops, backwards):
+    cursor = None
+    history["replaying"] = True
+    try:
+        for op in ops:
+            kind = op[0]
+            if kind == "i" and backwards or kind == "d" and not backwards:
+                start, chars = op[1], op[2]
+                text.delete(start, advance_index(start, chars))
+                cursor = start
+            elif kind == "i":
+                if op[3] is None:
+                    # Same place, same neighbours: Tk gives it the same tags
+                    text.insert(op[1], op[2])
+                else:
+                    # Exactly the tags it was inserted with, as the first time
+                    args = []
+                    for chars, tags in op[3]:
+                        args.append(chars)
+                        if tags is not None:
+                            args.append(tags)
+                    text.insert(op[1], *args)
+                cursor = advance_index(op[1], op[2])
+            elif kind == "d":
+                start, chars, runs = op[1], op[2], op[3]
+                text.insert(start, chars, "")  # exactly no tags...
+                _restore_runs(text, start, chars, runs)  # ...then the ones it had
+                cursor = advance_index(start, chars)
+            else:
+                adding = (kind == "t+") != backwards
+                tag, ranges = op[1], op[2]
+                for a, b in ranges:
+                    if adding:
+                        text.tag_add(tag, a, b)
+                    else:
+                        text.tag_remove(tag, a, b)
+                if adding:
+                    text.tag_config(tag, foreground=tag[len("color_"):])
+                cursor = ranges[0][0]
+    finally:
+        history["replaying"] = False
+    return cursor
+
+
+def _restore_runs(text, start, chars, runs):
+    """Re-add runs (offsets into chars, now at start), batched per tag."""
+    if not runs:
+        return
+    # Absolute indices: "start+Nc" makes Tk count N characters every time
+    line_starts = compute_line_starts(chars)
+    position = parse_position(start)
+    by_tag = {}
+    for a, b, tag in runs:
+        by_tag.setdefault(tag, []).extend((
+            inserted_index(line_starts, position, a),
+            inserted_index(line_starts, position, b),
+        ))
+    for tag, indices in by_tag.items():
+        for i in range(0, len(indices), 2 * REPLAY_TAG_BATCH):
+            text.tag_add(tag, *indices[i:i + 2 * REPLAY_TAG_BATCH])
+        text.tag_config(tag, foreground=tag[len("color_"):])
+
+
+def _place_cursor(text, cursor):
+    if cursor is not None:
+        text.mark_set("insert", cursor)
+        text.see("insert")
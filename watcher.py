@@ -0,0 +1,433 @@
+# watcher.py
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+from difflib import SequenceMatcher
+
+from color_runs import compute_line_starts, runs_to_positions
+from config import WATCH_DIFF_MAX_LINES, WATCH_POLL_MS, WATCH_SETTLE_MS, WATCH_TAIL_BYTES
+from dirty import is_dirty, mark_saved
+from editor_ops import apply_color_runs, color_tag, get_color_runs
+from formats import get_format
+from journal import read_current, start_journal, stop_journal
+from lazy import messagebox
+from text_hooks import get_generation
+from workspace_index import index_file
+
+# inotify(7)
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+# -----------------------------
+# EXTERNAL CHANGE WATCHER
+# -----------------------------
+# A background thread watches the open file: inotify on the directory
+# holding it (editors and our own saves replace files, which a watch on
+# the file itself would lose) or, where inotify is unavailable, a stat poll
+# every WATCH_POLL_MS. It only says "that file changed"; the Tk side
+# decides what that means:
+#
+#   - size/mtime/inode equal to the last load or save: our own write
+#   - unsaved edits in the editor: ask before throwing them away
+#   - plain text that only grew (same inode, the bytes before the old end
+#     unchanged): read just the new bytes and append them (tail mode)
+#   - anything else: diff lines off the Tk thread against a snapshot of
+#     the widget and replace only the hunks that differ; color runs are
+#     compared the same way and only the differing ones are touched
+
+
+def start_watcher(text, root, state, reload):
+    """reload(path) reopens a file from scratch (after the user agreed)."""
+    watch = {
+        "path": None,  # what the thread watches; set by watch_synced
+        "stat": None,  # (size, mtime_ns, inode) at the last load or save
+        "tail": b"",  # last WATCH_TAIL_BYTES bytes at that point
+        "changed": queue.Queue(),
+        "results": queue.Queue(),
+        "busy": False,  # a diff or append is being prepared
+        "again": False,  # another change arrived meanwhile
+        "asking": False,
+        "stop": threading.Event(),
+        "text": text,
+        "root": root,
+        "state": state,
+        "reload": reload,
+    }
+    threading.Thread(target=_watch_loop, args=(watch,), daemon=True).start()
+    state["watch"] = watch
+    watch_synced(state)
+    root.after(WATCH_POLL_MS, lambda: _poll(watch))
+    return watch
+
+
+def stop_watcher(state):
+    watch = state.get("watch")
+    if watch is not None:
+        watch["stop"].set()
+        state["watch"] = None
+
+
+def watch_synced(state):
+    """The editor now matches its file on disk: remember what that file looks like."""
+    watch = state.get("watch")
+    if watch is None:
+        return
+    path = state.get("current_file_path")
+    if not path or state.get("large_file") or state.get("loading"):
+        watch["path"] = None
+        return
+    try:
+        watch["stat"] = _fingerprint(path)
+        watch["tail"] = _read_tail(path, watch["stat"][0])
+    except OSError:
+        watch["stat"], watch["tail"] = None, b""
+    watch["path"] = path
+
+
+def watch_recheck(state):
+    """Look at the file again, e.g. for changes made while its tab was evicted."""
+    watch = state.get("watch")
+    if watch is not None:
+        _on_changed(watch)
+
+
+def _fingerprint(path):
+    return _stat_fingerprint(os.stat(path))
+
+
+def _stat_fingerprint(st):
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def _read_tail(path, size):
+    with open(path, "rb") as f:
+        f.seek(max(0, size - WATCH_TAIL_BYTES))
+        return f.read(min(size, WATCH_TAIL_BYTES))
+
+
+# -----------------------------
+# WATCH THREAD
+# -----------------------------
+def _open_inotify():
+    if not sys.platform.startswith("linux"):
+        return None, None
+    # Here, on the watch thread: ctypes.util pulls in shutil, subprocess,
+    # tempfile and lzma, none of which startup should pay for
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None, None
+    return (libc, fd) if fd >= 0 else (None, None)
+
+
+def _watch_loop(watch):
+    libc, fd = _open_inotify()
+    watched = None  # (directory, watch descriptor)
+    last_seen = None  # polling only
+    stop = watch["stop"]
+
+    while not stop.is_set():
+        path = watch["path"]
+        changed = False
+
+        if fd is None:
+            stop.wait(WATCH_POLL_MS / 1000)
+            if path is not None:
+                try:
+                    current = _fingerprint(path)
+                except OSError:
+                    current = None
+                changed = last_seen is not None and current != last_seen and current is not None
+                last_seen = current
+        else:
+            directory = os.path.dirname(os.path.abspath(path)) if path else None
+            if watched is not None and watched[0] != directory:
+                libc.inotify_rm_watch(fd, watched[1])
+                watched = None
+            if directory is not None and watched is None:
+                wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+                watched = (directory, wd) if wd >= 0 else None
+
+            ready, _, _ = select.select([fd], [], [], WATCH_POLL_MS / 1000)
+            if ready:
+                name = os.fsencode(os.path.basename(path)) if path else None
+                changed = name is not None and name in _read_events(fd)
+
+        if changed:
+            # Let a burst of writes settle, then report once
+            stop.wait(WATCH_SETTLE_MS / 1000)
+            if fd is not None:
+                _read_events(fd)
+            watch["changed"].put(path)
+
+    if fd is not None:
+        os.close(fd)
+
+
+def _read_events(fd):
+    """Names of the entries touched since the last read."""
+    names = set()
+    while True:
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            names.add(data[pos:pos + length].rstrip(b"\0"))
+            pos += length
+
+
+# -----------------------------
+# TK SIDE
+# -----------------------------
+def _poll(watch):
+    if watch["stop"].is_set():
+        return
+    try:
+        while True:
+            path = watch["changed"].get_nowait()
+            if path == watch["path"]:
+                _on_changed(watch)
+    except queue.Empty:
+        pass
+
+    try:
+        while True:
+            _apply(watch, watch["results"].get_nowait())
+    except queue.Empty:
+        pass
+
+    watch["root"].after(WATCH_POLL_MS, lambda: _poll(watch))
+
+
+def _on_changed(watch, force_diff=False):
+    text, state = watch["text"], watch["state"]
+    path = watch["path"]
+    if path is None or path != state.get("current_file_path"):
+        return
+    if state.get("loading") or state.get("large_file"):
+        return
+    if state.get("evicted") is not None:
+        return  # looked at again when the tab comes back (watch_recheck)
+    if watch["busy"] or watch["asking"]:
+        watch["again"] = True
+        return
+
+    try:
+        current = _fingerprint(path)
+    except OSError:
+        return  # gone for now; a later write brings it back
+    if current == watch["stat"]:
+        return  # our own save, or a touch that changed nothing
+
+    # Journal compaction rewrites the base with what was already saved
+    session = state.get("journal")
+    if session is not None and session["compacted"] is not None:
+        if _stat_fingerprint(session["compacted"]) == current:
+            watch_synced(state)
+            return
+
+    if is_dirty(text, state):
+        watch["asking"] = True
+        try:
+            reload = messagebox.askyesno(
+                "File Changed",
+                f"{os.path.basename(path)} was changed by another program.\n\n"
+                "Reload it and lose your unsaved changes?",
+            )
+        finally:
+            watch["asking"] = False
+        if reload:
+            watch["reload"](path)
+        else:
+            watch["stat"] = current  # keep ours; ask again on the next change
+        return
+
+    file_format = state["file_format"]
+    old = watch["stat"]
+    job = {
+        "path": path,
+        "format": file_format,
+        "generation": get_generation(text),
+        "stat": current,
+    }
+    if (
+        not force_diff
+        and file_format == "txt"
+        and old is not None
+        and current[2] == old[2]
+        and current[0] > old[0]
+    ):
+        job["kind"] = "append"
+        job["old_size"] = old[0]
+        job["tail"] = watch["tail"]
+    else:
+        job["kind"] = "diff"
+        job["old_text"] = text.get("1.0", "end-1c")
+        job["colors"] = get_format(file_format)["colors"]
+
+    watch["busy"] = True
+    threading.Thread(target=_prepare, args=(watch, job), daemon=True).start()
+
+
+def _apply(watch, job):
+    watch["busy"] = False
+    text, state = watch["text"], watch["state"]
+
+    stale = (
+        job["path"] != state.get("current_file_path")
+        or state.get("loading")
+        or state.get("large_file")
+        or state.get("evicted") is not None
+        or get_generation(text) != job["generation"]
+    )
+    if job["kind"] == "not_append" and not stale:
+        # Grew, but not only at the end: diff against a snapshot instead
+        _on_changed(watch, force_diff=True)
+        return
+
+    if job.get("error") is None and not stale:
+        # The file's edits are not ours to journal: restart against the new base
+        journaling = state.get("journal") is not None
+        stop_journal(text, state)
+
+        if job["kind"] == "append":
+            at_bottom = text.yview()[1] >= 1.0
+            text.insert("end-1c", job["append"], "")
+            if at_bottom:
+                text.see("end")  # tail mode: follow the file
+            # Rehashing a growing log on every append would undo the point
+            mark_saved(text, state, exact=False)
+        else:
+            _apply_hunks(text, job["hunks"])
+            if job["colors"]:
+                _apply_color_changes(text, job["runs"])
+            mark_saved(text, state)
+
+        if journaling and state.get("journal_enabled"):
+            start_journal(text, state, job["path"], job["format"])
+        watch["stat"] = job["stat"]
+        watch["tail"] = job["tail"]
+        index_file(state.get("index"), job["path"])
+
+    if stale or watch["again"]:
+        watch["again"] = False
+        _on_changed(watch)
+
+
+def _apply_hunks(text, hunks):
+    # Bottom-up, so earlier line numbers stay valid. An explicit empty tag
+    # list keeps new lines from inheriting colors from their neighbours
+    for first, last, lines in reversed(hunks):
+        if last > first:
+            text.delete(f"{first + 1}.0", f"{last + 1}.0")
+        if lines:
+            text.insert(f"{first + 1}.0", lines, "")
+
+
+def _apply_color_changes(text, runs):
+    current = {(s, e, c.upper()) for s, e, c in get_color_runs(text)}
+    wanted = {(s, e, c.upper()) for s, e, c in runs}
+    for start, end, color in current - wanted:
+        text.tag_remove(color_tag(color), "%d.%d" % start, "%d.%d" % end)
+    apply_color_runs(text, sorted(wanted - current))
+
+
+# -----------------------------
+# DIFF / APPEND (worker thread)
+# -----------------------------
+def _prepare(watch, job):
+    try:
+        if job["kind"] == "append":
+            _prepare_append(job)
+        else:
+            _prepare_diff(job)
+    except (OSError, ValueError) as e:
+        job["error"] = e
+    watch["results"].put(job)
+
+
+def _prepare_append(job):
+    old_size, tail = job["old_size"], job["tail"]
+    with open(job["path"], "rb") as f:
+        f.seek(old_size - len(tail))
+        data = f.read()
+    if data[:len(tail)] != tail:
+        job["kind"] = "not_append"
+        return
+
+    added = data[len(tail):]
+    # A writer may be mid-character: leave an incomplete UTF-8 tail for later
+    for cut in range(4):
+        try:
+            chunk = added[:len(added) - cut].decode("utf-8")
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError("appended data is not UTF-8")
+    added = added[:len(added) - cut]
+
+    # Same newline translation as opening the file in text mode
+    job["append"] = chunk.replace("\r\n", "\n").replace("\r", "\n")
+    size = old_size + len(added)
+    job["stat"] = (size, job["stat"][1] if not cut else -1, job["stat"][2])
+    job["tail"] = (tail + added)[-WATCH_TAIL_BYTES:]
+
+
+def _prepare_diff(job):
+    content, runs = read_current(job["path"], job["format"])
+    old = job.pop("old_text").splitlines(keepends=True)
+    new = content.splitlines(keepends=True)
+    job["hunks"] = diff_lines(old, new)
+    if job["colors"]:
+        job["runs"] = runs_to_positions(runs, compute_line_starts(content))
+    job["tail"] = _read_tail(job["path"], job["stat"][0])
+
+
+def diff_lines(old, new):
+    """
+    Hunks turning the line list old into new: (first, last, text) replaces
+    old lines [first, last) with text.
+    """
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    old_mid = old[prefix:len(old) - suffix]
+    new_mid = new[prefix:len(new) - suffix]
+    if not old_mid and not new_mid:
+        return []
+    if len(old_mid) > WATCH_DIFF_MAX_LINES or len(new_mid) > WATCH_DIFF_MAX_LINES:
+        # Too far apart to be worth matching: one hunk for the middle
+        return [(prefix, prefix + len(old_mid), "".join(new_mid))]
+
+    hunks = []
+    matcher = SequenceMatcher(None, old_mid, new_mid, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            hunks.append((prefix + i1, prefix + i2, "".join(new_mid[j1:j2])))
+    return hunks
@@ -0,0 +1,305 @@
+# workspace_index.py
+import itertools
+import json
+import os
+import queue
+import re
+import threading
+from bisect import bisect_right
+
+from color_runs import runs_by_color, tk_length
+from config import WORKSPACE_DIRS, WORKSPACE_INDEX_MAX_BYTES, WORKSPACE_INDEX_PATH
+from journal import fingerprint, read_current
+from formats import sniff_format
+from lazy import sqlite3
+
+NOTE_EXTENSIONS = (".mini", ".np100", ".txt")
+RESULT_LIMIT = 50
+SNIPPET_CHARS = 80
+
+# Segment rowids are file_id * ROWS_PER_FILE + n, so a file's rows are one
+# rowid range (file_id is UNINDEXED and would need a full scan)
+ROWS_PER_FILE = 4096
+
+# Request priorities: searches jump ahead of a long reindex
+SEARCH, INDEX, REFRESH = 0, 1, 2
+
+
+# -----------------------------
+# WORKSPACE INDEX
+# -----------------------------
+# One SQLite database (FTS5 when the sqlite build has it) holds every note
+# opened or saved in the editor, plus any under WORKSPACE_DIRS (none unless
+# configured: crawling folders is opt-in):
+#
+#   files     path, (size, mtime_ns, journal size) when indexed, color runs
+#   segments  full-text rows: the whole content with color "", and for each
+#             color the text painted with it, so "only red" is a column
+#             filter on the same MATCH
+#
+# A single worker thread owns the connection. Refreshes compare file stats
+# with what was indexed and only re-read notes that changed; searches are
+# answered from the stored content without touching the notes themselves.
+
+
+def start_index(db_path=WORKSPACE_INDEX_PATH, roots=WORKSPACE_DIRS):
+    index = {
+        "db_path": db_path,
+        "requests": queue.PriorityQueue(),
+        "results": queue.Queue(),
+        "order": itertools.count(),
+        "token": 0,
+        "pending": None,
+    }
+    threading.Thread(target=_worker, args=(index,), daemon=True).start()
+    _request(index, REFRESH, "refresh", list(roots))
+    return index
+
+
+def stop_index(index):
+    if index is not None:
+        _request(index, SEARCH, "stop", None)
+
+
+def index_file(index, path):
+    """(Re)index one note, e.g. right after it was opened or saved."""
+    if index is not None:
+        _request(index, INDEX, "file", path)
+
+
+def refresh_index(index, roots=WORKSPACE_DIRS):
+    _request(index, REFRESH, "refresh", list(roots))
+
+
+def _request(index, priority, kind, arg):
+    index["requests"].put((priority, next(index["order"]), kind, arg))
+
+
+# -----------------------------
+# QUERIES (Tk thread)
+# -----------------------------
+def search_workspace(index, root, query, color, callback):
+    """
+    Search in the background and call callback(results) on the Tk thread.
+    Only the newest search reports; results are dicts with path, line, col,
+    length and snippet.
+    """
+    index["token"] += 1
+    token = index["token"]
+    _request(index, SEARCH, "search", (token, query, color))
+    if index["pending"] is None:
+        index["pending"] = root.after(20, lambda: _poll(index, root))
+    index["callback"] = callback
+
+
+def _poll(index, root):
+    index["pending"] = None
+    latest = None
+    try:
+        while True:
+            latest = index["results"].get_nowait()
+    except queue.Empty:
+        pass
+
+    if latest is not None and latest[0] == index["token"]:
+        index["callback"](latest[1])
+        return
+    index["pending"] = root.after(20, lambda: _poll(index, root))
+
+
+# -----------------------------
+# WORKER
+# -----------------------------
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files ("
+        " id INTEGER PRIMARY KEY, path TEXT UNIQUE, stat TEXT, runs TEXT)"
+    )
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS segments"
+            " USING fts5(body, file_id UNINDEXED, color UNINDEXED)"
+        )
+        fts = True
+    except sqlite3.OperationalError:
+        # No FTS5 in this sqlite build: same rows, scanned with instr()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments (body TEXT, file_id INTEGER, color TEXT)"
+        )
+        fts = False
+    conn.commit()
+    return conn, fts
+
+
+def _worker(index):
+    try:
+        conn, fts = _connect(index["db_path"])
+    except (OSError, sqlite3.Error):
+        return  # no index this session; searches simply never answer
+
+    while True:
+        _, _, kind, arg = index["requests"].get()
+        if kind == "stop":
+            conn.close()
+            return
+        try:
+            if kind == "search":
+                token, query, color = arg
+                index["results"].put((token, _search(conn, fts, query, color)))
+            elif kind == "file":
+                _index_path(conn, arg)
+                conn.commit()
+            elif kind == "refresh":
+                for path in _stale_paths(conn, arg):
+                    _request(index, INDEX, "file", path)
+        except (OSError, sqlite3.Error):
+            if kind == "search":
+                index["results"].put((arg[0], []))
+
+
+def _stale_paths(conn, roots):
+    """Notes that are new or changed since indexed; forgets deleted ones."""
+    known = {path: stat for path, stat in conn.execute("SELECT path, stat FROM files")}
+
+    stale = []
+    seen = set()
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if not name.lower().endswith(NOTE_EXTENSIONS):
+                    continue
+                path = os.path.abspath(os.path.join(dirpath, name))
+                seen.add(path)
+                try:
+                    if json.loads(known.get(path, "null")) != fingerprint(path):
+                        stale.append(path)
+                except OSError:
+                    pass
+
+    # Notes opened or saved outside the roots stay until they disappear
+    for path, known_stat in known.items():
+        if path in seen:
+            continue
+        try:
+            if json.loads(known_stat) != fingerprint(path):
+                stale.append(path)
+        except OSError:
+            _forget(conn, path)
+    conn.commit()
+    return stale
+
+
+def _forget(conn, path):
+    row = conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+    if row is not None:
+        first = row[0] * ROWS_PER_FILE
+        conn.execute(
+            "DELETE FROM segments WHERE rowid BETWEEN ? AND ?",
+            (first, first + ROWS_PER_FILE - 1),
+        )
+        conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+
+
+def _index_path(conn, path):
+    path = os.path.abspath(path)
+    try:
+        stat = fingerprint(path)
+        row = conn.execute("SELECT stat FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and json.loads(row[0]) == stat:
+            return  # unchanged since indexed
+        if stat[0] > WORKSPACE_INDEX_MAX_BYTES:
+            _forget(conn, path)
+            return
+        content, runs = read_current(path, sniff_format(path))
+    except (OSError, ValueError):
+        _forget(conn, path)
+        return
+
+    runs = [(start, end, color.upper()) for start, end, color in runs]
+    _forget(conn, path)
+    file_id = conn.execute(
+        "INSERT INTO files (path, stat, runs) VALUES (?, ?, ?)",
+        (path, json.dumps(stat), json.dumps(runs)),
+    ).lastrowid
+
+    rows = [(content, "")]
+    for color, spans in runs_by_color(runs).items():
+        rows.append(("\n".join(content[s:e] for s, e in spans), color))
+    conn.executemany(
+        "INSERT INTO segments (rowid, body, file_id, color) VALUES (?, ?, ?, ?)",
+        [
+            (file_id * ROWS_PER_FILE + n, body, file_id, color)
+            for n, (body, color) in enumerate(rows[:ROWS_PER_FILE])
+        ],
+    )
+
+
+def _search(conn, fts, query, color):
+    terms = query.split()
+    if not terms:
+        return []
+
+    if fts:
+        # Each term is a phrase (FTS splits "Get-ChildItem" into two
+        # tokens); the last one also matches as a prefix while typing
+        match = " ".join('"' + t.replace('"', '""') + '"' for t in terms) + " *"
+        rows = conn.execute(
+            "SELECT file_id FROM segments WHERE segments MATCH ? AND color = ?"
+            " ORDER BY rank LIMIT ?",
+            (match, color or "", RESULT_LIMIT),
+        ).fetchall()
+    else:
+        sql = "SELECT file_id FROM segments WHERE color = ?"
+        params = [color or ""]
+        for term in terms:
+            sql += " AND instr(lower(body), lower(?)) > 0"
+            params.append(term)
+        rows = conn.execute(sql + " LIMIT ?", params + [RESULT_LIMIT]).fetchall()
+
+    results = []
+    for (file_id,) in rows:
+        path, runs_json = conn.execute(
+            "SELECT path, runs FROM files WHERE id = ?", (file_id,)
+        ).fetchone()
+        (content,) = conn.execute(
+            "SELECT body FROM segments WHERE rowid = ?", (file_id * ROWS_PER_FILE,)
+        ).fetchone()
+        hit = _locate(content, json.loads(runs_json), terms[0], color)
+        if hit is not None:
+            results.append(_result(path, content, *hit))
+    return results
+
+
+def _locate(content, runs, term, color):
+    """(offset, length) of the first match of term, inside color if given."""
+    spans = [(s, e) for s, e, c in runs if c == color] if color else None
+    starts = [s for s, _ in spans] if spans else None
+
+    for m in re.finditer(re.escape(term), content, re.IGNORECASE):
+        if spans is None:
+            return m.start(), len(m.group())
+        i = bisect_right(starts, m.start()) - 1
+        if spans and i >= 0 and spans[i][1] > m.start():
+            return m.start(), len(m.group())
+    # FTS matched on tokens (punctuation differs): open at the top, or at
+    # the first text in that color
+    if spans is None:
+        return 0, 0
+    return (spans[0][0], 0) if spans else None
+
+
+def _result(path, content, offset, length):
+    line_start = content.rfind("\n", 0, offset) + 1
+    line = content.count("\n", 0, offset) + 1
+    col = tk_length(content[line_start:offset])  # Tk columns: the result is shown in a Text
+    line_end = content.find("\n", offset)
+    if line_end < 0:
+        line_end = len(content)
+    left = max(line_start, offset - SNIPPET_CHARS // 2)
+    snippet = content[left:min(line_end, left + SNIPPET_CHARS)].strip()
+    length = tk_length(content[offset:offset + length])
+    return {"path": path, "line": line, "col": col, "length": length, "snippet": snippet}
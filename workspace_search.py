@@ -0,0 +1,119 @@
+# workspace_search.py
+import os
+import tkinter as tk
+
+from search_engine import SEARCH_DEBOUNCE_MS
+from workspace_index import search_workspace
+
+COLOR_FILTERS = [
+    ("Any color", None),
+    ("White", "#CCCCCC"),
+    ("Blue", "#8AB5FF"),
+    ("Yellow", "#F0E197"),
+    ("Green", "#4CB562"),
+    ("Red", "#DE3B28"),
+]
+
+
+# -----------------------------
+# WORKSPACE SEARCH DIALOG
+# -----------------------------
+def open_workspace_search(root, state, open_path):
+    """
+    Search every indexed note. open_path(file_path) shows a result in a tab
+    and returns that tab's (text, state) once it is showing (or loading).
+    """
+    index = state.get("index")
+    if index is None:
+        return
+
+    dialog = state.get("workspace_dialog")
+    if dialog is not None and dialog.winfo_exists():
+        dialog.deiconify()
+        dialog.lift()
+        return
+
+    dialog = tk.Toplevel(root, bg="#414040")
+    dialog.title("Search Workspace")
+    dialog.geometry("720x400")
+    state["workspace_dialog"] = dialog
+
+    bar = tk.Frame(dialog, bg="#414040")
+    bar.pack(side="top", fill="x")
+
+    entry = tk.Entry(bar, bg="#414040", fg="#FDFDFB", font="Consolas", insertbackground="#FFFFFE")
+    entry.pack(side="left", fill="x", expand=True)
+
+    color_var = tk.StringVar(value=COLOR_FILTERS[0][0])
+    color_menu = tk.OptionMenu(bar, color_var, *[name for name, _ in COLOR_FILTERS])
+    color_menu.config(bg="#4A4A4A", fg="white", highlightthickness=0)
+    color_menu.pack(side="right")
+
+    listbox = tk.Listbox(
+        dialog, bg="#1C1C1B", fg="#CCCCCC", font=("Consolas", 10),
+        selectbackground="#4A4A4A", activestyle="none", borderwidth=0,
+    )
+    listbox.pack(side="top", fill="both", expand=True)
+
+    status = tk.Label(dialog, text="", bg="#414040", fg="#FDFDFB", anchor="w")
+    status.pack(side="bottom", fill="x")
+
+    results = []
+    pending = {"after": None}
+
+    def show(found):
+        results[:] = found
+        listbox.delete(0, "end")
+        for r in found:
+            listbox.insert("end", f"{os.path.basename(r['path'])}:{r['line']}  {r['snippet']}")
+        status.config(text=f"{len(found)} notes" if found else "No matches")
+
+    def run():
+        pending["after"] = None
+        if not dialog.winfo_exists():
+            return
+        query = entry.get().strip()
+        if not query:
+            show([])
+            return
+        color = dict(COLOR_FILTERS)[color_var.get()]
+        search_workspace(index, root, query, color, lambda found: dialog.winfo_exists() and show(found))
+
+    def schedule(*_):
+        if pending["after"] is not None:
+            dialog.after_cancel(pending["after"])
+        pending["after"] = dialog.after(SEARCH_DEBOUNCE_MS, run)
+
+    def open_selected(event=None):
+        selection = listbox.curselection() or ((0,) if results else ())
+        if not selection:
+            return
+        result = results[selection[0]]
+        shown = open_path(result["path"])
+        if shown:
+            _reveal(*shown, root, result)
+
+    entry.bind("<KeyRelease>", schedule)
+    entry.bind("<Return>", open_selected)
+    entry.bind("<Escape>", lambda e: dialog.destroy())
+    color_var.trace_add("write", schedule)
+    listbox.bind("<Double-Button-1>", open_selected)
+    listbox.bind("<Return>", open_selected)
+    entry.focus_set()
+
+
+def _reveal(text, state, root, result):
+    """Select the match once the file has finished loading."""
+    if state.get("loading"):
+        root.after(50, lambda: _reveal(text, state, root, result))
+        return
+    if state.get("large_file"):
+        return  # only a window of the file is in the widget
+
+    start = f"{result['line']}.{result['col']}"
+    end = f"{start}+{result['length']}c"
+    text.tag_remove(tk.SEL, "1.0", tk.END)
+    text.tag_add(tk.SEL, start, end)
+    text.mark_set(tk.INSERT, start)
+    text.see(start)
+    text.focus_set()